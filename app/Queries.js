@@ -61,10 +61,12 @@ export default function Queries({loadingCollections}) {
   const [filters, setFilters] = React.useState([]); // Stores filter information
   const [isExpanded, setIsExpanded] = React.useState(false); // Used to indicate the filters are expanded
   const [queryResults, setQueryResults] = React.useState(null); // Used to store query results
+  const [queryTabs, setQueryTabs] = React.useState({resultsId:null, tabs:{}}); // Used to store the loaded query result tabs
   const [waitingOnQuery, setWaitingOnQuery] = React.useState(null);  // Used for managing queries and the UI delay in showing results
   const [workspaceWidth, setWorkspaceWidth] = React.useState(640);  // Default value is recalculated at display time
 
   const activeQueryRef = React.useRef(null);
+  const loadingTabsRef = React.useRef({});  // The query result tabs being loaded
 
   let mergedSpecies = React.useMemo(() => [].concat(speciesItems).concat(speciesOtherItems ?? []), [speciesItems,speciesOtherItems]);
 
@@ -209,22 +211,30 @@ export default function Queries({loadingCollections}) {
       return;
     }
 
+    /**
+     * Shows the query results. The contents of the tabs are loaded as they're displayed
+     * @function
+     */
+    const showResults = () => {
+      loadingTabsRef.current = {};
+      setQueryTabs({resultsId:respData.id, tabs:{}});
+      setQueryResults(respData);
+      setIsExpanded(false);
+      setWaitingOnQuery(null);
+    };
+
     if (activeQueryRef.current === queryId && Object.keys(respData).length > 0) {
       // Check if should slightly delay showing the query results
       const time_diff_sec = (Date.now() - queryId) / 1000.0;
       if (Math.round(time_diff_sec) >= QUERY_RESULTS_SHOW_DELAY_SEC) {
         // Show the results
-        setQueryResults(respData);
-        setIsExpanded(false);
-        setWaitingOnQuery(null);
+        showResults();
       } else  {
         // Wait to show the results
         const remaining = QUERY_RESULTS_SHOW_DELAY_SEC - time_diff_sec;
         resultShowTimeoutRef.current = window.setTimeout(() => {
                                                       resultShowTimeoutRef.current = null;
-                                                      setQueryResults(respData);
-                                                      setIsExpanded(false);
-                                                      setWaitingOnQuery(null);
+                                                      showResults();
                                                     }, remaining * 1000);
       }
       activeQueryRef.current = null;
@@ -298,6 +308,57 @@ export default function Queries({loadingCollections}) {
     queryIntervalRef.current = val;
   }, []);
 
+  /**
+   * Loads the contents of a query results tab
+   * @function
+   * @param {string} tabName The name of the tab to load
+   */
+  const handleLoadTab = React.useCallback((tabName) => {
+    if (!queryResults || loadingTabsRef.current[tabName]) {
+      return;
+    }
+
+    const resultsId = queryResults.id;
+    loadingTabsRef.current[tabName] = true;
+
+    // Sets the tab contents, ignoring tabs that belong to older results. A null value marks a
+    // tab that failed to load and undefined removes the tab's contents
+    const setTabData = (tabData) => {
+      setQueryTabs((prev) => {
+        if (prev.resultsId !== resultsId || prev.tabs[tabName] === tabData) {
+          return prev;
+        }
+        const tabs = {...prev.tabs, [tabName]:tabData};
+        if (tabData === undefined) {
+          delete tabs[tabName];
+        }
+        return {resultsId, tabs};
+      });
+    };
+
+    // Show that we're loading the tab again after a failure
+    setTabData(undefined);
+
+    const loadFailed = (message, title) => {
+      loadingTabsRef.current[tabName] = false;
+      setTabData(null);
+      addMessage(Level.Error, message, title);
+    };
+
+    const success = Server.queryTab(serverURLRef.current, queryToken, tabName, setTokenExpired,
+                      (respData) => {   // Success
+                          setTabData(respData);
+                      },
+                      (err) => {        // Failure
+                          loadFailed('An error was detected while loading the query results', 'Query Error Detected');
+                      }
+    );
+
+    if (!success) {
+      loadFailed('An error occurred while loading the query results', 'Query Error');
+    }
+  }, [addMessage, queryResults, queryToken, setTokenExpired]);
+
   /**
    * Handles the user downloading information
    * @function
@@ -361,6 +422,8 @@ export default function Queries({loadingCollections}) {
       >
       { queryResults && 
         <QueryResults results={queryResults}
+                      tabData={queryTabs.tabs}
+                      onLoadTab={handleLoadTab}
                       maxHeight={uiSizes.workspace.height-curHeight-dividerHeight-10}
                       onDownload={handleDownload}
         />
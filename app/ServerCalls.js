@@ -862,6 +862,55 @@ export function query(serverURL, token, formData, interval, onExpiredToken, onSu
   return true;
 }
 
+/**
+ * Fetches the contents of one tab of the last query results from the server
+ * @function
+ * @param {string} serverURL The URL to the server
+ * @param {string} token The authorization token
+ * @param {string} tabName The name of the query results tab to fetch
+ * @param {function} [onExpiredToken] Function to call when we get an expired token return
+ * @param {function} [onSuccess] The function to call upon success
+ * @param {function} [onFailure] The function to call upon failure
+ * @return {boolean} Returns true if the call was successfullly made, false if not
+ */
+export function queryTab(serverURL, token, tabName, onExpiredToken, onSuccess, onFailure) {
+  onExpiredToken ||= () => {};
+  onSuccess ||= () => {};
+  onFailure ||= () => {};
+
+  const queryTabUrl = serverURL + '/query_tab?t=' + encodeURIComponent(token) + '&q=' + encodeURIComponent(tabName);
+
+  try {
+    fetch(queryTabUrl, {
+      credentials: 'include',
+      method: 'GET'
+    })
+    .then(async (resp) => {
+        if (resp.ok) {
+          return resp.json();
+        } else {
+          if (resp.status === 401) {
+            // User needs to log in again
+            onExpiredToken();
+          }
+          throw new Error(`Failed to get query results: ${resp.status}: ${await resp.text()}`);
+        }
+    })
+    .then((respData) => {
+      onSuccess(respData);
+    })
+    .catch(function(err) {
+      console.log('Query Tab Error: ',err);
+      onFailure(err);
+    });
+  } catch (err) {
+    console.log('Query Tab Unknown Error:', err);
+    return false;
+  }
+
+  return true;
+}
+
 /**
  * Handles sending an image's single species change to the server
  * @function
@@ -4,6 +4,8 @@
 
 import * as React from 'react';
 import Box from '@mui/material/Box';
+import Button from '@mui/material/Button';
+import CircularProgress from '@mui/material/CircularProgress';
 import DownloadForOfflineOutlinedIcon from '@mui/icons-material/DownloadForOfflineOutlined';
 import Grid from '@mui/material/Grid';
 import Tab from '@mui/material/Tab';
@@ -66,11 +68,14 @@ function a11yPropsTabPanel(index) {
 /**
  * Generates the UI for displaying query results
  * @param {object} results The results of a query to display
+ * @param {object} tabData The contents of the tabs that have been loaded, keyed by tab name. Tabs that
+ *                failed to load have a null value
+ * @param {function} onLoadTab The function to call to load the contents of a tab
  * @param {number} maxHeight The max height to set the panel to
  * @param {function} onDownload The function to call when the user wants to download a result
  * @returns {object} The UI of the query results
  */
-export default function QueryResults({results, maxHeight, onDownload}) {
+export default function QueryResults({results, tabData, onLoadTab, maxHeight, onDownload}) {
   const theme = useTheme();
   const userSettings = React.useContext(UserSettingsContext);  // User display settings
   const [activeTab, setActiveTab] = React.useState(0);
@@ -94,6 +99,14 @@ export default function QueryResults({results, maxHeight, onDownload}) {
       return userSettings?.sandersonOutput ? results.tabs.order : results.tabs.order.filter((item) => !item.includes('DrSanderson'))
     }, [results, userSettings]);
 
+  // Load the contents of the active tab if we don't have them yet
+  React.useEffect(() => {
+    const tabName = tabsOrder[activeTab];
+    if (tabName && tabData[tabName] === undefined) {
+      onLoadTab(tabName);
+    }
+  }, [activeTab, onLoadTab, tabData, tabsOrder]);
+
   return (
     <Grid id="query-results-panel-wrapper" container size="grow" alignItems="start" justifyContent="start">
       <Grid size={2}  sx={{backgroundColor:"#EAEAEA", height:maxHeight}}>
@@ -134,7 +147,21 @@ export default function QueryResults({results, maxHeight, onDownload}) {
             return (
               <TabPanel id={'query-result-panel-'+item} value={activeTab} index={idx} key={item+'-'+idx} 
                         style={{overflowX:'auto', overflowY:'auto', width:'100%', position:'relative',margin:'0', height:(maxHeight-10)}}>
-                { activeTab === idx  && <ResultsPanel results={results} tabName={tabsOrder[activeTab]} /> }
+                { activeTab === idx  && tabData[item] !== undefined && tabData[item] !== null &&
+                    <ResultsPanel results={results} tabName={item} tabData={tabData[item]} /> }
+                { activeTab === idx  && tabData[item] === null &&
+                    <Grid container direction="column" alignItems="center" justifyContent="center" sx={{width:'100%', paddingTop:'20px'}} >
+                      <Typography gutterBottom variant="body2" >
+                        Unable to load {results.tabs[item]}
+                      </Typography>
+                      <Button size="small" onClick={() => onLoadTab(item)}>Retry</Button>
+                    </Grid>
+                }
+                { activeTab === idx  && tabData[item] === undefined &&
+                    <Grid container alignItems="center" justifyContent="center" sx={{width:'100%', paddingTop:'20px'}} >
+                      <CircularProgress variant="indeterminate" />
+                    </Grid>
+                }
               </TabPanel>
             )}
           )
@@ -147,6 +174,8 @@ export default function QueryResults({results, maxHeight, onDownload}) {
 QueryResults.propTypes = {
   maxHeight: PropTypes.number.isRequired,
   onDownload: PropTypes.func.isRequired,
+  onLoadTab: PropTypes.func.isRequired,
+  tabData: PropTypes.object.isRequired,
   results: PropTypes.shape({
     tabs: PropTypes.shape({
       order: PropTypes.arrayOf(PropTypes.string).isRequired,
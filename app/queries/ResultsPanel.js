@@ -15,9 +15,10 @@ import { UserSettingsContext } from '../serverInfo';
  * @function
  * @param {object} results The results of the performed query
  * @param {string} tabName The unique identifier of the tab to generate the panel for
+ * @param {object|string} tabData The contents of the tab
  * @returns {object} The panel UI to render
  */ 
-export default function ResultsPanel({results, tabName}) {
+export default function ResultsPanel({results, tabName, tabData}) {
   const theme = useTheme();
   const userSettings = React.useContext(UserSettingsContext);  // User display settings
   const apiRef = useGridApiRef(); // TODO: Auto size columns of grids using this api
@@ -31,7 +32,7 @@ export default function ResultsPanel({results, tabName}) {
 
     // Generate a DataGrid to display the results
     let colTitles = results.columns[tabName];
-    let colData = results[tabName];
+    let colData = tabData;
     let curData = colData;
     let columnGroupings = undefined;
 
@@ -199,7 +200,7 @@ export default function ResultsPanel({results, tabName}) {
 
     return {curTitles, curData, keys, columnGroupings}
 
-  }, [results, tabName]);
+  }, [results, tabName, tabData]);
 
   // Generate a textarea to display the results if we aren't generating a data grid
   if (results.columns[tabName] === undefined) {
@@ -207,7 +208,7 @@ export default function ResultsPanel({results, tabName}) {
         <textarea id={'query-results-'+tabName} readOnly wrap="off"
           style={{resize:"none", fontFamily:'monospace', fontSize:'small', fontWeight:'lighter', 
                   position:'absolute', left:0, top:0, right:0, bottom:0, padding:'5px 5px 10px 5px'}}
-          value={results[tabName]}
+          value={tabData}
         />
     );
   }
@@ -228,6 +229,7 @@ export default function ResultsPanel({results, tabName}) {
 
 ResultsPanel.propTypes = {
   tabName: PropTypes.string.isRequired,
+  tabData: PropTypes.oneOfType([PropTypes.string, PropTypes.arrayOf(PropTypes.object)]).isRequired,
   results: PropTypes.shape({
     columns:    PropTypes.objectOf(
                   PropTypes.oneOfType([
@@ -0,0 +1,91 @@
+#!python3
+"""This script migrates the SPARCd database to the 1.2 structure by adding the table holding
+the progress of upload moves"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+
+# The name of our script
+SCRIPT_NAME = os.path.basename(__file__)
+
+# Environment variable name for database
+DB_ENV_NAME = 'SPARCD_DB'
+# Environment database variable value
+DB_ENV_PATH = os.environ.get(DB_ENV_NAME, None)
+# Working database storage path
+DB_PATH_DEFAULT = tempfile.gettempdir()
+# Working database name
+DB_NAME_DEFAULT = 'sparcd.sqlite'
+
+if DB_ENV_PATH is not None:
+    DB_PATH_DEFAULT, DB_NAME_DEFAULT = os.path.split(DB_ENV_PATH)
+
+# Version number of the migrated DB instance
+DB_VERSION = '"1.2"'
+
+# Argparse-related definitions
+ARGPARSE_PROGRAM_DESC = 'Migrates the SPARCd main database to the 1.2 database structure'
+ARGPARSE_EPILOG = 'All database names are based upon the main database file name.\n' \
+                  f'Can set the {DB_ENV_NAME} environment variable to the full database path'
+ARGPARSE_DB_PATH_HELP = f'Path to the database file (default: {DB_PATH_DEFAULT})'
+ARGPARSE_DB_NAME_HELP = f'Name of the main database file (default: {DB_NAME_DEFAULT})'
+
+# The statements that bring the main database up to date
+MIGRATION_STMTS = ('CREATE TABLE IF NOT EXISTS upload_moves(id INTEGER PRIMARY KEY ASC, '
+                        's3_id TEXT NOT NULL, '
+                        'source_bucket TEXT NOT NULL, '
+                        'source_path TEXT NOT NULL, '
+                        'dest_bucket TEXT NOT NULL, '
+                        'last_copied TEXT DEFAULT NULL, '
+                        'num_copied INTEGER DEFAULT 0, '
+                        'copy_complete INTEGER DEFAULT 0, '
+                        'timestamp INTEGER)',
+                  )
+
+
+def get_arguments() -> str:
+    """ Returns the data from the parsed command line arguments
+    Returns:
+        The path of the main database
+    """
+    parser = argparse.ArgumentParser(prog=SCRIPT_NAME,
+                                     description=ARGPARSE_PROGRAM_DESC,
+                                     epilog=ARGPARSE_EPILOG)
+    parser.add_argument('db_path', help=ARGPARSE_DB_PATH_HELP, nargs='?', default=DB_PATH_DEFAULT)
+    parser.add_argument('db_name', help=ARGPARSE_DB_NAME_HELP, nargs='?', default=DB_NAME_DEFAULT)
+    args = parser.parse_args()
+
+    return os.path.join(args.db_path, args.db_name)
+
+
+def migrate_database(path: str) -> None:
+    """ Migrates the main database file
+    Arguments:
+        path: the path to the main database file
+    """
+    with sqlite3.connect(path) as conn:
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA busy_timeout=10000')
+        cursor = conn.cursor()
+
+        for cmd in MIGRATION_STMTS:
+            cursor.execute(cmd)
+
+        cursor.execute(f'UPDATE sparcd SET version={DB_VERSION}')
+        conn.commit()
+        cursor.close()
+
+    print(f'{SCRIPT_NAME}: Database migrated at {path}')
+
+
+if __name__ == '__main__':
+    main_db_path = get_arguments()
+
+    # Verify the main database exists
+    if not os.path.exists(main_db_path):
+        sys.exit(f'{SCRIPT_NAME}: Main database not found: {main_db_path}')
+
+    migrate_database(main_db_path)
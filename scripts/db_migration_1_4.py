@@ -0,0 +1,123 @@
+#!python3
+"""This script migrates the SPARCd databases to the 1.4 structure by adding the indexes used by
+the frequent lookups of tokens, uploads, messages, and sandbox uploads"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+
+# The name of our script
+SCRIPT_NAME = os.path.basename(__file__)
+
+# Environment variable name for database
+DB_ENV_NAME = 'SPARCD_DB'
+# Environment database variable value
+DB_ENV_PATH = os.environ.get(DB_ENV_NAME, None)
+# Working database storage path
+DB_PATH_DEFAULT = tempfile.gettempdir()
+# Working database name
+DB_NAME_DEFAULT = 'sparcd.sqlite'
+
+if DB_ENV_PATH is not None:
+    DB_PATH_DEFAULT, DB_NAME_DEFAULT = os.path.split(DB_ENV_PATH)
+
+# Version number of the migrated DB instance
+DB_VERSION = '"1.4"'
+
+# Argparse-related definitions
+ARGPARSE_PROGRAM_DESC = 'Migrates the SPARCd main and sandbox databases to the 1.4 ' \
+                        'database structure'
+ARGPARSE_EPILOG = 'All database names are based upon the main database file name.\n' \
+                  f'Can set the {DB_ENV_NAME} environment variable to the full database path'
+ARGPARSE_DB_PATH_HELP = f'Path to the database file (default: {DB_PATH_DEFAULT})'
+ARGPARSE_DB_NAME_HELP = f'Name of the main database file (default: {DB_NAME_DEFAULT})'
+
+# The statements that bring the main database up to date
+MIGRATION_STMTS = ('CREATE INDEX IF NOT EXISTS users_name ON users(s3_id, name)',
+                   'CREATE INDEX IF NOT EXISTS tokens_name ON tokens(name)',
+                   'CREATE INDEX IF NOT EXISTS table_timeout_name ON table_timeout(name)',
+                   'CREATE INDEX IF NOT EXISTS collections_coll_id ON collections(s3_id, coll_id)',
+                   'CREATE INDEX IF NOT EXISTS uploads_bucket ON uploads(s3_id, bucket)',
+                   'CREATE INDEX IF NOT EXISTS upload_images_upload ON upload_images(uploads_id)',
+                   'CREATE INDEX IF NOT EXISTS queries_token ON queries(token)',
+                   'CREATE INDEX IF NOT EXISTS image_edits_user ON ' \
+                        'image_edits(s3_id, username, updated)',
+                   'CREATE INDEX IF NOT EXISTS image_edits_file ON ' \
+                        'image_edits(s3_id, bucket, s3_file_path)',
+                   'CREATE INDEX IF NOT EXISTS collection_edits_user ON ' \
+                        'collection_edits(s3_id, username)',
+                   'CREATE INDEX IF NOT EXISTS admin_species_edits_user ON ' \
+                        'admin_species_edits(user_id, s3_id)',
+                   'CREATE INDEX IF NOT EXISTS admin_location_edits_user ON ' \
+                        'admin_location_edits(user_id, s3_id)',
+                   'CREATE INDEX IF NOT EXISTS admin_location_edits_loc_id ON ' \
+                        'admin_location_edits(s3_id, loc_id)',
+                   'CREATE INDEX IF NOT EXISTS messages_receiver ON messages(s3_id, receiver)',
+                   'CREATE INDEX IF NOT EXISTS db_locks_name ON db_locks(name)',
+                   'CREATE INDEX IF NOT EXISTS upload_moves_source ON ' \
+                        'upload_moves(s3_id, source_bucket, source_path)',
+                  )
+
+# The statements that bring the sandbox database up to date
+SANDBOX_MIGRATION_STMTS = ('CREATE INDEX IF NOT EXISTS sandbox_user ON ' \
+                                'sandbox(s3_id, name, bucket, s3_base_path)',
+                           'CREATE INDEX IF NOT EXISTS sandbox_upload_id ON ' \
+                                'sandbox(upload_id, name)',
+                           'CREATE INDEX IF NOT EXISTS sandbox_files_sandbox ON ' \
+                                'sandbox_files(sandbox_id, filename)',
+                           'CREATE INDEX IF NOT EXISTS sandbox_species_file ON ' \
+                                'sandbox_species(sandbox_file_id)',
+                           'CREATE INDEX IF NOT EXISTS sandbox_locations_file ON ' \
+                                'sandbox_locations(sandbox_file_id)',
+                          )
+
+def get_arguments() -> tuple:
+    """ Returns the data from the parsed command line arguments
+    Returns:
+        A tuple of the main database path and the sandbox database path
+    """
+    parser = argparse.ArgumentParser(prog=SCRIPT_NAME,
+                                     description=ARGPARSE_PROGRAM_DESC,
+                                     epilog=ARGPARSE_EPILOG)
+    parser.add_argument('db_path', help=ARGPARSE_DB_PATH_HELP, nargs='?', default=DB_PATH_DEFAULT)
+    parser.add_argument('db_name', help=ARGPARSE_DB_NAME_HELP, nargs='?', default=DB_NAME_DEFAULT)
+    args = parser.parse_args()
+
+    base, ext = os.path.splitext(args.db_name)
+    return os.path.join(args.db_path, args.db_name), \
+                                        os.path.join(args.db_path, base + '_sandbox' + ext)
+
+
+def migrate_database(path: str, stmts: tuple) -> None:
+    """ Migrates a database file
+    Arguments:
+        path: the path to the database file
+        stmts: the statements that bring the database up to date
+    """
+    with sqlite3.connect(path) as conn:
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA busy_timeout=10000')
+        cursor = conn.cursor()
+
+        for cmd in stmts:
+            cursor.execute(cmd)
+
+        cursor.execute(f'UPDATE sparcd SET version={DB_VERSION}')
+        conn.commit()
+        cursor.close()
+
+    print(f'{SCRIPT_NAME}: Database migrated at {path}')
+
+if __name__ == '__main__':
+    main_db_path, sandbox_db_path = get_arguments()
+
+    # Verify the databases exist
+    if not os.path.exists(main_db_path):
+        sys.exit(f'{SCRIPT_NAME}: Main database not found: {main_db_path}')
+    if not os.path.exists(sandbox_db_path):
+        sys.exit(f'{SCRIPT_NAME}: Sandbox database not found: {sandbox_db_path}')
+
+    migrate_database(main_db_path, MIGRATION_STMTS)
+    migrate_database(sandbox_db_path, SANDBOX_MIGRATION_STMTS)
@@ -0,0 +1,97 @@
+#!python3
+"""This script migrates the SPARCd database to the 1.5 structure by adding the image timestamp
+parts to the collection image table"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+
+# The name of our script
+SCRIPT_NAME = os.path.basename(__file__)
+
+# Environment variable name for database
+DB_ENV_NAME = 'SPARCD_DB'
+# Environment database variable value
+DB_ENV_PATH = os.environ.get(DB_ENV_NAME, None)
+# Working database storage path
+DB_PATH_DEFAULT = tempfile.gettempdir()
+# Working database name
+DB_NAME_DEFAULT = 'sparcd.sqlite'
+
+if DB_ENV_PATH is not None:
+    DB_PATH_DEFAULT, DB_NAME_DEFAULT = os.path.split(DB_ENV_PATH)
+
+# Version number of the migrated DB instance
+DB_VERSION = '"1.5"'
+
+# Argparse-related definitions
+ARGPARSE_PROGRAM_DESC = 'Migrates the SPARCd main database to the 1.5 database structure'
+ARGPARSE_EPILOG = 'All database names are based upon the main database file name.\n' \
+                  f'Can set the {DB_ENV_NAME} environment variable to the full database path'
+ARGPARSE_DB_PATH_HELP = f'Path to the database file (default: {DB_PATH_DEFAULT})'
+ARGPARSE_DB_NAME_HELP = f'Name of the main database file (default: {DB_NAME_DEFAULT})'
+
+# The columns added to the collection images table
+NEW_COLUMNS = ('year', 'month', 'day', 'hour', 'minute', 'day_of_year', 'day_of_week')
+
+# The statements that bring the main database up to date after the columns are added
+MIGRATION_STMTS = (# Saved images don't have the timestamp parts, force a reload
+                   'DELETE FROM collection_images',
+                   'DELETE FROM uploads',
+                   'DELETE FROM table_timeout',
+                  )
+
+
+def get_arguments() -> str:
+    """ Returns the data from the parsed command line arguments
+    Returns:
+        The path of the main database
+    """
+    parser = argparse.ArgumentParser(prog=SCRIPT_NAME,
+                                     description=ARGPARSE_PROGRAM_DESC,
+                                     epilog=ARGPARSE_EPILOG)
+    parser.add_argument('db_path', help=ARGPARSE_DB_PATH_HELP, nargs='?', default=DB_PATH_DEFAULT)
+    parser.add_argument('db_name', help=ARGPARSE_DB_NAME_HELP, nargs='?', default=DB_NAME_DEFAULT)
+    args = parser.parse_args()
+
+    return os.path.join(args.db_path, args.db_name)
+
+
+def migrate_database(path: str) -> None:
+    """ Migrates the main database file
+    Arguments:
+        path: the path to the main database file
+    """
+    with sqlite3.connect(path) as conn:
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA busy_timeout=10000')
+        cursor = conn.cursor()
+
+        # Columns can't be conditionally added, only add the missing ones
+        cursor.execute('PRAGMA table_info(collection_images)')
+        have_columns = [row[1] for row in cursor.fetchall()]
+        for one_column in NEW_COLUMNS:
+            if one_column not in have_columns:
+                cursor.execute(f'ALTER TABLE collection_images ADD COLUMN {one_column} ' \
+                                                                        'INTEGER DEFAULT NULL')
+
+        for cmd in MIGRATION_STMTS:
+            cursor.execute(cmd)
+
+        cursor.execute(f'UPDATE sparcd SET version={DB_VERSION}')
+        conn.commit()
+        cursor.close()
+
+    print(f'{SCRIPT_NAME}: Database migrated at {path}')
+
+
+if __name__ == '__main__':
+    main_db_path = get_arguments()
+
+    # Verify the main database exists
+    if not os.path.exists(main_db_path):
+        sys.exit(f'{SCRIPT_NAME}: Main database not found: {main_db_path}')
+
+    migrate_database(main_db_path)
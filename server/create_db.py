@@ -16,7 +16,7 @@ import s3_utils as s3u
 SCRIPT_NAME = os.path.basename(__file__)
 
 # Version number of DB instance
-DB_VERSION = '"1.0"'
+DB_VERSION = '"1.5"'
 
 # Environment variable name for database
 DB_ENV_NAME = 'SPARCD_DB'
@@ -108,6 +108,7 @@ def build_database(path: str, admin_info: tuple=None) -> None:
                 's3_id TEXT, ' \
                 'administrator INT DEFAULT 0, ' \
                 'auto_added INT DEFAULT 1)',
+             'CREATE INDEX users_name ON users(s3_id, name)',
              'CREATE TABLE tokens(id INTEGER PRIMARY KEY ASC, ' \
                 'name TEXT NOT NULL, ' \
                 'password TEXT NOT NULL, ' \
@@ -117,9 +118,11 @@ def build_database(path: str, admin_info: tuple=None) -> None:
                 'timestamp INTEGER, ' \
                 'client_ip TEXT, ' \
                 'user_agent TEXT)',
+             'CREATE INDEX tokens_name ON tokens(name)',
              'CREATE TABLE table_timeout(id INTEGER PRIMARY KEY ASC, ' \
                 'name TEXT NOT NULL, ' \
                 'timestamp INTEGER)',
+             'CREATE INDEX table_timeout_name ON table_timeout(name)',
              'CREATE TABLE collections(id INTEGER PRIMARY KEY ASC, ' \
                 's3_id TEXT NOT NULL, ' \
                 'hash_id TEXT UNIQUE,' # Hash of s3, collection id \
@@ -127,6 +130,7 @@ def build_database(path: str, admin_info: tuple=None) -> None:
                 'coll_id TEXT NOT NULL, ' \
                 'json TEXT NOT NULL, ' \
                 'timestamp INTEGER NOT NULL)',
+             'CREATE INDEX collections_coll_id ON collections(s3_id, coll_id)',
              'CREATE TABLE uploads(id INTEGER PRIMARY KEY ASC, ' \
                 's3_id TEXT NOT NULL, ' \
                 'bucket TEXT NOT NULL, ' \
@@ -134,6 +138,7 @@ def build_database(path: str, admin_info: tuple=None) -> None:
                 'name TEXT NOT NULL, ' \
                 'json TEXT DEFAULT "", -- Non-image data (see upload_images) ' + os.linesep + \
                 'timestamp INTEGER)',
+             'CREATE INDEX uploads_bucket ON uploads(s3_id, bucket)',
              'CREATE TABLE upload_images(id INTEGER PRIMARY KEY ASC, ' \
                 'uploads_id INTEGER NOT NULL, ' \
                 'hash_id TEXT UNIQUE, -- Hash of upload ID, img path ' + os.linesep + \
@@ -141,9 +146,36 @@ def build_database(path: str, admin_info: tuple=None) -> None:
                 'key TEXT NOT NULL, ' \
                 'json TEXT NOT NULL, ' \
                 'timestamp INTEGER)',
+             'CREATE INDEX upload_images_upload ON upload_images(uploads_id)',
+             'CREATE TABLE collection_images(id INTEGER PRIMARY KEY ASC, ' \
+                's3_id TEXT NOT NULL, ' \
+                'bucket TEXT NOT NULL, ' \
+                'upload TEXT NOT NULL, ' \
+                'name TEXT NOT NULL, ' \
+                's3_path TEXT NOT NULL, ' \
+                'timestamp TEXT DEFAULT NULL, -- Image timestamp as found ' + os.linesep + \
+                'epoch INTEGER DEFAULT NULL, -- Image timestamp in seconds ' + os.linesep + \
+                'year INTEGER DEFAULT NULL, -- Image timestamp parts ' + os.linesep + \
+                'month INTEGER DEFAULT NULL, ' \
+                'day INTEGER DEFAULT NULL, ' \
+                'hour INTEGER DEFAULT NULL, ' \
+                'minute INTEGER DEFAULT NULL, ' \
+                'day_of_year INTEGER DEFAULT NULL, ' \
+                'day_of_week INTEGER DEFAULT NULL, -- Monday is 0 ' + os.linesep + \
+                'location TEXT DEFAULT NULL, ' \
+                'scientific TEXT DEFAULT NULL, -- One row per image species ' + os.linesep + \
+                'common TEXT DEFAULT NULL, ' \
+                'count INTEGER DEFAULT NULL)',
+             'CREATE INDEX collection_images_upload ON collection_images(s3_id, bucket, upload)',
+             'CREATE INDEX collection_images_location ON ' \
+                'collection_images(s3_id, bucket, location)',
+             'CREATE INDEX collection_images_species ON ' \
+                'collection_images(s3_id, bucket, scientific)',
+             'CREATE INDEX collection_images_epoch ON collection_images(s3_id, bucket, epoch)',
              'CREATE TABLE queries(id INTEGER PRIMARY KEY ASC, ' \
                 'timestamp INTEGER, ' \
                 'token TEXT, path TEXT NOT NULL)',
+             'CREATE INDEX queries_token ON queries(token)',
              'CREATE TABLE image_edits(id INTEGER PRIMARY KEY ASC, ' \
                 's3_id TEXT NOT NULL, ' \
                 'bucket TEXT NOT NULL, ' \
@@ -156,6 +188,8 @@ def build_database(path: str, admin_info: tuple=None) -> None:
                 'updated INTEGER DEFAULT 0,' # Various stages of update (including S3) \
                 'request_id TEXT, ' # Used to keep track of requests \
                 'timestamp INTEGER)',
+             'CREATE INDEX image_edits_user ON image_edits(s3_id, username, updated)',
+             'CREATE INDEX image_edits_file ON image_edits(s3_id, bucket, s3_file_path)',
              'CREATE TABLE collection_edits(id INTEGER PRIMARY KEY ASC, ' \
                 's3_id TEXT NOT NULL, ' \
                 'bucket TEXT NOT NULL, ' \
@@ -167,6 +201,7 @@ def build_database(path: str, admin_info: tuple=None) -> None:
                 'loc_ele REAL NOT NULL, ' \
                 'updated INTEGER DEFAULT 0, ' \
                 'timestamp INTEGER)',
+             'CREATE INDEX collection_edits_user ON collection_edits(s3_id, username)',
              'CREATE TABLE admin_species_edits(id INTEGER PRIMARY KEY ASC, ' \
                 's3_id TEXT NOT NULL, ' \
                 'user_id INTEGER NOT NULL,'\
@@ -177,6 +212,7 @@ def build_database(path: str, admin_info: tuple=None) -> None:
                 'iconURL TEXT NOT NULL, ' \
                 's3_updated INTEGER DEFAULT 0,' \
                 'timestamp INTEGER)',
+             'CREATE INDEX admin_species_edits_user ON admin_species_edits(user_id, s3_id)',
              'CREATE TABLE admin_location_edits(id INTEGER PRIMARY KEY ASC, ' \
                 's3_id TEXT NOT NULL, '\
                 'user_id INTEGER NOT NULL,'\
@@ -191,6 +227,8 @@ def build_database(path: str, admin_info: tuple=None) -> None:
                 'location_updated INTEGER DEFAULT 0, ' \
                 'loc_description TEXT DEFAULT NULL, ' \
                 'timestamp INTEGER)',
+             'CREATE INDEX admin_location_edits_user ON admin_location_edits(user_id, s3_id)',
+             'CREATE INDEX admin_location_edits_loc_id ON admin_location_edits(s3_id, loc_id)',
              'CREATE TABLE messages(id INTEGER PRIMARY KEY ASC, '\
                 's3_id TEXT NOT NULL, ' \
                 'sender TEXT NOT NULL, ' \
@@ -202,10 +240,27 @@ def build_database(path: str, admin_info: tuple=None) -> None:
                 'prev_id INTEGER DEFAULT NULL, ' \
                 'deleted INTEGER DEFAULT 0, ' \
                 'timestamp INTEGER NOT NULL)',
+             'CREATE INDEX messages_receiver ON messages(s3_id, receiver)',
              'CREATE TABLE db_locks(id INTEGER PRIMARY KEY ASC, ' \
                 'name TEXT NOT NULL, ' \
                 'value INTEGER DEFAULT NULL, ' \
                 'timestamp INTEGER)',
+             'CREATE INDEX db_locks_name ON db_locks(name)',
+             'CREATE TABLE upload_moves(id INTEGER PRIMARY KEY ASC, ' \
+                's3_id TEXT NOT NULL, ' \
+                'source_bucket TEXT NOT NULL, ' \
+                'source_path TEXT NOT NULL, ' \
+                'dest_bucket TEXT NOT NULL, ' \
+                'last_copied TEXT DEFAULT NULL, ' \
+                'num_copied INTEGER DEFAULT 0, ' \
+                'copy_complete INTEGER DEFAULT 0, ' \
+                'timestamp INTEGER)',
+             'CREATE INDEX upload_moves_source ON ' \
+                'upload_moves(s3_id, source_bucket, source_path)',
+             'CREATE TABLE db_generations(id INTEGER PRIMARY KEY ASC, ' \
+                'name TEXT UNIQUE NOT NULL, ' \
+                'generation INTEGER DEFAULT 0, ' \
+                'timestamp INTEGER)',
             'CREATE TABLE sparcd(version TEXT)'
         )
     version_stmt = f'INSERT INTO sparcd(version) VALUES({DB_VERSION})'
@@ -259,6 +314,8 @@ def build_sandbox_database(path: str) -> None:
                 'recovered INT DEFAULT 0, ' \
                 'timestamp INTEGER, ' \
                 'upload_id TEXT DEFAULT NULL)',
+             'CREATE INDEX sandbox_user ON sandbox(s3_id, name, bucket, s3_base_path)',
+             'CREATE INDEX sandbox_upload_id ON sandbox(upload_id, name)',
              'CREATE TABLE sandbox_files(id INTEGER PRIMARY KEY ASC, ' \
                 'sandbox_id INTEGER NOT NULL, '\
                 'filename TEXT NOT NULL, ' \
@@ -268,17 +325,20 @@ def build_sandbox_database(path: str) -> None:
                 'created_timestamp TEXT DEFAULT NULL,' \
                 'original_filename TEXT DEFAULT NULL, ' \
                 'timestamp INTEGER)',
+             'CREATE INDEX sandbox_files_sandbox ON sandbox_files(sandbox_id, filename)',
              'CREATE TABLE sandbox_species(id INTEGER PRIMARY KEY ASC, ' \
                 'sandbox_file_id INTEGER NOT NULL, ' \
                 'obs_date TEXT, ' \
                 'obs_common TEXT, ' \
                 'obs_scientific TEXT, ' \
                 'obs_count INTEGER)',
+             'CREATE INDEX sandbox_species_file ON sandbox_species(sandbox_file_id)',
              'CREATE TABLE sandbox_locations(id INTEGER PRIMARY KEY ASC, '\
                 'sandbox_file_id INTEGER NOT NULL, ' \
                 'loc_name TEXT, ' \
                 'loc_id TEXT, ' \
                 'loc_elevation REAL)',
+             'CREATE INDEX sandbox_locations_file ON sandbox_locations(sandbox_file_id)',
             'CREATE TABLE sparcd(version TEXT)'
         )
     version_stmt = f'INSERT INTO sparcd(version) VALUES({DB_VERSION})'
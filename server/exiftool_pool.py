@@ -0,0 +1,251 @@
+""" Pool of long-running exiftool processes used to read and write image metadata """
+
+import atexit
+import itertools
+import os
+import queue
+import select
+import subprocess
+import threading
+from typing import Optional
+
+# Environment variable name for the number of exiftool processes each server process runs
+ENV_NAME_EXIFTOOL_WORKERS = 'SPARCD_EXIFTOOL_WORKERS'
+# Environment variable name for the number of server threads (used by gunicorn)
+ENV_NAME_SERVER_THREADS = 'SERVER_THREADS'
+# Default number of exiftool processes each server process runs
+DEFAULT_EXIFTOOL_WORKERS = 4
+# The number of exiftool processes each server process runs. Defaults to the number of
+# server threads so that each request thread can have its own process
+EXIFTOOL_WORKERS = int(os.environ.get(ENV_NAME_EXIFTOOL_WORKERS,
+                            os.environ.get(ENV_NAME_SERVER_THREADS, DEFAULT_EXIFTOOL_WORKERS)))
+# Number of seconds to wait for exiftool to finish a command before giving up on the process
+EXIFTOOL_TIMEOUT_SEC = 60
+# Number of bytes to read from an exiftool process at a time
+EXIFTOOL_READ_SIZE = 64 * 1024
+
+# The command that starts a long-running exiftool process reading its arguments from stdin
+EXIFTOOL_STAY_OPEN_CMD = ('exiftool', '-stay_open', 'True', '-@', '-')
+# The prefix of exiftool's error messages
+EXIFTOOL_ERROR_PREFIX = b'Error'
+
+
+class ExifToolWorker:
+    """ A long-running exiftool process that's sent commands through its stdin """
+
+    def __init__(self):
+        """ Initializer """
+        self._proc = None
+        self._command_ids = itertools.count(1)
+        self._pending = {}
+
+    def is_running(self) -> bool:
+        """ Returns whether or not the exiftool process is running """
+        return self._proc is not None and self._proc.poll() is None
+
+    def start(self) -> None:
+        """ Starts the exiftool process, stopping any running one first """
+        self.stop()
+        self._pending = {}
+        # pylint: disable=consider-using-with
+        self._proc = subprocess.Popen(EXIFTOOL_STAY_OPEN_CMD,
+                                      stdin=subprocess.PIPE,
+                                      stdout=subprocess.PIPE,
+                                      stderr=subprocess.PIPE)
+
+    def stop(self) -> None:
+        """ Stops the exiftool process """
+        if self._proc is None:
+            return
+
+        proc = self._proc
+        self._proc = None
+        try:
+            if proc.poll() is None:
+                proc.stdin.write(b'-stay_open\nFalse\n')
+                proc.stdin.flush()
+                proc.wait(timeout=5)
+        except (OSError, ValueError, subprocess.TimeoutExpired):
+            proc.kill()
+            proc.wait()
+        finally:
+            for one_pipe in (proc.stdin, proc.stdout, proc.stderr):
+                try:
+                    one_pipe.close()
+                except OSError:
+                    pass
+
+    def _read_outputs(self, marker: bytes) -> tuple:
+        """ Reads the standard output and standard error of the exiftool process until the
+            marker is found in both
+        Arguments:
+            marker: the bytes that end the output
+        Return:
+            Returns the standard output and the standard error that were read, without the marker
+        Notes:
+            Both pipes are read as the output arrives so that exiftool isn't blocked writing to
+            one while the other is being waited on. Anything read after the marker is kept for
+            the next call. OSError is raised if the process ends or doesn't respond in time
+        """
+        data = {one_pipe.fileno(): self._pending.get(one_pipe.fileno(), b'') \
+                                        for one_pipe in (self._proc.stdout, self._proc.stderr)}
+        while any(marker not in one_data for one_data in data.values()):
+            ready, _, _ = select.select(list(data), [], [], EXIFTOOL_TIMEOUT_SEC)
+            if not ready:
+                raise OSError('Timed out waiting for exiftool to respond')
+            for one_fd in ready:
+                chunk = os.read(one_fd, EXIFTOOL_READ_SIZE)
+                if not chunk:
+                    raise OSError('The exiftool process ended unexpectedly')
+                data[one_fd] += chunk
+
+        outputs = []
+        for one_fd, one_data in data.items():
+            output, _, remaining = one_data.partition(marker)
+            self._pending[one_fd] = remaining.lstrip(b'\r\n')
+            outputs.append(output)
+
+        return tuple(outputs)
+
+    def execute(self, commands: tuple) -> list:
+        """ Runs a batch of exiftool commands
+        Arguments:
+            commands: the list of commands to run, each a list of exiftool arguments
+        Return:
+            Returns a list of the standard output and the standard error bytes of each command
+        Notes:
+            OSError is raised if there's a problem with the process. Arguments can't contain
+            new lines since each argument is written on a separate line
+        """
+        if not self.is_running():
+            self.start()
+
+        # Write all the commands before reading any output
+        markers = []
+        arg_lines = []
+        for one_command in commands:
+            marker = str(next(self._command_ids))
+            markers.append(('{ready' + marker + '}').encode('utf-8'))
+            arg_lines.extend(one_command)
+            arg_lines.extend(('-echo4', '{ready' + marker + '}', '-execute' + marker))
+        try:
+            self._proc.stdin.write(('\n'.join(arg_lines) + '\n').encode('utf-8'))
+            self._proc.stdin.flush()
+        except ValueError as ex:
+            raise OSError('The exiftool process is closed') from ex
+
+        return [self._read_outputs(one_marker) for one_marker in markers]
+
+
+class ExifToolPool:
+    """ Pool of long-running exiftool processes. Processes are started when first needed and
+        restarted if they stop working
+    """
+
+    def __init__(self, max_workers: int=EXIFTOOL_WORKERS):
+        """ Initializer
+        Arguments:
+            max_workers: the maximum number of exiftool processes to run
+        """
+        self._max_workers = max(1, max_workers)
+        self._idle = queue.LifoQueue()
+        self._workers = []
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> ExifToolWorker:
+        """ Returns an exiftool worker to use, waiting for one to be free if needed """
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if len(self._workers) < self._max_workers:
+                worker = ExifToolWorker()
+                self._workers.append(worker)
+                return worker
+
+        return self._idle.get()
+
+    def _release(self, worker: ExifToolWorker) -> None:
+        """ Returns a worker to the pool
+        Arguments:
+            worker: the worker to return
+        """
+        self._idle.put(worker)
+
+    def run_batch(self, commands: tuple) -> list:
+        """ Runs a batch of exiftool commands with one exiftool process
+        Arguments:
+            commands: the list of commands to run, each a list of exiftool arguments (without
+                      the leading "exiftool")
+        Return:
+            Returns a list of subprocess.CompletedProcess instances, one for each command. The
+            return code is 1 if exiftool reported an error
+        Notes:
+            OSError is raised if the exiftool process fails. The failed process is stopped and
+            a new one is started the next time it's needed. The batch isn't tried again since
+            some of the commands may have already updated their files
+        """
+        worker = self._acquire()
+        try:
+            outputs = worker.execute(commands)
+        except OSError as ex:
+            print(f'Stopping exiftool process after error: {ex}', flush=True)
+            worker.stop()
+            raise
+        finally:
+            self._release(worker)
+
+        return [subprocess.CompletedProcess(['exiftool', *one_command],
+                            1 if any(one_line.startswith(EXIFTOOL_ERROR_PREFIX) \
+                                                    for one_line in stderr.splitlines()) else 0,
+                            stdout=stdout, stderr=stderr)
+                    for one_command, (stdout, stderr) in zip(commands, outputs)]
+
+    def run(self, args: tuple) -> subprocess.CompletedProcess:
+        """ Runs an exiftool command
+        Arguments:
+            args: the exiftool arguments (without the leading "exiftool")
+        Return:
+            Returns the subprocess.CompletedProcess of the command
+        Notes:
+            subprocess.CalledProcessError is raised if exiftool reports an error or the exiftool
+            process fails, the same as subprocess.run() with check=True
+        """
+        try:
+            res = self.run_batch((args,))[0]
+        except OSError as ex:
+            raise subprocess.CalledProcessError(-1, ['exiftool', *args],
+                                                stderr=str(ex).encode('utf-8')) from ex
+        res.check_returncode()
+        return res
+
+    def close(self) -> None:
+        """ Stops all the exiftool processes """
+        with self._lock:
+            for one_worker in self._workers:
+                one_worker.stop()
+
+
+# The exiftool processes used by this server process
+EXIFTOOL_POOL: Optional[ExifToolPool] = None
+EXIFTOOL_POOL_LOCK = threading.Lock()
+
+
+def exiftool_pool() -> ExifToolPool:
+    """ Returns the pool of exiftool processes for this server process
+    Return:
+        The exiftool pool
+    Notes:
+        The pool is created on first use so that each gunicorn worker has its own processes
+    """
+    # pylint: disable=global-statement
+    global EXIFTOOL_POOL
+
+    with EXIFTOOL_POOL_LOCK:
+        if EXIFTOOL_POOL is None:
+            EXIFTOOL_POOL = ExifToolPool()
+            atexit.register(EXIFTOOL_POOL.close)
+
+    return EXIFTOOL_POOL
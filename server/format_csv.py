@@ -2,6 +2,46 @@
 
 from text_formatters.results import Results
 
+# The formats of the image dates keyed by their raw results column name
+RAW_DATE_FORMATS = {'dateMDY': '%B %d, %Y',
+                    'dateSMDY': '%b %d, %Y',
+                    'dateNMDY': '%m/%d/%Y',
+                    'dateDMY': '%d %B %Y',
+                    'dateDSMY': '%d %b %Y',
+                    'dateDNMY': '%d/%m/%Y',
+                   }
+# The formats of the image times keyed by their raw results column name
+RAW_TIME_FORMATS = {'time24': '%H:%M',
+                    'time24s': '%H:%M:%S',
+                    'time12': '%I:%M %p',
+                    'time12s': '%I:%M:%S %p',
+                   }
+
+
+def __get_formatted_timestamp(image_dt, date_cache: dict, time_cache: dict) -> dict:
+    """ Returns the formatted dates and times of an image timestamp
+    Arguments:
+        image_dt: the timestamp of the image
+        date_cache: the formatted dates that have already been generated keyed by date
+        time_cache: the formatted times that have already been generated keyed by time
+    Return:
+        Returns the dict of formatted dates and times keyed by their column name
+    Notes:
+        Images taken on the same day, or at the same time of day, share their formatted values
+        instead of formatting them for every image
+    """
+    date_key = image_dt.date()
+    if date_key not in date_cache:
+        date_cache[date_key] = {name: image_dt.strftime(fmt) \
+                                                    for name, fmt in RAW_DATE_FORMATS.items()}
+
+    time_key = (image_dt.hour, image_dt.minute, image_dt.second)
+    if time_key not in time_cache:
+        time_cache[time_key] = {name: image_dt.strftime(fmt) \
+                                                    for name, fmt in RAW_TIME_FORMATS.items()}
+
+    return date_cache[date_key] | time_cache[time_key]
+
 
 def get_csv_raw(results: Results) -> str:
     """ Returns the "raw" results as CSV-compatible data
@@ -12,6 +52,8 @@ def get_csv_raw(results: Results) -> str:
     """
     # pylint: disable=too-many-locals
     csv_results = []
+    date_cache = {}
+    time_cache = {}
     for one_image in results.get_images():
         image_loc = results.get_image_location(one_image['loc'])
         loc_name = image_loc['nameProperty'] if image_loc and 'nameProperty' in image_loc else ''
@@ -28,16 +70,7 @@ def get_csv_raw(results: Results) -> str:
         cur_image = {
                     'image': one_image['name'],
                     'date': one_image['image_dt'].isoformat(),
-                    'dateMDY':  one_image['image_dt'].strftime('%B %d, %Y'),
-                    'dateSMDY': one_image['image_dt'].strftime('%b %d, %Y'),
-                    'dateNMDY': one_image['image_dt'].strftime('%m/%d/%Y'),
-                    'dateDMY': one_image['image_dt'].strftime('%d %B %Y'),
-                    'dateDSMY': one_image['image_dt'].strftime('%d %b %Y'),
-                    'dateDNMY': one_image['image_dt'].strftime('%d/%m/%Y'),
-                    'time24': one_image['image_dt'].strftime('%H:%M'),
-                    'time24s': one_image['image_dt'].strftime('%H:%M:%S'),
-                    'time12': one_image['image_dt'].strftime('%I:%M %p'),
-                    'time12s': one_image['image_dt'].strftime('%I:%M:%S %p'),
+                    **__get_formatted_timestamp(one_image['image_dt'], date_cache, time_cache),
                     'locName': loc_name,
                     'locId': loc_id,
                     'locX': loc_x,
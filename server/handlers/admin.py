@@ -876,7 +876,13 @@ def handle_move_upload(db:SPARCdDatabase, user_info: UserInfo, s3_info: S3Info,
     # Move the data
     print(f'MOVE UPLOAD user={user_info.name} source: {src_coll["bucket"]} {start_path}  ' \
                 f'dest: {dst_bucket} {path_func(start_path)}',flush=True)
-    res = s3u.move_upload(s3_info, src_coll['bucket'], dst_bucket, start_path, path_func)
+    progress = db.get_upload_move(s3_info.id, src_coll['bucket'], start_path, dst_bucket)
+    res = s3u.move_upload(s3_info, src_coll['bucket'], dst_bucket, start_path, path_func,
+                          progress,
+                          lambda cur_progress: db.save_upload_move(s3_info.id, src_coll['bucket'],
+                                                            start_path, dst_bucket, cur_progress))
+    if res is True:
+        db.remove_upload_move(s3_info.id, src_coll['bucket'], start_path, dst_bucket)
 
     # Update the collections to reflect the changed
     __update_move_collections(db, s3_info, src_coll, dst_coll)
@@ -95,7 +95,7 @@ def __get_new_login(db: SPARCdDatabase, s3_info: S3Info, params: LoginParams,
 
     # Get whether the endpoint is setup for SPARCd and if it needs repairs
     needs_repair, _ = S3AdminConnection.needs_repair(s3_info)
-    new_instance = not s3u.sparcd_config_exists(minio)
+    new_instance = not s3u.sparcd_config_exists(minio, s3_info.uri)
 
     # Save information into the database - also cleans up old tokens if there's too many
     new_key = uuid.uuid4().hex
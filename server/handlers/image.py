@@ -148,6 +148,7 @@ def __update_metadata_and_collection(db: SPARCdDatabase,
                                      s3_info: S3Info,
                                      s3_bucket: str,
                                      s3_path: str,
+                                     edited_files_info: list,
                                      params: ImageAllEditedParams) -> tuple:
     """ Updates upload metadata and collection after image edits
     Arguments:
@@ -155,13 +156,23 @@ def __update_metadata_and_collection(db: SPARCdDatabase,
         s3_info: the S3 endpoint information
         s3_bucket: the S3 bucket
         s3_path: the S3 path
+        edited_files_info: the list of edited file information
         params: the images all edited parameters
     Return:
         Returns a tuple of (updated, kept_urls) booleans
+    Notes:
+        The saved upload images and collection are updated with the changes. They're only
+        reloaded from S3 if they aren't saved
     """
-    all_images, kept_urls = sdc.get_upload_images(db, s3_bucket, params.coll_id,
-                                                  params.upload_id, s3_info,
-                                                  force_refresh=True, keep_image_url=True)
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    all_images = sdc.upload_images_species_update(db, s3_info.id, params.coll_id, params.upload_id,
+                                    {one_file['s3_path']: one_file['species'] \
+                                                            for one_file in edited_files_info})
+    kept_urls = True
+    if all_images is None:
+        all_images, kept_urls = sdc.get_upload_images(db, s3_bucket, params.coll_id,
+                                                      params.upload_id, s3_info,
+                                                      force_refresh=True, keep_image_url=True)
 
     image_with_species = sum(1 for one_image in all_images
                              if 'species' in one_image and len(one_image['species']) > 0)
@@ -171,7 +182,8 @@ def __update_metadata_and_collection(db: SPARCdDatabase,
 
     updated, _ = S3UploadConnection.update_upload_metadata(s3_info, s3_bucket, s3_path,
                                                      edit_comment, image_with_species)
-    if updated:
+    if updated and not sdc.collection_upload_refresh(db, s3_info, s3_bucket, params.coll_id,
+                                                                                    s3_path):
         updated_collection = S3CollectionConnection.get_collection_info(s3_info, s3_bucket)
         if updated_collection:
             sdc.collection_update(db, s3_info.id, sdupu.normalize_collection(updated_collection))
@@ -319,7 +331,7 @@ def handle_images_all_edited(db: SPARCdDatabase, user_info: UserInfo, s3_info: S
 
     # Update the upload metadata and and save the collection information
     updated, kept_urls = __update_metadata_and_collection(db, s3_info, s3_bucket,
-                                                          s3_path, params)
+                                                          s3_path, edited_files_info, params)
 
     return tuple([bool(updated), kept_urls])
 
@@ -5,7 +5,6 @@ import datetime
 import json
 import os
 import tempfile
-import threading
 from typing import Optional
 import uuid
 
@@ -13,16 +12,15 @@ from flask import request, Response
 
 import query_helpers
 import query_utils
+from query_results import QueryResults
 import sparcd_collections as sdc
 from sparcd_db import SPARCdDatabase
-import sparcd_file_utils as sdfu
 import sparcd_utils as sdu
 import sparcd_location_utils as sdlu
 from spd_types.userinfo import UserInfo
 from spd_types.s3info import S3Info
 from s3.s3_access_helpers import SPECIES_JSON_FILE_NAME, SPARCD_PREFIX
 import s3_utils as s3u
-from text_formatters.results import Results
 import zip_utils as zu
 
 # Default query interval
@@ -36,6 +34,13 @@ class RunQueryContext:
     interval: int
     temp_species_filename: str
 
+@dataclass
+class QueryTabParams:
+    """ Contains the parameters for fetching a query result tab """
+    token: str
+    tab_name: str
+    timeout_sec: int
+
 @dataclass
 class QueryDownloadParams:
     """ Contains the parameters for downloading query result calls """
@@ -47,63 +52,57 @@ class QueryDownloadParams:
 
 def __build_download_response(s3_info: S3Info,
                                user_info: UserInfo,
-                               query_results: dict,
-                               tab: str,
-                               target: str) -> Response:
+                               query_results: QueryResults,
+                               params: QueryDownloadParams) -> Response:
     """ Builds the download response for a query
     Arguments:
         s3_info: the S3 endpoint information
         user_info: the user information
         query_results: the query results
-        tab: the tab name
-        target: the target filename
+        params: the download parameters
     Return:
         Returns a Flask Response for the download, or None if the tab is not recognised
     """
-    col_mods = query_results['columnsMods'].get(tab)
+    tab = params.tab_name
+    target = params.target
+    tab_contents = query_results.get_tab(tab, params.timeout_sec)
+    if tab_contents is None:
+        return None
+    col_mods = query_results.info['columnsMods'].get(tab) if query_results.info else None
 
     match tab:
         case 'DrSandersonOutput':
             dl_name = target or 'drsanderson.txt'
-            content = query_results[tab]
+            content = tab_contents
             mimetype = 'text/text'
 
         case 'DrSandersonAllPictures':
             dl_name = target or 'drsanderson_all.csv'
-            content = query_utils.query_allpictures2csv(query_results[tab],
+            content = query_utils.query_allpictures2csv(tab_contents,
                                                         user_info.settings, col_mods)
             mimetype = 'application/csv'
 
         case 'csvRaw':
             dl_name = target or 'allresults.csv'
-            content = query_utils.query_raw2csv(query_results[tab],
+            content = query_utils.query_raw2csv(tab_contents,
                                                 user_info.settings, col_mods)
             mimetype = 'text/csv'
 
         case 'csvLocation':
             dl_name = target or 'locations.csv'
-            content = query_utils.query_location2csv(query_results[tab],
+            content = query_utils.query_location2csv(tab_contents,
                                                      user_info.settings, col_mods)
             mimetype = 'text/csv'
 
         case 'csvSpecies':
             dl_name = target or 'species.csv'
-            content = query_utils.query_species2csv(query_results[tab],
+            content = query_utils.query_species2csv(tab_contents,
                                                     user_info.settings, col_mods)
             mimetype = 'text/csv'
 
         case 'imageDownloads':
             dl_name = target or 'allimages.gz'
-            read_fd, write_fd = os.pipe()
-            # pylint: disable=consider-using-with
-            download_finished_lock = threading.Semaphore(1)
-            download_finished_lock.acquire()
-            dl_thread = threading.Thread(target=zu.generate_zip,
-                                         args=(s3_info,
-                                               [row['name'] for row in query_results[tab]],
-                                               write_fd, download_finished_lock))
-            dl_thread.start()
-            content = zu.zip_iterator(read_fd)
+            content = zu.zip_iterator(s3_info, [row['name'] for row in tab_contents])
             mimetype = 'application/gzip'
 
         case _:
@@ -149,7 +148,7 @@ def __get_request_params() -> tuple:
 
 
 def __run_query(db: SPARCdDatabase, user_info: UserInfo, s3_info: S3Info,
-                                                            context: RunQueryContext) -> Results:
+                                                        context: RunQueryContext) -> QueryResults:
     """ Gets the results from the query
     Arguments:
         db: the database instance
@@ -180,7 +179,7 @@ def __run_query(db: SPARCdDatabase, user_info: UserInfo, s3_info: S3Info,
                                          s3_info)
     cur_locations = sdlu.load_locations(s3_info)
 
-    return Results(all_results, cur_species, cur_locations, s3_info, user_info.settings,
+    return QueryResults(all_results, cur_species, cur_locations, s3_info, user_info.settings,
                                                                                 context.interval)
 
 
@@ -209,7 +208,7 @@ def handle_query(db: SPARCdDatabase, user_info: UserInfo, s3_info: S3Info, token
         print('NO FILTERS SPECIFIED')
         return None
 
-    results = __run_query(db,
+    query_results = __run_query(db,
                           user_info,
                           s3_info,
                           RunQueryContext(filters=filters,
@@ -218,22 +217,41 @@ def handle_query(db: SPARCdDatabase, user_info: UserInfo, s3_info: S3Info, token
                                          )
                          )
 
-    # Format and return the results
+    # Format and return the results. The tabs are formatted when they're requested
     results_id = uuid.uuid4().hex
-    return_info = query_helpers.query_output(results, results_id)
+    return_info = query_helpers.query_output(query_results.results, results_id)
+    query_results.info = return_info
 
     # Check for old queries and clean them up
     sdu.cleanup_old_queries(db, token)
 
-    # Save the query for lookup when downloading results
+    # Save the query for lookup when fetching tabs and downloading results
     save_path = os.path.join(tempfile.gettempdir(), SPARCD_PREFIX + 'query_' + \
                                                                 results_id + '.json')
-    sdfu.save_timed_info(save_path, return_info)
+    query_results.save(save_path)
     db.save_query_path(token, save_path)
 
     return return_info
 
 
+def __load_query_results(db: SPARCdDatabase, s3_info: S3Info, token: str,
+                                                    timeout_sec: int) -> Optional[QueryResults]:
+    """ Loads the query results associated with the token
+    Arguments:
+        db: the database instance
+        s3_info: the S3 endpoint information
+        token: the session token the query is associated with
+        timeout_sec: the timeout of the query results
+    Return:
+        Returns the query results or None if they can't be found
+    """
+    query_info = db.get_query(token)
+    if not query_info:
+        return None
+
+    return QueryResults.load(query_info[0], s3_info, timeout_sec)
+
+
 def handle_query_download(db:SPARCdDatabase, user_info: UserInfo, s3_info: S3Info,
                                                             params: QueryDownloadParams) -> tuple:
     """ Returns the requested download from a query
@@ -247,17 +265,29 @@ def handle_query_download(db:SPARCdDatabase, user_info: UserInfo, s3_info: S3Inf
         (True) or now (False), the Flask Response to return as-is upon success and None otherwise
     """
 
-    # Get the query information
-    query_info_path, _ = db.get_query(params.token)
-
-    # Try and load the query results
-    query_results = sdfu.load_timed_info(query_info_path, params.timeout_sec)
+    query_results = __load_query_results(db, s3_info, params.token, params.timeout_sec)
     if not query_results:
         return False, None
 
     return True, __build_download_response(s3_info,
                                             user_info,
                                             query_results,
-                                            params.tab_name,
-                                            params.target
+                                            params
                                            )
+
+
+def handle_query_tab(db:SPARCdDatabase, s3_info: S3Info, params: QueryTabParams) -> tuple:
+    """ Returns the contents of a query tab, formatting it if this is the first request for it
+    Arguments:
+        db: the database instance
+        s3_info: the S3 endpoint information
+        params: additional parameters for this request
+    Return:
+        A tuple continaing a bool indicating that we were able to load the stored query information
+        (True) or now (False), and the tab contents upon success and None otherwise
+    """
+    query_results = __load_query_results(db, s3_info, params.token, params.timeout_sec)
+    if not query_results:
+        return False, None
+
+    return True, query_results.get_tab(params.tab_name, params.timeout_sec)
@@ -308,11 +308,14 @@ def handle_upload_location(db: SPARCdDatabase, user_info: UserInfo, s3_info: S3I
 
     __update_camtrap_files(s3_info, bucket, upload_path, loc_params)
 
-    # Update the collection to reflect the new upload location
-    updated_collection = S3CollectionConnection.get_collection_info(s3_info, bucket)
-    if updated_collection:
-        # Update the collection entry in the database
-        sdc.collection_update(db, s3_info.id, sdupu.normalize_collection(updated_collection))
+    # Update the collection to reflect the new upload location, only reloading the whole
+    # collection if the upload can't be updated on its own
+    if not sdc.collection_upload_refresh(db, s3_info, bucket, loc_params.upload.coll_id,
+                                                                                upload_path):
+        updated_collection = S3CollectionConnection.get_collection_info(s3_info, bucket)
+        if updated_collection:
+            # Update the collection entry in the database
+            sdc.collection_update(db, s3_info.id, sdupu.normalize_collection(updated_collection))
 
     return True
 
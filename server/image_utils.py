@@ -10,6 +10,8 @@ from dateutil import parser
 from dateutil.parser import ParserError
 from dateutil.relativedelta import relativedelta
 
+from exiftool_pool import exiftool_pool
+
 EXIFTOOL_ORIGINAL_DATE = 'DateTimeOriginal'
 EXIFTOOL_MODIFY_DATE = 'ModifyDate'
 EXIFTOOL_CREATE_DATE = 'CreateDate'
@@ -287,8 +289,7 @@ def get_image_timestamp(image_path: str) -> Optional[datetime.datetime]:
     tries = 0
     while tries < MAX_TRIES_GETTIME:
         try:
-            cmd = ["exiftool", "-time:all", "-a", "-G0:1", "-s", image_path]
-            res = subprocess.run(cmd, capture_output=True, check=True)
+            res = exiftool_pool().run(["-time:all", "-a", "-G0:1", "-s", image_path])
             break
         except subprocess.CalledProcessError as ex:
             if tries == MAX_TRIES_GETTIME - 1:
@@ -322,8 +323,7 @@ def get_embedded_image_info(image_path: str) -> Optional[tuple]:
     tries = 0
     while tries < MAX_TRIES_GEII:
         try:
-            cmd = ["exiftool", "-U", "-v3", image_path]
-            res = subprocess.run(cmd, capture_output=True, check=True)
+            res = exiftool_pool().run(["-U", "-v3", image_path])
             break
         except subprocess.CalledProcessError as ex:
             if tries == MAX_TRIES_GEII - 1:
@@ -482,25 +482,25 @@ def update_timestamp(local_path: str, time_adjust: relativedelta) -> Optional[da
                         ':'.join([f'{abs(val):02d}' if val < 0 else '00' for \
                             val in (time_adjust.hour, time_adjust.minute, time_adjust.second)])
     # Update the timestamps using the relative values
+    cmds = []
+    if pos_update_str:
+        cmds.append([f'-time:all+="{pos_update_str}"', local_path])
+    if neg_update_str:
+        cmds.append([f'-time:all-="{neg_update_str}"', local_path])
     try:
-        if pos_update_str:
-            cmd = ["exiftool", f'-time:all+="{pos_update_str}"', local_path]
-            _ = subprocess.run(cmd, capture_output=True, check=True)
-    except subprocess.CalledProcessError as ex:
+        results = exiftool_pool().run_batch(cmds) if cmds else []
+    except OSError as ex:
         print(f'ERROR: Exception updating timestamp on image {local_path}',flush=True)
         print(f'       {ex}', flush=True)
-        print(ex.stdout, flush=True)
-        print(ex.stderr, flush=True)
-
-    try:
-        if neg_update_str:
-            cmd = ["exiftool", f'-time:all-="{neg_update_str}"', local_path]
-            _ = subprocess.run(cmd, capture_output=True, check=True)
-    except subprocess.CalledProcessError as ex:
-        print(f'ERROR: Exception updating timestamp on image {local_path}',flush=True)
-        print(f'       {ex}', flush=True)
-        print(ex.stdout, flush=True)
-        print(ex.stderr, flush=True)
+        results = []
+    for one_res in results:
+        try:
+            one_res.check_returncode()
+        except subprocess.CalledProcessError as ex:
+            print(f'ERROR: Exception updating timestamp on image {local_path}',flush=True)
+            print(f'       {ex}', flush=True)
+            print(ex.stdout, flush=True)
+            print(ex.stderr, flush=True)
 
     cur_ts = get_image_timestamp(local_path)
     return cur_ts
@@ -4,12 +4,12 @@ import concurrent.futures
 from dataclasses import dataclass
 import datetime
 import json
+import math
 import traceback
 from typing import Optional
-import dateutil.tz
 
 from sparcd_env import DEFAULT_TIMEZONE_OFFSET
-from sparcd_db import SPARCdDatabase
+from sparcd_db import image_timestamp_parts, IMAGE_TIMESTAMP_PARTS, SPARCdDatabase
 from spd_types.s3info import S3Info
 from sparcd_stats_utils import list_uploads_thread
 from format_dr_sanderson import get_dr_sanderson_output, get_dr_sanderson_pictures
@@ -21,46 +21,78 @@ from text_formatters.results import Results
 # Uploads table timeout length
 TIMEOUT_UPLOADS_SEC = 3 * 60 * 60
 
+# The names of the timestamp filters used when fetching images from the database
+DB_IMAGE_FILTER_NAMES = {'month': 'months', 'hour': 'hours', 'dayofweek': 'days_of_week'}
+
+# The functions that format the results for each query tab
+QUERY_TAB_FORMATTERS = {
+    'DrSandersonOutput': get_dr_sanderson_output,
+    'DrSandersonAllPictures': get_dr_sanderson_pictures,
+    'csvRaw': get_csv_raw,
+    'csvLocation': get_csv_location,
+    'csvSpecies': get_csv_species,
+    'imageDownloads': get_image_downloads,
+}
+
+# The timezone of image timestamps that don't have timezone information
+DEFAULT_TIMEZONE = datetime.timezone(datetime.timedelta(seconds=DEFAULT_TIMEZONE_OFFSET))
+
+
 @dataclass
 class DateFilters:
     """ Contains the date-related filter values for image filtering """
-    start_date_ts: Optional[datetime.datetime]
-    end_date_ts: Optional[datetime.datetime]
-    years_filter: Optional[dict]
+    start_epoch: Optional[float]
+    end_epoch: Optional[float]
+    years: Optional[tuple]
 
 
-def __parse_image_timestamp(one_image: dict) -> tuple:
-    """ Parses the timestamp from an image dict
+def __image_timestamp_parts(one_image: dict) -> tuple:
+    """ Returns the parts of an image's timestamp
     Arguments:
-        one_image: the image to parse the timestamp from
+        one_image: the image to get the timestamp parts of
     Return:
-        Returns a tuple of (image_dt, failed) where image_dt is the parsed datetime
-        or None if not present, and failed is True if parsing failed
+        Returns a tuple of (timestamp_parts, failed) where timestamp_parts is a dict of the
+        parts (see sparcd_db.image_timestamp_parts()) or None if the image doesn't have a
+        timestamp, and failed is True if the timestamp couldn't be parsed
+    Notes:
+        Images loaded from the database already have their timestamp parts
     """
+    if 'timestamp_parts' in one_image:
+        return one_image['timestamp_parts'], False
     if 'timestamp' not in one_image or not one_image['timestamp']:
         return None, False
-    try:
-        image_dt = datetime.datetime.fromisoformat(one_image['timestamp'])
-        if image_dt and (image_dt.tzinfo is None or
-                         image_dt.tzinfo.utcoffset(image_dt) is None):
-            image_dt = image_dt.replace(
-                tzinfo=dateutil.tz.tzoffset(None, DEFAULT_TIMEZONE_OFFSET))
-        return image_dt, False
-    except Exception as ex:  # pylint: disable=broad-exception-caught
+
+    timestamp_parts = image_timestamp_parts(one_image['timestamp'])
+    if timestamp_parts[0] is None:
         print(f'Error converting image timestamp: {one_image["name"]} '
               f'{one_image["timestamp"]}')
-        print(ex)
         return None, True
 
+    return dict(zip(IMAGE_TIMESTAMP_PARTS, timestamp_parts)), False
+
+
+def __parse_image_timestamp(timestamp: str) -> datetime.datetime:
+    """ Parses an image timestamp
+    Arguments:
+        timestamp: the ISO formatted timestamp to parse
+    Return:
+        Returns the datetime of the timestamp with the default timezone applied to timestamps
+        without timezone information
+    """
+    image_dt = datetime.datetime.fromisoformat(timestamp)
+    if image_dt.tzinfo is None or image_dt.tzinfo.utcoffset(image_dt) is None:
+        image_dt = image_dt.replace(tzinfo=DEFAULT_TIMEZONE)
+    return image_dt
+
 
 def __image_passes_filter(one_image: dict, one_filter: tuple,
-                          image_dt: Optional[datetime.datetime],
+                          timestamp_parts: Optional[dict],
                           date_filters: DateFilters) -> bool:
     """ Checks if an image passes a single filter
     Arguments:
         one_image: the image to check
         one_filter: the filter to apply
-        image_dt: the parsed image datetime, or None
+        timestamp_parts: the parts of the image timestamp, or None
         date_filters: the date-related filter values
     Return:
         Returns True if the image passes the filter, False if excluded
@@ -68,22 +100,24 @@ def __image_passes_filter(one_image: dict, one_filter: tuple,
     # pylint: disable=too-many-return-statements
     match one_filter[0]:
         case 'dayofweek':
-            return image_dt is not None and image_dt.weekday() in one_filter[1]
+            return timestamp_parts is not None and \
+                                            timestamp_parts['day_of_week'] in one_filter[1]
         case 'hour':
-            return image_dt is not None and image_dt.hour in one_filter[1]
+            return timestamp_parts is not None and timestamp_parts['hour'] in one_filter[1]
         case 'month':
-            return image_dt is not None and image_dt.month in one_filter[1]
+            return timestamp_parts is not None and timestamp_parts['month'] in one_filter[1]
         case 'species':
             return any(s['scientificName'] in one_filter[1]
                        for s in one_image['species'])
         case 'years':
-            return (date_filters.years_filter is not None and image_dt is not None and
-                    int(date_filters.years_filter['yearStart']) <= image_dt.year
-                    <= int(date_filters.years_filter['yearEnd']))
+            return (date_filters.years is not None and timestamp_parts is not None and
+                    date_filters.years[0] <= timestamp_parts['year'] <= date_filters.years[1])
         case 'endDate':
-            return image_dt is not None and image_dt <= date_filters.end_date_ts
+            return date_filters.end_epoch is None or (timestamp_parts is not None and
+                                        timestamp_parts['epoch'] <= date_filters.end_epoch)
         case 'startDate':
-            return image_dt is not None and image_dt >= date_filters.start_date_ts
+            return date_filters.start_epoch is None or (timestamp_parts is not None and
+                                        timestamp_parts['epoch'] >= date_filters.start_epoch)
         case _:
             return True
 
@@ -97,13 +131,17 @@ def __filter_image(one_image: dict, filters: tuple,
         date_filters: the date-related filter values
     Return:
         Returns the image with image_dt added if it passes all filters, or None if excluded
+    Notes:
+        The timestamp is only parsed into a datetime for images that pass the filters
     """
-    image_dt, failed = __parse_image_timestamp(one_image)
+    timestamp_parts, failed = __image_timestamp_parts(one_image)
     if failed:
         return None
 
-    if all(__image_passes_filter(one_image, one_filter, image_dt, date_filters)
+    if all(__image_passes_filter(one_image, one_filter, timestamp_parts, date_filters)
            for one_filter in filters):
+        image_dt = __parse_image_timestamp(one_image['timestamp']) \
+                                                        if timestamp_parts is not None else None
         return one_image | {'image_dt': image_dt}
 
     return None
@@ -185,10 +223,12 @@ def filter_uploads(uploads_info: tuple, filters: tuple) -> tuple:
         print(ex)
         raise ex
 
+    years_filter = next((f[1] for f in filters if f[0] == 'years'), None)
     date_filters = DateFilters(
-        start_date_ts=start_date_ts,
-        end_date_ts=end_date_ts,
-        years_filter=next((f[1] for f in filters if f[0] == 'years'), None)
+        start_epoch=__filter_dt_epoch(start_date_ts) if start_date_ts is not None else None,
+        end_epoch=__filter_dt_epoch(end_date_ts) if end_date_ts is not None else None,
+        years=(int(years_filter['yearStart']), int(years_filter['yearEnd'])) \
+                                                        if years_filter is not None else None
     )
 
     matches = [result for one_upload in cur_uploads
@@ -199,6 +239,84 @@ def filter_uploads(uploads_info: tuple, filters: tuple) -> tuple:
             for cur_upload, cur_images in matches]
 
 
+def __filter_dt_epoch(filter_dt: datetime.datetime) -> float:
+    """ Returns the epoch seconds of a date filter value
+    Arguments:
+        filter_dt: the filter's datetime
+    Return:
+        Returns the epoch seconds of the datetime with the default timezone applied to
+        datetimes without timezone information
+    """
+    if filter_dt.tzinfo is None or filter_dt.tzinfo.utcoffset(filter_dt) is None:
+        filter_dt = filter_dt.replace(tzinfo=DEFAULT_TIMEZONE)
+    return filter_dt.timestamp()
+
+
+def __get_db_image_filters(filters: tuple) -> dict:
+    """ Returns the filters that can be applied when fetching images from the database
+    Arguments:
+        filters: the filters to apply to the data
+    Return:
+        Returns a dict of keyword arguments for SPARCdDatabase.get_collection_images()
+    Notes:
+        The returned filters may select more images than the full set of filters. The
+        images still need to be checked against all the filters
+    """
+    # pylint: disable=too-many-branches
+    db_filters = {}
+    for one_filter in filters:
+        match one_filter[0]:
+            case 'locations':
+                cur_locations = set(one_filter[1])
+                if 'locations' in db_filters:
+                    cur_locations = cur_locations & set(db_filters['locations'])
+                db_filters['locations'] = tuple(cur_locations)
+            case 'species':
+                if 'species' not in db_filters:
+                    db_filters['species'] = tuple(one_filter[1])
+            case 'startDate':
+                if one_filter[1] is not None:
+                    db_filters['start_epoch'] = math.floor(__filter_dt_epoch(one_filter[1]))
+            case 'endDate':
+                if one_filter[1] is not None:
+                    db_filters['end_epoch'] = math.ceil(__filter_dt_epoch(one_filter[1]))
+            case 'years':
+                if 'years' not in db_filters:
+                    db_filters['years'] = (int(one_filter[1]['yearStart']),
+                                           int(one_filter[1]['yearEnd']))
+            case 'month' | 'hour' | 'dayofweek':
+                db_name = DB_IMAGE_FILTER_NAMES[one_filter[0]]
+                cur_values = set(one_filter[1])
+                if db_name in db_filters:
+                    cur_values = cur_values & set(db_filters[db_name])
+                db_filters[db_name] = tuple(cur_values)
+
+    return db_filters
+
+
+def __get_db_uploads(db: SPARCdDatabase, s3_id: str, bucket: str, uploads_info: tuple,
+                     db_filters: dict) -> list:
+    """ Returns the saved uploads of a collection with the images that can match the filters
+    Arguments:
+        db: connections to the current database
+        s3_id: the ID of the S3 endpoint
+        bucket: the bucket of the collection
+        uploads_info: the saved uploads of the collection
+        db_filters: the filters returned by __get_db_image_filters()
+    Return:
+        Returns the uploads that have images that can match the filters
+    Notes:
+        Only the images that can match the filters are loaded from the database. The images
+        still need to be checked against all the filters
+    """
+    db_images = db.get_collection_images(s3_id, bucket, **db_filters)
+    return [{'bucket': bucket,
+             'name': one_upload['name'],
+             'info': (json.loads(one_upload['json']) if one_upload['json'] else {}) |
+                     {'images': db_images[one_upload['name']]}}
+            for one_upload in uploads_info if one_upload['name'] in db_images]
+
+
 def filter_collections(db: SPARCdDatabase, cur_coll: tuple, s3_info: S3Info,
                        filters: tuple) -> tuple:
     """ Filters the collections in an efficient manner
@@ -212,17 +330,15 @@ def filter_collections(db: SPARCdDatabase, cur_coll: tuple, s3_info: S3Info,
     """
     all_results = []
     s3_uploads = []
+    db_filters = __get_db_image_filters(filters)
 
     for one_coll in cur_coll:
         cur_bucket = one_coll['bucket']
         uploads_info = db.get_uploads(s3_info.id, cur_bucket, TIMEOUT_UPLOADS_SEC)
         if uploads_info is not None and uploads_info:
-            uploads_info = [{'bucket': cur_bucket,
-                             'name': one_upload['name'],
-                             'info': json.loads(one_upload['json'])
-                                     if one_upload['json'] else {}}
-                            for one_upload in uploads_info]
-            __filter_and_accumulate(uploads_info, filters, all_results)
+            __filter_and_accumulate(__get_db_uploads(db, s3_info.id, cur_bucket, uploads_info,
+                                                     db_filters),
+                                    filters, all_results)
         else:
             s3_uploads.append(cur_bucket)
 
@@ -237,8 +353,7 @@ def filter_collections(db: SPARCdDatabase, cur_coll: tuple, s3_info: S3Info,
                     if 'uploads_info' in uploads_results and uploads_results['uploads_info']:
                         uploads_info = [{'bucket': uploads_results['bucket'],
                                          'name': one_upload['name'],
-                                         'info': one_upload,
-                                         'json': json.dumps(one_upload)}
+                                         'info': one_upload}
                                         for one_upload in uploads_results['uploads_info']]
                         db.save_uploads(s3_info.id, uploads_results['bucket'], uploads_info)
                         __filter_and_accumulate(uploads_info, filters, all_results)
@@ -304,14 +419,29 @@ def get_filter_dt(filter_name: str, filters: tuple) -> Optional[datetime.datetim
     return None
 
 
+def query_tab_output(results: Results, tab_name: str):
+    """ Formats the results for one of the query tabs
+    Arguments:
+        results: the results class containing the results of the filter_uploads function
+        tab_name: the name of the tab to format the results for
+    Return:
+        Returns the formatted results for the tab, or None if the tab isn't known
+    """
+    if tab_name not in QUERY_TAB_FORMATTERS:
+        return None
+
+    return QUERY_TAB_FORMATTERS[tab_name](results)
+
+
 def query_output(results: Results, results_id: str) -> dict:
     """ Formats the results into something that can be returned to the caller
     Arguments:
         results: the results class containing the results of the filter_uploads function
         results_id: the unique identifier for this result
-        user_settings: the user settings
     Return:
-        Returns a dict containing the formatted results and supporting information
+        Returns a dict containing the supporting information of the results
+    Notes:
+        The contents of the tabs are not included, use query_tab_output() to format them
     """
     if not results:
         return tuple()
@@ -321,12 +451,6 @@ def query_output(results: Results, results_id: str) -> dict:
 
     return {'id': results_id,
             'resultsCount': len(results.get_images()),
-            'DrSandersonOutput': get_dr_sanderson_output(results),
-            'DrSandersonAllPictures': get_dr_sanderson_pictures(results),
-            'csvRaw': get_csv_raw(results),
-            'csvLocation': get_csv_location(results),
-            'csvSpecies': get_csv_species(results),
-            'imageDownloads': get_image_downloads(results),
             'tabs': {   # Information on tabs to display
                  # The order that the tabs are to be displayed
                  'order':['DrSandersonOutput','DrSandersonAllPictures','csvRaw', \
@@ -0,0 +1,202 @@
+""" Query results that format their tabs when they are first requested """
+
+import collections
+import datetime
+import os
+import threading
+import time
+from typing import Optional
+
+import query_helpers
+import sparcd_file_utils as sdfu
+from spd_types.s3info import S3Info
+from text_formatters.results import Results
+
+# Maximum number of query results each server process keeps loaded
+MAX_LOADED_QUERY_RESULTS = 10
+
+# The query results that have been loaded by this process, keyed by their save path
+LOADED_QUERY_RESULTS = collections.OrderedDict()
+LOADED_QUERY_RESULTS_LOCK = threading.Lock()
+
+
+def query_tab_path(save_path: str, tab_name: str) -> str:
+    """ Returns the path of the file that holds the formatted contents of a tab
+    Arguments:
+        save_path: the path of the saved query results
+        tab_name: the name of the tab
+    Return:
+        Returns the path to the tab's file
+    Notes:
+        Tab files start with the name of the query results file (minus its extension)
+        followed by an underscore so that they can be cleaned up with the query
+    """
+    return os.path.splitext(save_path)[0] + '_' + tab_name + '.json'
+
+
+class QueryResults:
+    """ The results of a query. Each tab is formatted the first time it's requested """
+
+    def __init__(self, uploads: tuple, all_species: tuple, all_locations: tuple, \
+                 s3_info: S3Info, user_settings: dict, interval_minutes: int):
+        """ Initializer
+        Arguments:
+            uploads: the filtered uploads of the query
+            all_species: all the known species
+            all_locations: all the known locations
+            s3_info: the information on the S3 instance
+            user_settings: the user's settings
+            interval_minutes: the number of minutes between images to discard
+        """
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self._query_data = {'uploads': uploads,
+                            'species': all_species,
+                            'locations': all_locations,
+                            'settings': user_settings,
+                            'interval': interval_minutes,
+                           }
+        self._results = Results(uploads, all_species, all_locations, s3_info, user_settings,
+                                                                                interval_minutes)
+        self._save_path = None
+        self._saved_ts = None
+        self._tabs = {}
+        self._tabs_lock = threading.Lock()
+        self.info = None
+
+    @property
+    def results(self) -> Results:
+        """ Returns the results of the query """
+        return self._results
+
+    @staticmethod
+    def _serialize_uploads(uploads: tuple) -> list:
+        """ Returns a copy of the query uploads that can be saved as JSON
+        Arguments:
+            uploads: the filtered uploads of the query
+        Return:
+            Returns the list of uploads with the image timestamps converted to strings
+        """
+        return [one_upload | {'images': [one_image | \
+                                            {'image_dt': one_image['image_dt'].isoformat()}
+                                                        for one_image in one_upload['images']]}
+                    for one_upload in uploads]
+
+    @staticmethod
+    def _deserialize_uploads(uploads: tuple) -> list:
+        """ Restores the query uploads that were saved with _serialize_uploads()
+        Arguments:
+            uploads: the loaded uploads
+        Return:
+            Returns the list of uploads with the image timestamps restored
+        """
+        return [one_upload | {'images': [one_image | \
+                            {'image_dt': datetime.datetime.fromisoformat(one_image['image_dt'])}
+                                                        for one_image in one_upload['images']]}
+                    for one_upload in uploads]
+
+    def _make_loaded(self, save_path: str) -> None:
+        """ Remembers the query results as loaded by this process
+        Arguments:
+            save_path: the path of the saved query results
+        Notes:
+            The time the results were saved is taken from the saved file so that the results
+            expire at the same time in every server process
+        """
+        self._save_path = save_path
+        try:
+            self._saved_ts = os.path.getmtime(save_path)
+        except OSError:
+            self._saved_ts = None
+        with LOADED_QUERY_RESULTS_LOCK:
+            LOADED_QUERY_RESULTS[save_path] = self
+            while len(LOADED_QUERY_RESULTS) > MAX_LOADED_QUERY_RESULTS:
+                LOADED_QUERY_RESULTS.popitem(last=False)
+
+    def save(self, save_path: str) -> None:
+        """ Saves the query results so that any server process can format the tabs
+        Arguments:
+            save_path: the path to save the query results to
+        """
+        sdfu.save_timed_info(save_path, self._query_data | {
+                                'info': self.info,
+                                'uploads': self._serialize_uploads(self._query_data['uploads']),
+                             })
+        self._make_loaded(save_path)
+
+    def get_tab(self, tab_name: str, timeout_sec: int):
+        """ Returns the formatted contents of a tab
+        Arguments:
+            tab_name: the name of the tab to return
+            timeout_sec: the timeout of the saved tab contents
+        Return:
+            Returns the formatted tab contents, or None if the tab isn't known
+        Notes:
+            Formatted tabs are kept in memory and saved next to the query results for other
+            server processes
+        """
+        if tab_name not in query_helpers.QUERY_TAB_FORMATTERS:
+            return None
+
+        with self._tabs_lock:
+            if tab_name in self._tabs:
+                return self._tabs[tab_name]
+
+            tab_contents = None
+            if self._save_path:
+                tab_contents = sdfu.load_timed_info(query_tab_path(self._save_path, tab_name),
+                                                                                    timeout_sec)
+            if tab_contents is None:
+                if not self._results.have_results():
+                    return None
+                tab_contents = query_helpers.query_tab_output(self._results, tab_name)
+                if self._save_path:
+                    sdfu.save_timed_info(query_tab_path(self._save_path, tab_name), tab_contents)
+
+            self._tabs[tab_name] = tab_contents
+
+        return tab_contents
+
+    def is_expired(self, timeout_sec: int) -> bool:
+        """ Returns whether or not the query results have expired
+        Arguments:
+            timeout_sec: the timeout of the query results
+        Return:
+            Returns True if the results have expired or their saved file was removed
+        """
+        if self._save_path is None or self._saved_ts is None or \
+                                                            not os.path.exists(self._save_path):
+            return True
+
+        return time.time() - self._saved_ts > timeout_sec
+
+    @staticmethod
+    def load(save_path: str, s3_info: S3Info, timeout_sec: int) -> Optional['QueryResults']:
+        """ Returns the query results saved at the path
+        Arguments:
+            save_path: the path of the saved query results
+            s3_info: the information on the S3 instance
+            timeout_sec: the timeout of the query results
+        Return:
+            Returns the query results, or None if they can't be found or have expired
+        """
+        with LOADED_QUERY_RESULTS_LOCK:
+            query_results = LOADED_QUERY_RESULTS.get(save_path)
+            if query_results is not None:
+                if not query_results.is_expired(timeout_sec):
+                    return query_results
+                del LOADED_QUERY_RESULTS[save_path]
+
+        saved_info = sdfu.load_timed_info(save_path, timeout_sec)
+        if not saved_info:
+            return None
+
+        query_results = QueryResults(QueryResults._deserialize_uploads(saved_info['uploads']),
+                                     saved_info['species'],
+                                     saved_info['locations'],
+                                     s3_info,
+                                     saved_info['settings'],
+                                     saved_info['interval'])
+        query_results.info = saved_info['info']
+        query_results._make_loaded(save_path)     # pylint: disable=protected-access
+
+        return query_results
@@ -1,7 +1,13 @@
 """ Query utilities """
 
+import csv
 from dataclasses import dataclass
+import io
 import re
+from typing import Iterable, Iterator
+
+# Number of characters of CSV that are collected before they're returned
+CSV_CHUNK_SIZE = 64 * 1024
 
 @dataclass
 class LocationCsvFormat:
@@ -80,21 +86,43 @@ def __apply_raw_mods(settings: dict, mods: tuple) -> RawCsvFormat:
     return RawCsvFormat(location_keys, elevation_keys, timestamp_keys)
 
 
-def __build_raw_row(one_row: dict, fmt: RawCsvFormat) -> str:
+def __stream_csv(rows: Iterable) -> Iterator[str]:
+    """ Writes the rows as CSV and returns the CSV text in chunks
+    Arguments:
+        rows: the rows to write, each a list of column values
+    Return:
+        Yields the CSV text in chunks of about CSV_CHUNK_SIZE characters
+    Notes:
+        Only one chunk of the CSV is held in memory at a time
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    for one_row in rows:
+        writer.writerow(one_row)
+        if buffer.tell() >= CSV_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+
+    if buffer.tell() > 0:
+        yield buffer.getvalue()
+
+
+def __build_raw_row(one_row: dict, fmt: RawCsvFormat) -> list:
     """ Builds a single CSV row from a raw query result
     Arguments:
         one_row: the row data to format
         fmt: the resolved format settings
     Return:
-        Returns the formatted CSV row string
+        Returns the list of column values of the row
     """
     cur_row = [one_row['image'] if one_row['image'] else '']
 
     if isinstance(fmt.timestamp_keys, str):
-        cur_row.append('"' + one_row['date'] + '"')
+        cur_row.append(one_row['date'])
     else:
-        cur_row.append('"' + one_row[fmt.timestamp_keys['date']] + ' ' +
-                       one_row[fmt.timestamp_keys['time']] + '"')
+        cur_row.append(one_row[fmt.timestamp_keys['date']] + ' ' +
+                       one_row[fmt.timestamp_keys['time']])
 
     cur_row.append(one_row['locName'] if one_row['locName'] else 'Unknown')
     cur_row.append(one_row['locId'] if one_row['locId'] else 'unknown')
@@ -116,65 +144,67 @@ def __build_raw_row(one_row: dict, fmt: RawCsvFormat) -> str:
         else:
             break
 
-    return ','.join(cur_row) + '\n'
+    return cur_row
 
 
-def query_raw2csv(raw_data: tuple, settings: dict, mods: tuple = None) -> str:
+def query_raw2csv(raw_data: tuple, settings: dict, mods: tuple = None) -> Iterator[str]:
     """ Returns the CSV of the specified raw query results
     Arguments:
         raw_data: the query data to convert
         settings: user settings
         mods: modifications to make on the data based upon user settings
+    Return:
+        Yields the CSV in chunks
     """
     fmt = __apply_raw_mods(settings, mods)
-    return ''.join(__build_raw_row(one_row, fmt) for one_row in raw_data)
+    return __stream_csv(__build_raw_row(one_row, fmt) for one_row in raw_data)
 
 
-def query_location2csv(location_data: tuple, settings: dict, mods: dict = None) -> str:
+def query_location2csv(location_data: tuple, settings: dict, mods: dict = None) -> Iterator[str]:
     """ Returns the CSV of the specified location query results
     Arguments:
         location_data: the location data to convert
         settings: user settings
         mods: modifications to make on the data based upon user settings
+    Return:
+        Yields the CSV in chunks
     """
     fmt = __apply_location_mods(settings, mods)
 
-    def build_row(one_row: dict) -> str:
+    def build_row(one_row: dict) -> list:
         cur_row = [one_row['name'], one_row['id']]
         for one_key in fmt.location_keys:
             cur_row.append(str(one_row[one_key]))
         for one_key in fmt.elevation_keys:
             cur_row.append(re.sub(r'[^\d\.]', '', str(one_row[one_key])))
-        return ','.join(cur_row) + '\n'
+        return cur_row
 
-    return ''.join(build_row(one_row) for one_row in location_data)
+    return __stream_csv(build_row(one_row) for one_row in location_data)
 
 
-def query_species2csv(species_data: tuple, settings: dict, mods: dict=None) -> str:
+def query_species2csv(species_data: tuple, settings: dict, mods: dict=None) -> Iterator[str]:
     """ Returns the CSV of the specified species query results
     Arguments:
         species_data: the species data to convert
         settings: user settings
         mods: modifictions to make on the data based upon user settings
+    Return:
+        Yields the CSV in chunks
     """
     # pylint: disable=unused-argument
-    all_results = ''
-    for one_row in species_data:
-        all_results += ','.join([one_row['common'], one_row['scientific']]) + '\n'
+    return __stream_csv([one_row['common'], one_row['scientific']] for one_row in species_data)
 
-    return all_results
 
-
-def query_allpictures2csv(allpictures_data: tuple, settings: dict, mods: dict = None) -> str:
+def query_allpictures2csv(allpictures_data: tuple, settings: dict,
+                                                        mods: dict = None) -> Iterator[str]:
     """ Returns the CSV of the specified Sanderson all pictures query results
     Arguments:
         allpictures_data: the all pictures data to convert
         settings: user settings
         mods: modifictions to make on the data based upon user settings
+    Return:
+        Yields the CSV in chunks
     """
     # pylint: disable=unused-argument
-    all_results = ''
-    for one_row in allpictures_data:
-        all_results += ','.join([one_row['location'], one_row['species'], one_row['image']]) + '\n'
-
-    return all_results
+    return __stream_csv([one_row['location'], one_row['species'], one_row['image']] \
+                                                                for one_row in allpictures_data)
@@ -43,6 +43,48 @@ def query(*, db, token, user_info, s3_info):
     return jsonify(return_info)
 
 
+@query_bp.route('/query_tab', methods=['GET'])
+@cross_origin(origins=ALLOWED_ORIGINS, supports_credentials=True)
+@authenticated_route(eager_password=True)
+def query_tab(*, db, token, user_info, s3_info):
+    """ Returns the contents of one tab of a previously run query
+    Arguments:
+        db: the database instance (injected by authenticated_route)
+        token: the session token (injected by authenticated_route)
+        user_info: the authenticated user's information (injected by authenticated_route)
+        s3_info: the S3 endpoint information (injected by authenticated_route)
+    Query parameters:
+        q - the tab name identifying which result to return
+    Returns:
+        200: JSON containing the contents of the tab
+        401: if the session token is invalid or expired
+        404: if the tab is not known
+        406: if the tab parameter is missing
+        422: if the query results have expired or cannot be loaded
+    Notes:
+        Tabs are formatted the first time they are requested and kept for later requests
+    """
+    tab = request.args.get('q')
+    print(f'QUERY TAB user={user_info.name} tab={tab}', flush=True)
+
+    if not tab:
+        return 'Not Found', 406
+
+    have_results, tab_contents = hquery.handle_query_tab(
+                                    db,
+                                    s3_info,
+                                    hquery.QueryTabParams(token=token,
+                                                          tab_name=tab,
+                                                          timeout_sec=QUERY_RESULTS_TIMEOUT_SEC
+                                                          ))
+    if not have_results:
+        return 'Not Found', 422
+    if tab_contents is None:
+        return 'Not Found', 404
+
+    return jsonify(tab_contents)
+
+
 @query_bp.route('/query_dl', methods=['GET'])
 @cross_origin(origins='*', supports_credentials=True)
 @authenticated_route(eager_password=True)
@@ -4,15 +4,21 @@ import csv
 import concurrent.futures
 from contextlib import contextmanager
 from io import BytesIO, StringIO
+import hashlib
 import json
 import os
 import tempfile
+import threading
+import time
 import traceback
 from typing import Optional, Union
 import uuid
 from minio import Minio, S3Error
 
 from camtrap.v016 import camtrap
+from sparcd_file_utils import load_timed_info, save_timed_info
+from s3.s3_connect import S3_POOL_SIZE
+from s3.s3_presign import presigned_get_urls
 
 # Prefix for SPARCd things
 SPARCD_PREFIX = 'sparcd-'
@@ -65,6 +71,30 @@ CONFIGURATION_FILES_LIST = [LOCATIONS_JSON_FILE_NAME, SETTINGS_JSON_FILE_NAME,
 # Maximum number of times to attempt to create a bucket
 MAX_NEW_BUCKET_TRIES = 10
 
+# Environment variable name for the number of collections loaded at the same time
+ENV_NAME_USER_COLLECTIONS_WORKERS = 'SPARCD_USER_COLLECTIONS_WORKERS'
+# The number of collections loaded at the same time when getting a user's collections. Defaults
+# to the number of connections kept open to the S3 endpoint
+USER_COLLECTIONS_MAX_WORKERS = max(1, int(os.environ.get(ENV_NAME_USER_COLLECTIONS_WORKERS,
+                                                         S3_POOL_SIZE)))
+# Environment variable name for the number of seconds to wait for a collection to load
+ENV_NAME_USER_COLLECTIONS_TIMEOUT_SEC = 'SPARCD_USER_COLLECTIONS_TIMEOUT_SEC'
+# Default number of seconds to wait for a collection to load
+DEFAULT_USER_COLLECTIONS_TIMEOUT_SEC = 60
+# The number of seconds to wait for a collection to load once it's started loading. Collections
+# that take longer are left out of the user's collections
+USER_COLLECTIONS_TIMEOUT_SEC = int(os.environ.get(ENV_NAME_USER_COLLECTIONS_TIMEOUT_SEC,
+                                                  DEFAULT_USER_COLLECTIONS_TIMEOUT_SEC))
+
+# Name of the temporary file of an endpoint's settings bucket
+TEMP_SETTINGS_BUCKET_FILE_NAME = SPARCD_PREFIX + 'settings-bucket.json'
+# Number of seconds a found settings bucket is used before the buckets are listed again
+SETTINGS_BUCKET_EXPIRE_SEC = 1 * 60 * 60
+
+# The found settings buckets and when they were found, keyed by the endpoint
+SETTINGS_BUCKETS = {}
+SETTINGS_BUCKETS_LOCK = threading.Lock()
+
 
 # =============================================================================
 # Context managers
@@ -263,6 +293,9 @@ def load_upload_observations(minio: Minio, bucket: str, obj_path: str,
         temp_path: temporary file path for downloads
     Return:
         Returns a list of image dicts with species information
+    Notes:
+        The species of all the observations of an image are merged into the one image. The
+        images are found by their media ID so that loading is linear in the number of rows
     """
     upload_info_path = make_s3_path((obj_path, OBSERVATIONS_CSV_FILE_NAME))
     csv_data = get_s3_file(minio, bucket, upload_info_path, temp_path)
@@ -270,7 +303,7 @@ def load_upload_observations(minio: Minio, bucket: str, obj_path: str,
         print(f'Unable to get observation information: {upload_info_path}')
         return []
 
-    cur_images = []
+    cur_images = {}
     cur_row = 0
     reader = csv.reader(StringIO(csv_data))
     for csv_info in reader:
@@ -289,22 +322,20 @@ def load_upload_observations(minio: Minio, bucket: str, obj_path: str,
             csv_info[camtrap.CAMTRAP_OBSERVATION_MEDIA_ID_IDX].rstrip('/\\'))
         s3_path = csv_info[camtrap.CAMTRAP_OBSERVATION_MEDIA_ID_IDX]
 
-        existing = next((img for img in cur_images
-                         if img['name'] == image_name
-                         and img['bucket'] == bucket
-                         and img['s3_path'] == s3_path), None)
+        # The image name is derived from the media ID and the bucket is the same for all rows
+        existing = cur_images.get(s3_path)
         if existing:
             existing['species'].append(cur_species)
         else:
-            cur_images.append({
+            cur_images[s3_path] = {
                 'name': image_name,
                 'timestamp': csv_info[camtrap.CAMTRAP_OBSERVATION_TIMESTAMP_IDX],
                 'bucket': bucket,
                 's3_path': s3_path,
                 'species': [cur_species]
-            })
+            }
 
-    return cur_images
+    return list(cur_images.values())
 
 
 def apply_media_timestamps(minio: Minio, bucket: str, upload_path: str,
@@ -394,45 +425,115 @@ def get_common_name(csv_comment: str) -> Optional[str]:
     return common_name
 
 
-def get_user_collections(minio: Minio, user: str, buckets: tuple) -> tuple:
-    """ Gets the collections that the user can access
+def __get_user_collection(minio: Minio, user: str, bucket: str) -> Optional[dict]:
+    """ Gets the collection in the bucket with the user's permissions
     Arguments:
         minio: the s3 client instance
         user: the name of the user to check permissions for
-        buckets: the list of buckets to check
+        bucket: the bucket of the collection
     Return:
-        Returns a tuple containing the collections and buckets that the user has permissions for
+        Returns the collection, or None if the bucket doesn't have a collection or permissions
     """
-    user_collections = []
+    base_path = make_s3_path((COLLECTIONS_FOLDER, bucket[len(SPARCD_PREFIX):]))
 
     with temp_s3_file() as temp_path:
-        for one_bucket in buckets:
-            base_path = make_s3_path((COLLECTIONS_FOLDER, one_bucket[len(SPARCD_PREFIX):]))
+        coll_info_path = make_s3_path((base_path, COLLECTION_JSON_FILE_NAME))
+        coll_data = get_s3_file(minio, bucket, coll_info_path, temp_path)
+        if coll_data is None or not coll_data:
+            return None
+        coll_data = json.loads(coll_data)
 
-            coll_info_path = make_s3_path((base_path, COLLECTION_JSON_FILE_NAME))
-            coll_data = get_s3_file(minio, one_bucket, coll_info_path, temp_path)
-            if coll_data is None or not coll_data:
-                continue
-            coll_data = json.loads(coll_data)
+        permissions_path = make_s3_path((base_path, PERMISSIONS_JSON_FILE_NAME))
+        perm_data = get_s3_file(minio, bucket, permissions_path, temp_path)
 
-            permissions_path = make_s3_path((base_path, PERMISSIONS_JSON_FILE_NAME))
-            perm_data = get_s3_file(minio, one_bucket, permissions_path, temp_path)
+    if perm_data is None:
+        return None
 
-            if perm_data is not None:
-                perms = json.loads(perm_data)
-                found_perm = None
-                for one_perm in perms:
-                    if one_perm and 'usernameProperty' in one_perm and \
-                            one_perm['usernameProperty'] == user:
-                        found_perm = one_perm
-                        break
-                coll_data.update({'bucket': one_bucket,
-                                  'base_path': base_path,
-                                  'permissions': found_perm,
-                                  'all_permissions': perms})
-                user_collections.append(coll_data)
+    perms = json.loads(perm_data)
+    found_perm = None
+    for one_perm in perms:
+        if one_perm and 'usernameProperty' in one_perm and \
+                one_perm['usernameProperty'] == user:
+            found_perm = one_perm
+            break
+    coll_data.update({'bucket': bucket,
+                      'base_path': base_path,
+                      'permissions': found_perm,
+                      'all_permissions': perms})
+    return coll_data
+
+
+def get_user_collections(minio: Minio, user: str, buckets: tuple,
+                         skipped_buckets: list = None) -> tuple:
+    """ Gets the collections that the user can access
+    Arguments:
+        minio: the s3 client instance
+        user: the name of the user to check permissions for
+        buckets: the list of buckets to check
+        skipped_buckets: optional list that the buckets that couldn't be loaded are added to
+    Return:
+        Returns a tuple containing the collections and buckets that the user has permissions for
+    Notes:
+        The collections are loaded at the same time and are returned in the order of the buckets.
+        Buckets that fail to load, or take longer than USER_COLLECTIONS_TIMEOUT_SEC seconds once
+        they're started, are left out
+    """
+    if len(buckets) <= 1:
+        return tuple(one_coll for one_coll in (__get_user_collection(minio, user, one_bucket) \
+                                                                    for one_bucket in buckets)
+                     if one_coll is not None)
+
+    # The time each bucket started loading, for the timeouts
+    start_ts = {}
+    def load_collection(one_bucket: str) -> Optional[dict]:
+        """ Loads one collection after noting its start time """
+        start_ts[one_bucket] = time.monotonic()
+        return __get_user_collection(minio, user, one_bucket)
+
+    found_colls = {}
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=USER_COLLECTIONS_MAX_WORKERS)
+    try:
+        cur_futures = {executor.submit(load_collection, one_bucket): one_bucket
+                       for one_bucket in buckets}
+        not_done = set(cur_futures)
+        while not_done:
+            # Wait until the next collection finishes or the earliest started one times out
+            cur_ts = time.monotonic()
+            wait_sec = min((start_ts[cur_futures[one_future]] + USER_COLLECTIONS_TIMEOUT_SEC \
+                                - cur_ts for one_future in not_done \
+                                        if cur_futures[one_future] in start_ts),
+                           default=USER_COLLECTIONS_TIMEOUT_SEC)
+            done, not_done = concurrent.futures.wait(not_done, timeout=max(0, wait_sec),
+                                            return_when=concurrent.futures.FIRST_COMPLETED)
+
+            for future in done:
+                try:
+                    found_colls[cur_futures[future]] = future.result()
+                # pylint: disable=broad-exception-caught
+                except Exception as ex:
+                    print(f'Unable to load the collection in bucket {cur_futures[future]}: {ex}',
+                                                                                    flush=True)
+                    traceback.print_exception(ex)
+                    if skipped_buckets is not None:
+                        skipped_buckets.append(cur_futures[future])
+
+            # Leave out the collections that have taken too long
+            cur_ts = time.monotonic()
+            for future in [one_future for one_future in not_done \
+                                if cur_futures[one_future] in start_ts and \
+                                    cur_ts - start_ts[cur_futures[one_future]] >= \
+                                                                    USER_COLLECTIONS_TIMEOUT_SEC]:
+                print(f'Timed out loading the collection in bucket {cur_futures[future]}',
+                                                                                    flush=True)
+                not_done.discard(future)
+                if skipped_buckets is not None:
+                    skipped_buckets.append(cur_futures[future])
+    finally:
+        # Don't wait for the collections that have timed out
+        executor.shutdown(wait=False, cancel_futures=True)
 
-    return tuple(user_collections)
+    return tuple(found_colls[one_bucket] for one_bucket in buckets
+                                            if found_colls.get(one_bucket) is not None)
 
 
 def get_uploaded_folders(minio: Minio, bucket: str, upload_path: str) -> tuple:
@@ -539,6 +640,42 @@ def get_image_counts(minio: Minio, bucket: str, check_folders: tuple) -> int:
     return uploaded_images
 
 
+def list_upload_thread(minio: Minio, bucket: str, upload_path: str,
+                       extended_location: bool) -> Optional[dict]:
+    """ Loads the information of one upload for listing the uploads of a collection
+    Arguments:
+        minio: the S3 instance
+        bucket: the bucket of the upload
+        upload_path: the path to the upload
+        extended_location: returns additional location information when set to True
+    Return:
+        Returns the upload information, or None if the upload information can't be loaded
+    """
+    with temp_s3_file() as temp_path:
+        upload_info_path = make_s3_path((upload_path, S3_UPLOAD_META_JSON_FILE_NAME))
+        meta_info_data = load_s3_json(minio, bucket, upload_info_path, temp_path, 'list_uploads')
+        if not meta_info_data:
+            return None
+
+        meta_info_data['name'] = os.path.basename(upload_path.rstrip('/\\'))
+        meta_info_data['loc'] = None
+
+        loc_data = load_deployment_location(minio, bucket, upload_path, temp_path)
+        if loc_data is None:
+            return None
+
+        meta_info_data['loc'] = loc_data['location']
+        meta_info_data['elevation'] = loc_data['elevation']
+        if extended_location:
+            meta_info_data['loc_name'] = loc_data['loc_name']
+            meta_info_data['loc_lon'] = loc_data['loc_lon']
+            meta_info_data['loc_lat'] = loc_data['loc_lat']
+
+        meta_info_data['images'] = load_upload_observations(minio, bucket, upload_path, temp_path)
+
+    return meta_info_data
+
+
 def get_upload_data_thread(minio: Minio, bucket: str, upload_paths: tuple,
                            collection: object) -> object:
     """ Gets upload information for the selected paths
@@ -622,16 +759,20 @@ def get_s3_images(minio: Minio, bucket: str, upload_paths: tuple,
                     _, file_name = os.path.split(one_obj.object_name)
                     name, ext = os.path.splitext(file_name)
                     if ext.lower().endswith('.jpg') or ext.lower().endswith('.mp4'):
-                        s3_url = minio.presigned_get_object(bucket, one_obj.object_name) \
-                            if need_url else None
                         images.append({'name': name,
                                        'bucket': bucket,
                                        's3_path': one_obj.object_name,
-                                       's3_url': s3_url,
+                                       's3_url': None,
                                        'key': uuid.uuid4().hex,
                                        'type': 'movie' if ext.lower().endswith('.mp4')
                                        else 'image',
                                        'species': []})
+
+    if need_url:
+        for one_image, one_url in zip(images, presigned_get_urls(minio,
+                                    [(bucket, one_image['s3_path']) for one_image in images])):
+            one_image['s3_url'] = one_url
+
     return images
 
 
@@ -713,20 +854,89 @@ def check_incomplete_thread(minio: Minio, bucket: str) -> Optional[tuple]:
 # Bucket helpers
 # =============================================================================
 
-def find_settings_bucket(minio: Minio) -> Optional[str]:
+def check_bucket_exists(minio: Minio, bucket: str) -> bool:
+    """ Checks that the bucket exists and can be accessed
+    Arguments:
+        minio: the S3 instance
+        bucket: the name of the bucket to check
+    Return:
+        Returns True if the bucket is found and False if it's missing or can't be accessed
+    """
+    try:
+        return minio.bucket_exists(bucket)
+    except S3Error as ex:
+        print(f'Unable to check bucket {bucket}: {ex.code}', flush=True)
+
+    return False
+
+
+def __get_settings_bucket_path(endpoint: str) -> str:
+    """ Returns the path to the temporary file of the endpoint's settings bucket
+    Arguments:
+        endpoint: the S3 endpoint
+    Return:
+        The path of the file
+    """
+    endpoint_hash = hashlib.sha256(endpoint.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(tempfile.gettempdir(),
+                        endpoint_hash + '-' + TEMP_SETTINGS_BUCKET_FILE_NAME)
+
+
+def __get_known_settings_bucket(endpoint: str) -> Optional[str]:
+    """ Returns the settings bucket found earlier for the endpoint
+    Arguments:
+        endpoint: the S3 endpoint
+    Return:
+        Returns the settings bucket, or None if it's not known or was found too long ago
+    """
+    with SETTINGS_BUCKETS_LOCK:
+        found = SETTINGS_BUCKETS.get(endpoint)
+    if found is not None and time.time() - found[1] < SETTINGS_BUCKET_EXPIRE_SEC:
+        return found[0]
+
+    # Check if another server process has found it
+    saved_info = load_timed_info(__get_settings_bucket_path(endpoint), SETTINGS_BUCKET_EXPIRE_SEC)
+    if not saved_info or not isinstance(saved_info, dict) or not saved_info.get('bucket'):
+        return None
+
+    with SETTINGS_BUCKETS_LOCK:
+        SETTINGS_BUCKETS[endpoint] = (saved_info['bucket'], saved_info['found_ts'])
+
+    return saved_info['bucket']
+
+
+def find_settings_bucket(minio: Minio, endpoint: str) -> Optional[str]:
     """ Finds the settings bucket at the endpoint
     Arguments:
         minio: the minio instance to check
+        endpoint: the S3 endpoint the minio instance is connected to
     Return:
         Returns the found Minio settings bucket
+    Notes:
+        The found bucket is kept for SETTINGS_BUCKET_EXPIRE_SEC seconds and is checked to still
+        exist each time it's returned, instead of listing all the buckets again
     """
-    if minio.bucket_exists(SETTINGS_BUCKET_LEGACY):
-        return SETTINGS_BUCKET_LEGACY
+    settings_bucket = __get_known_settings_bucket(endpoint)
+    if settings_bucket is not None and check_bucket_exists(minio, settings_bucket):
+        return settings_bucket
 
     settings_bucket = None
-    for one_bucket in minio.list_buckets():
-        if one_bucket.name.startswith(SETTINGS_BUCKET_PREFIX):
-            settings_bucket = one_bucket.name
+    if minio.bucket_exists(SETTINGS_BUCKET_LEGACY):
+        settings_bucket = SETTINGS_BUCKET_LEGACY
+    else:
+        for one_bucket in minio.list_buckets():
+            if one_bucket.name.startswith(SETTINGS_BUCKET_PREFIX):
+                settings_bucket = one_bucket.name
+
+    if settings_bucket is not None:
+        found_ts = time.time()
+        with SETTINGS_BUCKETS_LOCK:
+            SETTINGS_BUCKETS[endpoint] = (settings_bucket, found_ts)
+        save_timed_info(__get_settings_bucket_path(endpoint),
+                        {'bucket': settings_bucket, 'found_ts': found_ts})
+    else:
+        with SETTINGS_BUCKETS_LOCK:
+            SETTINGS_BUCKETS.pop(endpoint, None)
 
     return settings_bucket
 
@@ -33,7 +33,7 @@ class S3AdminConnection:
         """
         minio = s3_connect(conn_info)
 
-        settings_bucket = find_settings_bucket(minio)
+        settings_bucket = find_settings_bucket(minio, conn_info.uri)
         if not settings_bucket:
             return None
 
@@ -58,7 +58,7 @@ class S3AdminConnection:
         """
         minio = s3_connect(conn_info)
 
-        settings_bucket = find_settings_bucket(minio)
+        settings_bucket = find_settings_bucket(minio, conn_info.uri)
         if not settings_bucket:
             print(f'Unable to find settings bucket at {conn_info.url}')
             return
@@ -158,7 +158,7 @@ class S3AdminConnection:
         """
         minio = s3_connect(conn_info)
 
-        settings_bucket = find_settings_bucket(minio)
+        settings_bucket = find_settings_bucket(minio, conn_info.uri)
 
         found_count = 0
         if settings_bucket is not None:
@@ -263,7 +263,7 @@ class S3AdminConnection:
         """
         minio = s3_connect(conn_info)
 
-        if find_settings_bucket(minio) is not None:
+        if find_settings_bucket(minio, conn_info.uri) is not None:
             return False
 
         settings_bucket = create_new_bucket(minio, SETTINGS_BUCKET_PREFIX)
@@ -298,7 +298,7 @@ class S3AdminConnection:
         """
         minio = s3_connect(conn_info)
 
-        settings_bucket = find_settings_bucket(minio)
+        settings_bucket = find_settings_bucket(minio, conn_info.uri)
         if settings_bucket is None:
             settings_bucket = create_new_bucket(minio, SETTINGS_BUCKET_PREFIX)
         if settings_bucket is None:
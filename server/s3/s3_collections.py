@@ -3,16 +3,48 @@
 import os
 import concurrent.futures
 import dataclasses
+import threading
+import traceback
 from typing import Optional
 
 from spd_types.s3info import S3Info
-from s3.s3_connect import s3_connect
+from s3.s3_connect import s3_connect, S3_POOL_SIZE
 from s3.s3_access_helpers import (SPARCD_PREFIX, S3_UPLOADS_PATH_PART, COLLECTIONS_FOLDER,
-                                temp_s3_file, load_s3_json, load_deployment_location,
-                                load_upload_observations, make_s3_path,
+                                temp_s3_file, load_deployment_location, make_s3_path,
                                 get_user_collections, get_uploaded_folders, update_user_collections,
                                 get_upload_data_thread, check_incomplete_thread, load_upload_meta,
-                                S3_UPLOAD_META_JSON_FILE_NAME)
+                                list_upload_thread, check_bucket_exists)
+
+# Environment variable name for the number of uploads loaded at the same time
+ENV_NAME_LIST_UPLOADS_WORKERS = 'SPARCD_LIST_UPLOADS_WORKERS'
+# The number of uploads loaded at the same time when listing uploads, across all the listings of
+# this server process. Defaults to the number of connections kept open to the S3 endpoint
+LIST_UPLOADS_MAX_WORKERS = int(os.environ.get(ENV_NAME_LIST_UPLOADS_WORKERS, S3_POOL_SIZE))
+
+# The threads that load the uploads of all the listings in this server process. Listings are
+# usually run from a thread for each bucket, sharing the threads keeps the number of S3 requests
+# within the connection pool
+LIST_UPLOADS_EXECUTOR = None
+LIST_UPLOADS_EXECUTOR_LOCK = threading.Lock()
+
+
+def _list_uploads_executor() -> concurrent.futures.ThreadPoolExecutor:
+    """ Returns the threads that load uploads when listing them
+    Return:
+        The shared thread pool
+    Notes:
+        The threads are started when first needed so that each gunicorn worker has its own
+    """
+    # pylint: disable=global-statement
+    global LIST_UPLOADS_EXECUTOR
+
+    with LIST_UPLOADS_EXECUTOR_LOCK:
+        if LIST_UPLOADS_EXECUTOR is None:
+            LIST_UPLOADS_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+                                                    max_workers=LIST_UPLOADS_MAX_WORKERS,
+                                                    thread_name_prefix='list_uploads')
+
+    return LIST_UPLOADS_EXECUTOR
 
 
 @dataclasses.dataclass
@@ -45,17 +77,20 @@ class S3CollectionConnection:
         return get_user_collections(minio, conn_info.access_key, found_buckets)
 
     @staticmethod
-    def get_collections(conn_info: S3Info) -> Optional[tuple]:
+    def get_collections(conn_info: S3Info, skipped_buckets: list = None) -> Optional[tuple]:
         """ Returns the collection information with upload details
         Arguments:
             conn_info: the connection information for the S3 endpoint
+            skipped_buckets: optional list that the buckets whose collections couldn't be loaded
+                        are added to
         Returns:
             Returns the collections, or None
         """
         minio = s3_connect(conn_info)
         found_buckets = [one_bucket.name for one_bucket in minio.list_buckets()
                          if one_bucket.name.startswith(SPARCD_PREFIX)]
-        user_collections = get_user_collections(minio, conn_info.access_key, found_buckets)
+        user_collections = get_user_collections(minio, conn_info.access_key, found_buckets,
+                                                skipped_buckets)
         return update_user_collections(minio, user_collections)
 
     @staticmethod
@@ -71,12 +106,10 @@ class S3CollectionConnection:
             Returns the information on the collection or None if the collection isn't found
         """
         minio = s3_connect(conn_info)
-        found_buckets = [one_bucket.name for one_bucket in minio.list_buckets()
-                         if one_bucket.name == bucket]
-        if not found_buckets:
+        if not check_bucket_exists(minio, bucket):
             return None
 
-        user_collections = get_user_collections(minio, conn_info.access_key, found_buckets)
+        user_collections = get_user_collections(minio, conn_info.access_key, (bucket,))
         if not user_collections:
             return None
 
@@ -101,9 +134,7 @@ class S3CollectionConnection:
             Returns the information on the upload or None if not found
         """
         minio = s3_connect(conn_info)
-        found_buckets = [one_bucket.name for one_bucket in minio.list_buckets()
-                         if one_bucket.name == bucket]
-        if not found_buckets:
+        if not check_bucket_exists(minio, bucket):
             return None
 
         coll_info = load_upload_meta(minio, bucket, upload_path, 'get_upload_info')
@@ -142,39 +173,26 @@ class S3CollectionConnection:
         uploads_path = make_s3_path((COLLECTIONS_FOLDER, bucket[len(SPARCD_PREFIX):],
                                      S3_UPLOADS_PATH_PART)) + '/'
         minio = s3_connect(conn_info)
-        coll_uploads = []
+        upload_paths = [one_obj.object_name for one_obj in
+                                            minio.list_objects(bucket, prefix=uploads_path)
+                        if one_obj.is_dir and one_obj.object_name != uploads_path]
 
-        for one_obj in minio.list_objects(bucket, prefix=uploads_path):
-            if not one_obj.is_dir or one_obj.object_name == uploads_path:
-                continue
-
-            with temp_s3_file() as temp_path:
-                upload_info_path = make_s3_path((one_obj.object_name,
-                                                 S3_UPLOAD_META_JSON_FILE_NAME))
-                meta_info_data = load_s3_json(minio, bucket, upload_info_path,
-                                                temp_path, 'list_uploads')
-                if not meta_info_data:
-                    continue
-
-                meta_info_data['name'] = os.path.basename(one_obj.object_name.rstrip('/\\'))
-                meta_info_data['loc'] = None
-
-                loc_data = load_deployment_location(minio, bucket,
-                                                      one_obj.object_name, temp_path)
-                if loc_data is None:
-                    continue
-
-                meta_info_data['loc'] = loc_data['location']
-                meta_info_data['elevation'] = loc_data['elevation']
-                if extended_location:
-                    meta_info_data['loc_name'] = loc_data['loc_name']
-                    meta_info_data['loc_lon'] = loc_data['loc_lon']
-                    meta_info_data['loc_lat'] = loc_data['loc_lat']
-
-                meta_info_data['images'] = load_upload_observations(minio, bucket,
-                                                                       one_obj.object_name,
-                                                                       temp_path)
-                coll_uploads.append(meta_info_data)
+        # Load the uploads concurrently while keeping the order they were listed in
+        executor = _list_uploads_executor()
+        cur_futures = [(one_path, executor.submit(list_upload_thread, minio, bucket, one_path,
+                                                  extended_location))
+                       for one_path in upload_paths]
+
+        coll_uploads = []
+        for one_path, future in cur_futures:
+            try:
+                meta_info_data = future.result()
+                if meta_info_data:
+                    coll_uploads.append(meta_info_data)
+            except Exception as ex:  # pylint: disable=broad-exception-caught
+                print(f'Unable to load the upload {one_path} in bucket {bucket}: {ex}',
+                                                                                    flush=True)
+                traceback.print_exception(ex)
 
         return coll_uploads
 
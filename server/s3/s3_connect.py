@@ -1,26 +1,98 @@
 """ This script contains the code to create an S3 connection instance
 """
 
+import collections
+import os
+import threading
+
+import certifi
+import urllib3
 from minio import Minio
 from minio.error import MinioException
 
 from spd_types.s3info import S3Info
 
+# Environment variable name for the number of connections kept open to an S3 endpoint
+ENV_NAME_S3_POOL_SIZE = 'SPARCD_S3_POOL_SIZE'
+# Environment variable name for the number of server threads (used by gunicorn)
+ENV_NAME_SERVER_THREADS = 'SERVER_THREADS'
+# Default number of connections kept open to an S3 endpoint
+DEFAULT_S3_POOL_SIZE = 10
+# The number of connections kept open to an S3 endpoint. Defaults to the number of server threads
+S3_POOL_SIZE = int(os.environ.get(ENV_NAME_S3_POOL_SIZE,
+                                  os.environ.get(ENV_NAME_SERVER_THREADS, DEFAULT_S3_POOL_SIZE)))
+# Maximum number of S3 endpoints that have connections kept open
+S3_MAX_ENDPOINT_POOLS = 10
+# Maximum number of S3 clients kept for reuse (one for each set of credentials)
+S3_MAX_CLIENTS = 100
+# Timeout in seconds for connecting to, and reading from, the S3 endpoint
+S3_TIMEOUT_SEC = 5 * 60
+
+# The HTTP connection pools shared by all the S3 clients
+S3_HTTP_CLIENT = None
+# The S3 clients that can be reused, keyed by the endpoint and credentials
+S3_CLIENTS = collections.OrderedDict()
+S3_CLIENTS_LOCK = threading.Lock()
+
+
+def s3_http_client() -> urllib3.PoolManager:
+    """ Returns the HTTP connection pools shared by all the S3 clients
+    Return:
+        The connection pool manager
+    Notes:
+        The settings match the Minio defaults except for the number of connections that are
+        kept open to each endpoint
+    """
+    # pylint: disable=global-statement
+    global S3_HTTP_CLIENT
+
+    with S3_CLIENTS_LOCK:
+        if S3_HTTP_CLIENT is None:
+            S3_HTTP_CLIENT = urllib3.PoolManager(
+                                num_pools=S3_MAX_ENDPOINT_POOLS,
+                                maxsize=S3_POOL_SIZE,
+                                timeout=urllib3.Timeout(connect=S3_TIMEOUT_SEC,
+                                                        read=S3_TIMEOUT_SEC),
+                                cert_reqs='CERT_REQUIRED',
+                                ca_certs=os.environ.get('SSL_CERT_FILE') or certifi.where(),
+                                retries=urllib3.Retry(total=5,
+                                                      backoff_factor=0.2,
+                                                      status_forcelist=[500, 502, 503, 504]))
+
+    return S3_HTTP_CLIENT
+
+
 def s3_connect(conn_info: S3Info) -> Minio:
-    """ Creates an instance of the S3 connection
+    """ Returns an instance of the S3 connection
     Arguments:
         conn_info: the information needed to connect to the S3 endpoint
     Return:
         The S3 connection instance
+    Notes:
+        Instances are reused for the same endpoint and credentials, and all instances share
+        the same connection pools
     """
     minio = None
+    client_key = (conn_info.uri, conn_info.access_key, conn_info.secret_key, conn_info.secure)
+
+    with S3_CLIENTS_LOCK:
+        if client_key in S3_CLIENTS:
+            S3_CLIENTS.move_to_end(client_key)
+            return S3_CLIENTS[client_key]
 
     try:
         minio = Minio(conn_info.uri,
                       access_key=conn_info.access_key,
                       secret_key=conn_info.secret_key,
-                      secure=conn_info.secure)
+                      secure=conn_info.secure,
+                      http_client=s3_http_client())
     except MinioException as ex:
         print('S3 exception caught:', ex, flush=True)
+        return minio
+
+    with S3_CLIENTS_LOCK:
+        S3_CLIENTS[client_key] = minio
+        while len(S3_CLIENTS) > S3_MAX_CLIENTS:
+            S3_CLIENTS.popitem(last=False)
 
     return minio
@@ -7,6 +7,7 @@ import concurrent.futures
 
 from spd_types.s3info import S3Info
 from s3.s3_connect import s3_connect
+from s3.s3_presign import presigned_get_urls
 from s3.s3_access_helpers import (COLLECTIONS_FOLDER, SPARCD_PREFIX, S3_UPLOADS_PATH_PART,
                                 temp_s3_file, apply_media_timestamps, apply_observation_species,
                                 make_s3_path, get_uploaded_folders, get_image_counts,
@@ -137,4 +138,4 @@ class S3ImageConnection:
             Returns a tuple containing the S3 URLs for the objects (each url subject to timeout)
         """
         minio = s3_connect(conn_info)
-        return [minio.presigned_get_object(one_obj[0], one_obj[1]) for one_obj in object_info]
+        return presigned_get_urls(minio, object_info)
@@ -0,0 +1,190 @@
+""" Batch generation of presigned S3 URLs
+"""
+
+import collections
+import datetime
+import functools
+import hashlib
+import hmac
+import os
+import threading
+import time
+import urllib.parse
+
+from minio import Minio
+
+# Number of seconds presigned URLs are valid for (the S3 maximum of 7 days, the Minio default)
+PRESIGN_EXPIRES_SEC = 7 * 24 * 60 * 60
+# Environment variable name for the fraction of the expiry time that a presigned URL is reused
+ENV_NAME_PRESIGN_CACHE_FRACTION = 'SPARCD_PRESIGN_CACHE_FRACTION'
+# Default fraction of the expiry time that a presigned URL is reused. The URLs handed out are
+# then valid for at least the remaining fraction
+DEFAULT_PRESIGN_CACHE_FRACTION = 0.5
+# Number of seconds that a presigned URL is reused
+PRESIGN_CACHE_SEC = PRESIGN_EXPIRES_SEC * \
+                min(1.0, max(0.0, float(os.environ.get(ENV_NAME_PRESIGN_CACHE_FRACTION,
+                                                       DEFAULT_PRESIGN_CACHE_FRACTION))))
+# Maximum number of presigned URLs kept for reuse
+PRESIGN_CACHE_MAX_URLS = 50000
+# The signature algorithm, and the service the URLs are signed for
+PRESIGN_ALGORITHM = 'AWS4-HMAC-SHA256'
+PRESIGN_SERVICE = 's3'
+
+# The presigned URLs that can be reused, keyed by the endpoint, credentials, bucket, and object
+PRESIGNED_URLS = collections.OrderedDict()
+PRESIGNED_URLS_LOCK = threading.Lock()
+
+
+@functools.lru_cache(maxsize=32)
+def __signing_key(secret_key: str, signer_date: str, region: str) -> bytes:
+    """ Returns the signature V4 signing key
+    Arguments:
+        secret_key: the secret key of the credentials
+        signer_date: the date the URLs are signed on as YYYYMMDD
+        region: the region of the bucket
+    Return:
+        Returns the signing key
+    Notes:
+        The key only changes daily so it's kept instead of being derived for each URL
+    """
+    key = ('AWS4' + secret_key).encode('utf-8')
+    for one_part in (signer_date, region, PRESIGN_SERVICE, 'aws4_request'):
+        key = hmac.new(key, one_part.encode('utf-8'), hashlib.sha256).digest()
+    return key
+
+
+def __sign_url(url: urllib.parse.SplitResult, access_key: str, scope: str, amz_date: str,
+                                                                    signing_key: bytes) -> str:
+    """ Returns the presigned GET URL
+    Arguments:
+        url: the URL of the object to sign
+        access_key: the access key of the credentials
+        scope: the signature V4 scope
+        amz_date: the date and time the URL is signed as YYYYMMDDTHHMMSSZ
+        signing_key: the key to sign with
+    Return:
+        Returns the presigned URL
+    """
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    credential = urllib.parse.quote(access_key + '/' + scope, safe='')
+    query = (url.query + '&' if url.query else '') + \
+                f'X-Amz-Algorithm={PRESIGN_ALGORITHM}' \
+                f'&X-Amz-Credential={credential}' \
+                f'&X-Amz-Date={amz_date}' \
+                f'&X-Amz-Expires={PRESIGN_EXPIRES_SEC}' \
+                '&X-Amz-SignedHeaders=host'
+
+    canonical_query = '&'.join('='.join(one_pair) for one_pair in
+                                    sorted(one_param.split('=') for one_param in query.split('&')))
+    canonical_request = f'GET\n{url.path or "/"}\n{canonical_query}\nhost:{url.netloc}\n\n' \
+                        'host\nUNSIGNED-PAYLOAD'
+    string_to_sign = f'{PRESIGN_ALGORITHM}\n{amz_date}\n{scope}\n' + \
+                        hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()
+    signature = hmac.new(signing_key, string_to_sign.encode('utf-8'), hashlib.sha256).hexdigest()
+
+    return urllib.parse.urlunsplit(url._replace(query=query + '&X-Amz-Signature=' + signature))
+
+
+def __get_cached_urls(url_keys: list, cur_ts: float) -> list:
+    """ Returns the presigned URLs that can be reused
+    Arguments:
+        url_keys: the cache keys of the URLs
+        cur_ts: the current monotonic time
+    Return:
+        Returns a list of the URLs in the same order as url_keys, with None for the URLs that
+        aren't cached or have expired
+    """
+    urls = [None] * len(url_keys)
+    with PRESIGNED_URLS_LOCK:
+        for idx, one_key in enumerate(url_keys):
+            found = PRESIGNED_URLS.get(one_key)
+            if found is not None:
+                if found[1] > cur_ts:
+                    PRESIGNED_URLS.move_to_end(one_key)
+                    urls[idx] = found[0]
+                else:
+                    del PRESIGNED_URLS[one_key]
+
+    return urls
+
+
+def __cache_urls(new_urls: dict, expires_ts: float) -> None:
+    """ Keeps the presigned URLs for reuse
+    Arguments:
+        new_urls: the URLs keyed by their cache keys
+        expires_ts: the monotonic time the URLs are no longer reused
+    """
+    with PRESIGNED_URLS_LOCK:
+        for one_key, one_url in new_urls.items():
+            PRESIGNED_URLS[one_key] = (one_url, expires_ts)
+            PRESIGNED_URLS.move_to_end(one_key)
+        while len(PRESIGNED_URLS) > PRESIGN_CACHE_MAX_URLS:
+            PRESIGNED_URLS.popitem(last=False)
+
+
+def __sign_urls(minio: Minio, creds: object, object_info: list) -> list:
+    """ Returns newly presigned GET URLs for the objects
+    Arguments:
+        minio: the S3 client instance
+        creds: the credentials to sign with
+        object_info: list containing tuple pairs of bucket name and the object path
+    Return:
+        Returns a list of the URLs in the same order as object_info
+    """
+    # pylint: disable=protected-access
+    request_date = datetime.datetime.now(datetime.timezone.utc)
+    amz_date = request_date.strftime('%Y%m%dT%H%M%SZ')
+    signer_date = request_date.strftime('%Y%m%d')
+    query_params = {'X-Amz-Security-Token': creds.session_token} if creds.session_token else {}
+    regions = {}
+    urls = []
+    for bucket, obj_path in object_info:
+        if bucket not in regions:
+            regions[bucket] = minio._get_region(bucket)
+        region = regions[bucket]
+
+        obj_url = minio._base_url.build(method='GET', region=region, bucket_name=bucket,
+                                        object_name=obj_path, query_params=query_params)
+        urls.append(__sign_url(obj_url, creds.access_key,
+                               f'{signer_date}/{region}/{PRESIGN_SERVICE}/aws4_request',
+                               amz_date, __signing_key(creds.secret_key, signer_date, region)))
+
+    return urls
+
+
+def presigned_get_urls(minio: Minio, object_info: tuple) -> list:
+    """ Returns presigned GET URLs for the objects
+    Arguments:
+        minio: the S3 client instance
+        object_info: tuple containing tuple pairs of bucket name and the object path
+    Return:
+        Returns a list of the URLs in the same order as object_info
+    Notes:
+        Produces the same URLs as Minio's presigned_get_object(). The bucket regions and the
+        credentials are looked up once for all the objects, and the signing key is derived
+        once for each day and region. URLs are reused for PRESIGN_CACHE_SEC seconds
+    """
+    # pylint: disable=protected-access
+    creds = minio._provider.retrieve() if minio._provider else None
+    if creds is None:
+        # Anonymous access doesn't sign the URLs
+        return [minio.presigned_get_object(one_obj[0], one_obj[1]) for one_obj in object_info]
+
+    # Return what we can from the URLs we already have
+    cur_ts = time.monotonic()
+    url_keys = [(minio._base_url.host, creds.access_key, creds.secret_key, one_obj[0],
+                                                            one_obj[1]) for one_obj in object_info]
+    urls = __get_cached_urls(url_keys, cur_ts)
+
+    missing = [idx for idx, one_url in enumerate(urls) if one_url is None]
+    if not missing:
+        return urls
+
+    # Sign the rest
+    for idx, one_url in zip(missing,
+                            __sign_urls(minio, creds, [object_info[idx] for idx in missing])):
+        urls[idx] = one_url
+
+    __cache_urls({url_keys[idx]: urls[idx] for idx in missing}, cur_ts + PRESIGN_CACHE_SEC)
+
+    return urls
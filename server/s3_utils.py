@@ -1,6 +1,8 @@
 """ Utilities to help with S3 access """
 
+import concurrent.futures
 import csv
+import datetime
 from io import StringIO
 import json
 import os
@@ -16,16 +18,25 @@ from minio.deleteobjects import DeleteObject
 from minio.error import MinioException
 
 from sparcd_file_utils import load_timed_info, save_timed_info
+from spd_types.dataclasses import UploadMoveProgress
 from spd_types.s3info import S3Info
 from s3.s3_admin import S3AdminConnection
 from s3.s3_access_helpers import (find_settings_bucket, make_s3_path, COLLECTIONS_FOLDER,
                                     DEPLOYMENT_CSV_FILE_NAME, MEDIA_CSV_FILE_NAME,
                                     OBSERVATIONS_CSV_FILE_NAME, SPARCD_PREFIX, S3_UPLOADS_PATH_PART,
                                     S3_UPLOAD_META_JSON_FILE_NAME)
-from s3.s3_connect import s3_connect
+from s3.s3_connect import s3_connect, S3_POOL_SIZE
 
 from camtrap.v016 import camtrap
 
+# Environment variable name for the number of objects copied at the same time when moving uploads
+ENV_NAME_MOVE_UPLOAD_WORKERS = 'SPARCD_MOVE_UPLOAD_WORKERS'
+# The number of objects copied at the same time when moving uploads. Defaults to the number of
+# connections kept open to the S3 endpoint
+MOVE_UPLOAD_MAX_WORKERS = int(os.environ.get(ENV_NAME_MOVE_UPLOAD_WORKERS, S3_POOL_SIZE))
+# The number of objects copied between saves of a move's progress
+MOVE_UPLOAD_PROGRESS_OBJECTS = 500
+
 
 def __check_bucket_read(minio: Minio, bucket: str) -> Union[bool, None]:
     """ Checks if the user has read bucket permissions
@@ -89,8 +100,31 @@ def __change_old_colls(reader: csv.reader, coll_id: str,
     return new_rows if have_changes else None
 
 
+def __batch_objects(objects, batch_size: int):
+    """ Groups the objects, skipping folders, into lists of at most the batch size
+    Arguments:
+        objects: the objects to group
+        batch_size: the maximum number of objects in each group
+    Return:
+        Yields lists of objects
+    """
+    batch = []
+    for cur_obj in objects:
+        if cur_obj.is_dir:
+            continue
+
+        batch.append(cur_obj)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
 def __files_copy(minio: Minio, source_bucket: str, source_path: str, dest_bucket: str,
-                                                                get_dest_path: Callable) -> None:
+                 get_dest_path: Callable, progress: UploadMoveProgress,
+                 save_progress: Optional[Callable]) -> int:
     """ Copies the files recursively from the source to the destination
     Arguments:
         minio: the s3 client to access
@@ -98,17 +132,37 @@ def __files_copy(minio: Minio, source_bucket: str, source_path: str, dest_bucket
         source_path: the top-level starting path in the source_bucket
         dest_bucket: the bucket to put the objects to
         get_dest_path: the top-level path in which to move the objects to
+        progress: the progress of the copy, objects up to and including the last copied object
+                are not copied again
+        save_progress: called with the progress after each batch of objects is copied
     Return:
-        Returns True if successful and False if not
+        Returns the number of bytes that were copied
+    Notes:
+        The objects are copied on the S3 server with several copies made at the same time.
+        S3Error is raised if an object can't be copied
     """
-    for cur_obj in minio.list_objects(source_bucket, source_path, recursive=True):
-        if cur_obj.is_dir:
-            continue
-
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def copy_one(cur_obj) -> None:
         minio.copy_object(dest_bucket, get_dest_path(cur_obj.object_name),
                             CopySource(source_bucket, cur_obj.object_name)
                             )
 
+    num_bytes = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MOVE_UPLOAD_MAX_WORKERS) as executor:
+        for batch in __batch_objects(minio.list_objects(source_bucket, source_path, recursive=True,
+                                                        start_after=progress.last_copied),
+                                     MOVE_UPLOAD_PROGRESS_OBJECTS):
+            # Wait for the whole batch so that the progress only includes copied objects
+            _ = list(executor.map(copy_one, batch))
+
+            num_bytes += sum(cur_obj.size or 0 for cur_obj in batch)
+            progress.last_copied = batch[-1].object_name
+            progress.num_copied += len(batch)
+            if save_progress:
+                save_progress(progress)
+
+    return num_bytes
+
 
 def __update_upload_metadata(minio: Minio, bucket: str, file_path: str, coll_id: str) -> bool:
     """ Updates the upload's metadata with the correct collection ID
@@ -270,19 +324,17 @@ def __files_remove(minio: Minio, bucket: str, path: str) -> bool:
     if path.endswith(S3_UPLOADS_PATH_PART) or path.endswith(S3_UPLOADS_PATH_PART[:-1]):
         return False
 
-    # Remove objects
-    remove_dirs = []
-    for cur_obj in minio.list_objects(bucket, path, recursive=True):
-        if cur_obj.is_dir:
-            remove_dirs.append(DeleteObject(cur_obj.object_name))
-            continue
+    # Remove the objects in batches. We get the list first so that we're not removing objects
+    # while listing them
+    remove_objects = [DeleteObject(cur_obj.object_name) for cur_obj in \
+                                                minio.list_objects(bucket, path, recursive=True)]
+    have_errors = False
+    for one_error in minio.remove_objects(bucket, remove_objects):
+        print(f'ERROR: Unable to remove object {bucket}:{one_error.name}: {one_error.message}',
+                                                                                        flush=True)
+        have_errors = True
 
-        minio.remove_object(bucket, cur_obj.object_name)
-
-    # Remove folders
-    minio.remove_objects(bucket, remove_dirs)
-
-    return True
+    return not have_errors
 
 
 def __test_copy_access(minio: Minio, source_bucket: str, source_path: str,
@@ -421,16 +473,15 @@ def get_s3_info(url: str, access_key: str, secret_key: Union[str, Callable], \
 
     return S3Info(s3_uri, access_key, secret_key, s3_secure)
 
-def sparcd_config_exists(minio: Minio) -> bool:
+def sparcd_config_exists(minio: Minio, endpoint: str) -> bool:
     """ Checks that SPARCd is setup at the endpoint
     Arguments:
-        url: the URL to the S3 store
-        user: the S3 username
-        fetch_password: returns the S3 password
+        minio: the minio instance to check
+        endpoint: the S3 endpoint the minio instance is connected to
     Return:
         Returns True if there is a configuration on the S3 endpoint and False if not
     """
-    settings_bucket = find_settings_bucket(minio)
+    settings_bucket = find_settings_bucket(minio, endpoint)
 
     return settings_bucket is not None
 
@@ -483,7 +534,8 @@ def save_sparcd_config(config_data, sparcd_file: str, timed_file: str, s3_info:
 
 
 def move_upload(s3_info: S3Info, source_bucket: str, dest_bucket: str, source_path: str,
-                                                    get_dest_path: Callable) -> Union[bool, str]:
+                get_dest_path: Callable, progress: UploadMoveProgress=None,
+                save_progress: Callable=None) -> Union[bool, str]:
     """ Moves the objects starting at the specified path from the source bucket to the
         destination bucket preserving their paths
     Arguments:
@@ -492,6 +544,8 @@ def move_upload(s3_info: S3Info, source_bucket: str, dest_bucket: str, source_pa
         dest_bucket: the bucket to put the objects to
         source_path: the top-level starting path in the source_bucket
         get_dest_path: formats the destination path from the source path
+        progress: the progress of an earlier attempt at the move to resume from
+        save_progress: called with the progress of the move as objects are copied
     Return:
         Returns True if the data was moved and False if it wasn't. Returns None if there was no
         data to move
@@ -499,24 +553,46 @@ def move_upload(s3_info: S3Info, source_bucket: str, dest_bucket: str, source_pa
         All the data is copied, and then the data is removed from the source if the copy was
         completely successful
     """
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
     minio = s3_connect(s3_info)
+    if progress is None:
+        progress = UploadMoveProgress()
 
     # Perform checks
     if not minio.bucket_exists(source_bucket) or not minio.bucket_exists(dest_bucket):
         return False
 
-    # Make sure we can access the buckets for reading at least
-    if not __test_copy_access(minio, source_bucket, source_path, dest_bucket, get_dest_path):
+    # Make sure we can access the buckets for reading at least. The access test is skipped when
+    # resuming since it removes the destination copy of the first object
+    if not progress.last_copied and \
+            not __test_copy_access(minio, source_bucket, source_path, dest_bucket, get_dest_path):
         return False
 
     # Perform the complete copy
-    try:
-        __files_copy(minio, source_bucket, source_path, dest_bucket, get_dest_path)
-    except S3Error as ex:
-        print(f'ERROR: move_upload: Caught S3 exception while copying: ' \
-                f'src: {source_bucket}:{source_path} dst: {dest_bucket}', flush=True)
-        print(ex, flush=True)
-        return False
+    if not progress.copy_complete:
+        if progress.last_copied:
+            print(f'MOVE UPLOAD resuming after {progress.num_copied} copied objects: ' \
+                                                        f'{progress.last_copied}', flush=True)
+        start_num_copied = progress.num_copied
+        start_ts = datetime.datetime.now(datetime.UTC)
+        try:
+            num_bytes = __files_copy(minio, source_bucket, source_path, dest_bucket,
+                                                        get_dest_path, progress, save_progress)
+        except S3Error as ex:
+            print(f'ERROR: move_upload: Caught S3 exception while copying: ' \
+                    f'src: {source_bucket}:{source_path} dst: {dest_bucket}', flush=True)
+            print(ex, flush=True)
+            return False
+
+        elapsed_sec = max((datetime.datetime.now(datetime.UTC) - start_ts).total_seconds(), 0.001)
+        num_copied = progress.num_copied - start_num_copied
+        print(f'MOVE UPLOAD copied {num_copied} objects ({num_bytes / (1024 * 1024):.1f} MB) ' \
+                f'in {elapsed_sec:.1f} seconds: {num_copied / elapsed_sec:.1f} objects/sec ' \
+                f'{num_bytes / (1024 * 1024) / elapsed_sec:.1f} MB/sec', flush=True)
+
+        progress.copy_complete = True
+        if save_progress:
+            save_progress(progress)
 
     # Update the CAMTRAP files with the new collection ID if we copied to another SPARCD collection
     if dest_bucket.startswith(SPARCD_PREFIX):
@@ -524,7 +600,8 @@ def move_upload(s3_info: S3Info, source_bucket: str, dest_bucket: str, source_pa
 
     # Remove the source files
     try:
-        __files_remove(minio, source_bucket, source_path)
+        if not __files_remove(minio, source_bucket, source_path):
+            return False
     except S3Error as ex:
         print('ERROR: move_upload: Caught S3 exception while deleteing: ' \
                                                     f'{source_bucket}:{source_path}', flush=True)
@@ -7,6 +7,7 @@ from flask import Flask
 
 from sparcd_env import DEFAULT_DB_PATH, DEFAULT_DB_SANDBOX_PATH
 from sparcd_db import SPARCdDatabase
+from spd_database.spdsqlite_pool import CONNECTION_POOL
 
 from routes.admin_routes import admin_bp
 from routes.auth_routes import auth_bp
@@ -81,6 +82,8 @@ _db.connect()
 _reconcile_sandbox(_db)     # Clean up the DB as needed
 del _db
 _db = None
+# Don't keep the startup connections open since they're not used by the request threads
+CONNECTION_POOL.close_connections()
 print(f'Using database at {DEFAULT_DB_PATH}, {DEFAULT_DB_SANDBOX_PATH}', flush=True)
 print(f'Temporary folder at {tempfile.gettempdir()}', flush=True)
 
@@ -1,6 +1,11 @@
 """ Collection functions for SPARCd server """
 
+import concurrent.futures
+import copy
+import os
+import threading
 import time
+import traceback
 from typing import Optional
 
 from sparcd_db import SPARCdDatabase
@@ -13,13 +18,31 @@ from s3.s3_images import S3ImageConnection
 TIMEOUT_COLLECTIONS_SEC = 12 * 60 * 60
 # Uploaded images timeout length
 TIMEOUT_UPLOAD_SEC = 12 * 60 * 60
-# Maximum tries to get a lock for loading collections
-MAX_COLL_FETCH_TRIES = 10
 # Maximium number of seconds to wait for collections to get loaded before giving up
 MAX_COLL_FETCH_WAIT_SEC = 5 * 60
-# Sleep interval value while waiting for collections to load
-COLL_FETCH_WAIT_INTERVAL_SEC = (MAX_COLL_FETCH_WAIT_SEC) / \
-                                                ((MAX_COLL_FETCH_TRIES+1)*MAX_COLL_FETCH_TRIES/2)
+# Number of seconds between checks for another server process finishing loading collections
+COLL_FETCH_CHECK_INTERVAL_SEC = 0.1
+# The name of the lock held by the server process loading collections
+COLL_FETCH_LOCK_NAME = 'fetch_collection'
+# Environment variable name for the number of seconds past their timeout that collections are
+# still returned while they're reloaded in the background
+ENV_NAME_COLL_MAX_STALE_SEC = 'SPARCD_COLLECTIONS_MAX_STALE_SEC'
+# Default number of seconds past their timeout that collections are still returned
+DEFAULT_COLL_MAX_STALE_SEC = 12 * 60 * 60
+# Number of seconds past their timeout that collections are still returned while they're reloaded
+# in the background. Older collections are reloaded before they're returned. Set to 0 to always
+# reload expired collections before returning them
+COLL_MAX_STALE_SEC = max(0, int(os.environ.get(ENV_NAME_COLL_MAX_STALE_SEC,
+                                               DEFAULT_COLL_MAX_STALE_SEC)))
+
+# The collection loads in progress in this server process, keyed by S3 endpoint ID. Requests
+# needing the same collections wait for the load instead of starting their own
+COLL_LOADS = {}
+# The S3 endpoint IDs of the collections being reloaded in the background by this server process
+COLL_REFRESHES = set()
+COLL_LOADS_LOCK = threading.Lock()
+# The thread that reloads expired collections in the background
+COLL_REFRESH_EXECUTOR = None
 
 
 def __update_s3_from_db(s3_images, db_images) -> tuple:
@@ -42,6 +65,59 @@ def __update_s3_from_db(s3_images, db_images) -> tuple:
     return [s3_dicts[one_key] for one_key in s3_dicts]
 
 
+def __fetch_collections(db: SPARCdDatabase, s3_info: S3Info) -> Optional[tuple]:
+    """ Loads the collections from S3 and saves them in the database, or waits for another
+        server process that's loading them
+    Arguments:
+        db: the database to access
+        s3_info: connection information for the S3 endpoint
+    Return:
+        Returns the collection information associated with the S3 ID, or None if they couldn't
+        be loaded in time
+    Notes:
+        The collection generation in the database changes when another process saves the
+        collections, which is cheap to check while waiting. Waiting only reads the database,
+        the lock is only tried when it looks available
+    """
+    start_generation = db.get_collections_generation(s3_info.id)
+    give_up_ts = time.monotonic() + MAX_COLL_FETCH_WAIT_SEC
+
+    while True:
+        lock_id = db.get_lock(COLL_FETCH_LOCK_NAME) \
+                                    if db.is_lock_available(COLL_FETCH_LOCK_NAME) else None
+        if lock_id is not None:
+            try:
+                # The collections may have been saved while we were getting the lock
+                loaded_colls = db.get_all_collections(s3_info.id, TIMEOUT_COLLECTIONS_SEC)
+                if loaded_colls:
+                    return loaded_colls
+
+                skipped_buckets = []
+                loaded_colls = [sdupu.normalize_collection(one_coll) for one_coll in \
+                                S3CollectionConnection.get_collections(s3_info, skipped_buckets)]
+
+                # Only save complete collections so that the missing ones are tried again
+                if skipped_buckets:
+                    print(f'Not saving collections with {len(skipped_buckets)} missing: ' \
+                                                            f'{skipped_buckets}', flush=True)
+                else:
+                    db.save_all_collections(s3_info.id, loaded_colls)
+                return loaded_colls
+            finally:
+                db.release_lock(COLL_FETCH_LOCK_NAME, lock_id)
+
+        # Wait for the other process to save the collections. If it gives up without saving
+        # them, we'll get the lock and load them ourselves
+        if time.monotonic() >= give_up_ts:
+            return None
+        time.sleep(COLL_FETCH_CHECK_INTERVAL_SEC)
+
+        if db.get_collections_generation(s3_info.id) != start_generation:
+            loaded_colls = db.get_all_collections(s3_info.id, TIMEOUT_COLLECTIONS_SEC)
+            if loaded_colls:
+                return loaded_colls
+
+
 def __get_loaded_collections(db: SPARCdDatabase, s3_info: S3Info) -> Optional[tuple]:
     """ Loads the collections from S3 and saves them in the database
     Arguments:
@@ -49,46 +125,88 @@ def __get_loaded_collections(db: SPARCdDatabase, s3_info: S3Info) -> Optional[tu
         s3_info: connection information for the S3 endpoint
     Return:
         Returns the collection information associated with the S3 ID
+    Notes:
+        Only one request in this server process loads the collections, any other requests
+        for the same collections wait for that load to finish and share its result
     """
-    loaded_colls = None
+    with COLL_LOADS_LOCK:
+        coll_load = COLL_LOADS.get(s3_info.id)
+        is_loader = coll_load is None
+        if is_loader:
+            coll_load = concurrent.futures.Future()
+            COLL_LOADS[s3_info.id] = coll_load
+
+    if not is_loader:
+        try:
+            # Each request gets its own copy since the collections get updated for the user
+            return copy.deepcopy(coll_load.result(timeout=MAX_COLL_FETCH_WAIT_SEC))
+        except concurrent.futures.TimeoutError:
+            return None
 
-    # Get the collection information from the server
-    # If we can get the lock we load the collections, otherwise wait for the collections to load
-    have_lock = False
-    lock_id = None
     try:
-        lock_id = db.get_lock('fetch_collection')
-        if lock_id is not None:
-            have_lock = True
+        loaded_colls = __fetch_collections(db, s3_info)
+        # The waiting requests copy from their own copy since the returned collections are
+        # updated for this request's user
+        coll_load.set_result(copy.deepcopy(loaded_colls))
+    except Exception as ex:
+        coll_load.set_exception(ex)
+        raise
+    finally:
+        with COLL_LOADS_LOCK:
+            COLL_LOADS.pop(s3_info.id, None)
 
-            all_collections = S3CollectionConnection.get_collections(s3_info)
+    return loaded_colls
 
-            loaded_colls = []
-            for one_coll in all_collections:
-                loaded_colls.append(sdupu.normalize_collection(one_coll))
 
-            db.save_all_collections(s3_info.id, loaded_colls)
+def __refresh_collections(db: SPARCdDatabase, s3_info: S3Info) -> None:
+    """ Reloads the collections in the background
+    Arguments:
+        db: the database to access, it's not used by any other thread
+        s3_info: connection information for the S3 endpoint
+    """
+    try:
+        __get_loaded_collections(db, s3_info)
+    # pylint: disable=broad-exception-caught
+    except Exception as ex:
+        print(f'Unable to reload the collections in the background: {ex}', flush=True)
+        traceback.print_exception(ex)
+    finally:
+        with COLL_LOADS_LOCK:
+            COLL_REFRESHES.discard(s3_info.id)
 
-            db.release_lock('fetch_collection', lock_id)
-            have_lock = False
-            lock_id = None
-        else:
-            # We wait for the collections to get loaded
-            # This uses a linear wait/sleep but that can be changed
-            tries = 0
-            while tries < MAX_COLL_FETCH_TRIES:
-                tries += 1
-                time.sleep(tries * COLL_FETCH_WAIT_INTERVAL_SEC)
 
-                loaded_colls = db.get_all_collections(s3_info.id, TIMEOUT_COLLECTIONS_SEC)
-                if loaded_colls:
-                    tries += MAX_COLL_FETCH_TRIES
-    finally:
-        # If we have the lock, something must have happened so we release the lock
-        if have_lock is True and lock_id is not None:
-            db.release_lock('fetch_collection', lock_id)
+def __start_collections_refresh(db: SPARCdDatabase, s3_info: S3Info) -> None:
+    """ Starts reloading the collections in the background if they're not already being reloaded
+    Arguments:
+        db: the database being accessed
+        s3_info: connection information for the S3 endpoint
+    Notes:
+        The background thread is started when first needed so that each gunicorn worker has
+        its own. The background reload gets its own S3 information with the password already
+        found, since the request's S3 information may find the password using the request's
+        database. The password is only found when a reload is started
+    """
+    # pylint: disable=global-statement
+    global COLL_REFRESH_EXECUTOR
 
-    return loaded_colls
+    with COLL_LOADS_LOCK:
+        if s3_info.id in COLL_REFRESHES or s3_info.id in COLL_LOADS:
+            return
+        COLL_REFRESHES.add(s3_info.id)
+
+        if COLL_REFRESH_EXECUTOR is None:
+            COLL_REFRESH_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=1,
+                                                        thread_name_prefix='collections_refresh')
+
+    try:
+        refresh_s3_info = S3Info(s3_info.uri, s3_info.access_key, s3_info.secret_key,
+                                 s3_info.secure, s3_info.id)
+        COLL_REFRESH_EXECUTOR.submit(__refresh_collections, db.new_instance(), refresh_s3_info)
+    except:
+        # Let the next request try reloading the collections
+        with COLL_LOADS_LOCK:
+            COLL_REFRESHES.discard(s3_info.id)
+        raise
 
 
 # pylint: disable=too-many-positional-arguments,too-many-arguments
@@ -104,10 +222,17 @@ def load_collections(db: SPARCdDatabase, admin: bool, s3_info: S3Info) -> Option
     Notes:
         If the desired information is not in the database, the collection information is fetched
         from the S3 endpoint and then stored in the database.
+        Expired collection information is returned while it's reloaded in the background, as
+        long as it hasn't been expired for more than COLL_MAX_STALE_SEC seconds.
         If one of s3_url, user_name, or fetch_password is None then S3 will not be queried for
         collections
     """
-    loaded_colls = db.get_all_collections(s3_info.id, TIMEOUT_COLLECTIONS_SEC)
+    loaded_colls, elapsed_sec = db.get_all_collections_elapsed(s3_info.id)
+    if loaded_colls and elapsed_sec >= TIMEOUT_COLLECTIONS_SEC:
+        if elapsed_sec < TIMEOUT_COLLECTIONS_SEC + COLL_MAX_STALE_SEC:
+            __start_collections_refresh(db, s3_info)
+        else:
+            loaded_colls = None
 
     if not loaded_colls:
         loaded_colls = __get_loaded_collections(db, s3_info)
@@ -170,6 +295,49 @@ def collection_update(db: SPARCdDatabase, s3_id: str, collection: dict) -> None:
     db.collection_update(s3_id, collection, TIMEOUT_COLLECTIONS_SEC)
 
 
+def collection_upload_refresh(db: SPARCdDatabase, s3_info: S3Info, bucket: str, \
+                                                    collection_id: str, upload_path: str) -> bool:
+    """ Reloads one upload of a collection from the S3 endpoint and updates it in the saved
+        collection
+    Arguments:
+        db: the database to access
+        s3_info: the information on the S3 instance
+        bucket: the bucket of the collection
+        collection_id: the ID of the collection of the upload
+        upload_path: the S3 path of the upload
+    Return:
+        Returns True if the saved collection was updated, and False if the upload couldn't be
+        loaded, or the collection isn't saved or has expired
+    Notes:
+        Only the upload is loaded from the S3 endpoint instead of the whole collection
+    """
+    upload_info = S3CollectionConnection.get_upload_info(s3_info, bucket,
+                                                                    upload_path.rstrip('/') + '/')
+    if not upload_info:
+        return False
+
+    return db.collection_upload_update(s3_info.id, collection_id,
+                                       sdupu.normalize_upload(upload_info), TIMEOUT_COLLECTIONS_SEC)
+
+
+def upload_images_species_update(db: SPARCdDatabase, s3_id: str, collection_id: str, \
+                                        upload_name: str, image_species: dict) -> Optional[tuple]:
+    """ Applies species changes to the saved images of an upload
+    Arguments:
+        db: the database to access
+        s3_id: the unique ID of the S3 instance
+        collection_id: the ID of the collection of the upload
+        upload_name: the name of the upload
+        image_species: the changed species keyed by the S3 path of the image. Each species is a
+                dict with the common and scientific names, and the count
+    Return:
+        Returns all the images of the upload after the changes, or None if the upload's images
+        aren't saved or have expired
+    """
+    return db.upload_images_species_update(s3_id, collection_id, upload_name, image_species,
+                                                                            TIMEOUT_UPLOAD_SEC)
+
+
 def get_upload_images(db: SPARCdDatabase, bucket:str, collection_id: str, \
                     upload_name: str, s3_info: S3Info, \
                     force_refresh: bool=False, keep_image_url: bool=False) -> tuple:
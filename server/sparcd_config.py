@@ -15,6 +15,7 @@ from spd_types.s3info import S3Info
 import spd_crypt as crypt
 from s3.s3_access_helpers import SPARCD_PREFIX
 import s3_utils as s3u
+import token_cache
 
 # =============================================================================
 # Timeout constants
@@ -109,7 +110,9 @@ def get_password(token: str, db: SPARCdDatabase) -> Optional[str]:
     Return:
         The plain text password
     """
-    return crypt.do_decrypt(WORKING_PASSCODE, db.get_password(token))
+    password = crypt.do_decrypt(WORKING_PASSCODE, db.get_password(token))
+    token_cache.cache_password(token, password)
+    return password
 
 
 def get_s3_info(token: str, db: SPARCdDatabase, user_info: UserInfo,
@@ -124,12 +127,18 @@ def get_s3_info(token: str, db: SPARCdDatabase, user_info: UserInfo,
                         database calls cannot be made from worker threads
     Return:
         Returns the S3 endpoint information
+    Notes:
+        The endpoint and password are cached with the token so they're only decrypted once
     """
-    password = get_password(token, db) if eager_password else lambda: get_password(token, db)
-    return s3u.get_s3_info(user_info.url,
-                           user_info.name,
-                           password,
-                           lambda x: crypt.do_decrypt(WORKING_PASSCODE, x))
+    s3_endpoint, password = token_cache.cached_s3_info(token)
+    if s3_endpoint is None:
+        s3_endpoint = s3u.web_to_s3_url(user_info.url,
+                                        lambda x: crypt.do_decrypt(WORKING_PASSCODE, x))
+        token_cache.cache_s3_endpoint(token, s3_endpoint)
+    if password is None:
+        password = get_password(token, db) if eager_password else \
+                                                                lambda: get_password(token, db)
+    return S3Info(s3_endpoint[0], user_info.name, password, s3_endpoint[1])
 
 def make_handler_response(resp) -> tuple:
     """ Converts a standard handler result to a Flask response
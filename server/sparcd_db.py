@@ -7,13 +7,15 @@ import json
 import logging
 import os
 from typing import Optional
+import dateutil.tz
 
-from sparcd_env import SESSION_EXPIRE_SECONDS
-from spd_types.dataclasses import UploadResult
+from sparcd_env import DEFAULT_TIMEZONE_OFFSET, SESSION_EXPIRE_SECONDS
+from spd_types.dataclasses import UploadMoveProgress, UploadResult
 from spd_types.message import Message, Priority
 from spd_types.userinfo import UserInfo
 from spd_database.spdsqlite import SPDSQLite
 from spd_database.spdsqlite_sandbox import SPDSQLiteSandbox
+import token_cache
 
 # Maximum number of expired tokens to keep around on a per-user basis
 MAX_ALLOWED_EXPIRED_TOKENS_PER_USER = 1
@@ -21,6 +23,46 @@ MAX_ALLOWED_EXPIRED_TOKENS_PER_USER = 1
 # Maximum lock elapsed time in seconds before a lock is considered abandoned
 MAX_LOCK_WAIT_TIME_SEC = 2 * 60
 
+# Maximum number of seconds since the progress of an upload move was saved before it's not resumed
+UPLOAD_MOVE_TIMEOUT_SEC = 24 * 60 * 60
+
+# Prefix of the names of the generation counters that change each time collections are saved
+COLLECTIONS_GENERATION_PREFIX = 'collections-'
+
+# The names of the image timestamp parts saved with collection images, in the order they're saved
+IMAGE_TIMESTAMP_PARTS = ('epoch', 'year', 'month', 'day', 'hour', 'minute', 'day_of_year',
+                         'day_of_week')
+# The index of the first timestamp part in the collection image rows from the database
+COLL_IMAGE_PARTS_START = 4
+
+
+def image_timestamp_parts(timestamp: str) -> tuple:
+    """ Returns the image timestamp as epoch seconds and the parts of its date and time
+    Arguments:
+        timestamp: the ISO formatted image timestamp
+    Return:
+        Returns a tuple of the epoch seconds, year, month, day, hour, minute, day of the year,
+        and day of the week (Monday is 0). Each value is None if the timestamp is missing or
+        can't be parsed
+    Notes:
+        Timestamps without timezone information are considered to be in the default timezone.
+        The parts are in the timezone of the timestamp
+    """
+    if not timestamp:
+        return (None,) * len(IMAGE_TIMESTAMP_PARTS)
+
+    try:
+        image_dt = datetime.datetime.fromisoformat(timestamp)
+    except ValueError:
+        return (None,) * len(IMAGE_TIMESTAMP_PARTS)
+
+    if image_dt.tzinfo is None or image_dt.tzinfo.utcoffset(image_dt) is None:
+        image_dt = image_dt.replace(tzinfo=dateutil.tz.tzoffset(None, DEFAULT_TIMEZONE_OFFSET))
+
+    return (int(image_dt.timestamp()), image_dt.year, image_dt.month, image_dt.day,
+            image_dt.hour, image_dt.minute, image_dt.timetuple().tm_yday, image_dt.weekday())
+
+
 class SPARCdDatabase:
     """Class handling access connections to the database
     """
@@ -31,6 +73,7 @@ class SPARCdDatabase:
         """
         self._db = SPDSQLite(db_path, logger, verbose)
         self._sandbox_db = SPDSQLiteSandbox(db_sandbox_path, logger, verbose)
+        self._init_args = (db_path, db_sandbox_path, logger, verbose)
         self._main_depth = 0
         self._sandbox_depth = 0
 
@@ -70,6 +113,15 @@ class SPARCdDatabase:
             if self._sandbox_depth == 0:
                 self._sandbox_db.close()
 
+    def new_instance(self) -> 'SPARCdDatabase':
+        """ Returns a new instance using the same databases
+        Return:
+            Returns the new database instance
+        Notes:
+            Instances are not shared between threads, background threads need their own
+        """
+        return SPARCdDatabase(*self._init_args)
+
     def database_info(self) -> tuple:
         """ Returns information on the database as a tuple of strings
         """
@@ -120,6 +172,14 @@ class SPARCdDatabase:
         with self._main():
             self._db.update_token_timestamp(token)
 
+    def update_token_timestamps(self, tokens: tuple) -> None:
+        """Updates the timestamps of the tokens when they're newer than the saved ones
+        Arguments:
+            tokens: tuple of token and timestamp (in seconds since the epoch) pairs
+        """
+        with self._main():
+            self._db.update_token_timestamps(tokens)
+
     def remove_token(self, token: str) -> None:
         """ Attempts to remove the token from the database
         Arguments:
@@ -127,6 +187,7 @@ class SPARCdDatabase:
         """
         with self._main():
             self._db.remove_token(token)
+        token_cache.invalidate_token(token)
 
     def get_token_user_info(self, token: str) -> Optional[UserInfo]:
         """ Looks up token and user information
@@ -219,6 +280,7 @@ class SPARCdDatabase:
         """
         with self._main():
             self._db.update_user_settings(s3_id, username, settings, email)
+        token_cache.invalidate_user(username)
 
     def get_sandbox(self, s3_id: str) -> Optional[tuple]:
         """ Returns the sandbox items
@@ -266,13 +328,124 @@ class SPARCdDatabase:
         Arguments:
             s3_id: the ID of the S3 instance
             bucket: the bucket name to save the uploads under
-            uploads: the uploads to save containing the collection name,
-                upload name, and associated JSON
+            uploads: the uploads to save containing the upload name and associated information
         Return:
             Returns True if the data was saved and False if something went wrong
+        Notes:
+            The images of the uploads are saved separately from the rest of the upload
+            information, one row for each image species. See get_collection_images()
+        """
+        save_uploads = []
+        save_images = []
+        for one_upload in uploads:
+            upload_info = one_upload['info']
+            save_uploads.append({'name': one_upload['name'],
+                                 'json': json.dumps({key: value for key, value in \
+                                                        upload_info.items() if key != 'images'})
+                                })
+
+            for one_image in upload_info.get('images') or []:
+                image_row = (one_upload['name'], one_image['name'], one_image['s3_path'],
+                             one_image.get('timestamp')) + \
+                            image_timestamp_parts(one_image.get('timestamp')) + \
+                            (upload_info.get('loc'),)
+                if not one_image.get('species'):
+                    save_images.append(image_row + (None, None, None))
+                    continue
+                for one_species in one_image['species']:
+                    save_images.append(image_row + (one_species['scientificName'],
+                                                    one_species['name'],
+                                                    one_species['count']))
+
+        with self._main():
+            return self._db.save_uploads(s3_id, bucket, save_uploads, save_images)
+
+    # pylint: disable=too-many-arguments, too-many-positional-arguments
+    def get_collection_images(self, s3_id: str, bucket: str, locations: tuple=None, \
+                              species: tuple=None, start_epoch: int=None, \
+                              end_epoch: int=None, years: tuple=None, months: tuple=None, \
+                              hours: tuple=None, days_of_week: tuple=None) -> dict:
+        """ Returns the saved images of a collection that match the filters
+        Arguments:
+            s3_id: the ID of the S3 instance
+            bucket: the bucket of the collection
+            locations: optional location IDs that images need to have
+            species: optional scientific names of which images need to have at least one
+            start_epoch: optional earliest image timestamp in seconds
+            end_epoch: optional latest image timestamp in seconds
+            years: optional tuple of the first and last years of the image timestamps
+            months: optional months of the image timestamps
+            hours: optional hours of the image timestamps
+            days_of_week: optional days of the week of the image timestamps (Monday is 0)
+        Return:
+            Returns a dict keyed by upload name with a list of image dicts as values. Each image
+            dict has the name, timestamp, bucket, s3_path, and species of the image, and a
+            timestamp_parts dict with the parsed timestamp (see image_timestamp_parts()) when
+            the timestamp is valid
+        Notes:
+            Only upload information that hasn't expired should be used (see get_uploads())
         """
         with self._main():
-            return self._db.save_uploads(s3_id, bucket, uploads)
+            res = self._db.get_collection_images(s3_id, bucket, locations, species,
+                                                 start_epoch, end_epoch, years, months, hours,
+                                                 days_of_week)
+
+        return self._group_collection_images(bucket, res)
+
+    @staticmethod
+    def _group_collection_images(bucket: str, rows: tuple) -> dict:
+        """ Groups the collection image rows into images by upload
+        Arguments:
+            bucket: the bucket of the collection
+            rows: the image rows, with the rows of the same image next to each other
+        Return:
+            Returns a dict keyed by upload name with a list of image dicts as values (see
+            get_collection_images())
+        """
+        parts_end = COLL_IMAGE_PARTS_START + len(IMAGE_TIMESTAMP_PARTS)
+        upload_images = {}
+        cur_image = None
+        cur_key = None
+        for one_row in rows:
+            upload, name, s3_path, timestamp = one_row[:COLL_IMAGE_PARTS_START]
+            # Rows for the same image are next to each other
+            if cur_key != (upload, s3_path):
+                cur_key = (upload, s3_path)
+                cur_image = {'name': name,
+                             'timestamp': timestamp,
+                             'bucket': bucket,
+                             's3_path': s3_path,
+                             'species': []
+                            }
+                if one_row[COLL_IMAGE_PARTS_START] is not None:
+                    cur_image['timestamp_parts'] = dict(zip(IMAGE_TIMESTAMP_PARTS,
+                                                        one_row[COLL_IMAGE_PARTS_START:parts_end]))
+                upload_images.setdefault(upload, []).append(cur_image)
+
+            scientific, common, count = one_row[parts_end:]
+            if scientific is not None:
+                cur_image['species'].append({'name': common,
+                                             'scientificName': scientific,
+                                             'count': count})
+
+        return upload_images
+
+    def get_collection_species_counts(self, s3_id: str, bucket: str) -> dict:
+        """ Returns the number of image observations for each species in a collection
+        Arguments:
+            s3_id: the ID of the S3 instance
+            bucket: the bucket of the collection
+        Return:
+            Returns a dict keyed by species common name containing the count and scientificName
+        """
+        with self._main():
+            res = self._db.get_collection_species_counts(s3_id, bucket)
+
+        if not res or len(res) < 1:
+            return {}
+
+        return {one_row[0]: {'count': one_row[2], 'scientificName': one_row[1]} \
+                                                                                for one_row in res}
 
     def save_query_path(self, token: str, file_path: str) -> bool:
         """ Stores the specified query file path in the database
@@ -709,6 +882,7 @@ class SPARCdDatabase:
         """
         with self._main():
             self._db.save_user_species(s3_id, username, species)
+        token_cache.invalidate_user(username)
 
     def get_image_species_edits(self, s3_id: str, bucket: str, upload_path: str) -> dict:
         """ Returns all the saved edits for this bucket and upload path
@@ -769,6 +943,7 @@ class SPARCdDatabase:
         """
         with self._main():
             self._db.update_user(s3_id, old_name, new_email, admin)
+        token_cache.invalidate_user(old_name)
 
     def update_species(self, s3_id: str, username: str, old_scientific: str, new_scientific: str, \
                                         new_name: str, new_keybind: str, new_icon_url: str) -> bool:
@@ -1078,23 +1253,37 @@ class SPARCdDatabase:
                 raise RuntimeError('Invalid timeout seconds parameter when getting all ' \
                                                             f'collections: {timeout_sec}') from ex
 
+        all_coll, elapsed_sec = self.get_all_collections_elapsed(s3_id)
+        if all_coll is None or elapsed_sec >= timeout_sec:
+            return None
+
+        return all_coll
+
+    def get_all_collections_elapsed(self, s3_id: str) -> tuple:
+        """ Gets all the collections associated with the collection, and how old they are
+        Arguments:
+            s3_id: The ID of the S3 endpoint
+        Return:
+            Returns a tuple of the collection information and the number of seconds since the
+            oldest collection was saved. The collection information is a tuple of dicts with the
+            name and JSON of the collection and its uploads. If there are no collections, or
+            there's a problem with the saved collections, a tuple of None values is returned
+        """
         with self._main():
             all_coll = self._db.get_collections(s3_id)
 
         if not all_coll or len(all_coll) <= 0:
-            return None
+            return None, None
 
-        for one_coll in all_coll:
-            try:
-                if int(one_coll[2]) >= timeout_sec:
-                    return None
-            except ValueError:
-                # We have a problem that indicates the DB might be corrupted
-                print('Error: database returned an invalid timeout value when getting all ' \
-                                                                                    'collections')
-                return None
+        try:
+            elapsed_sec = max(int(one_coll[2]) for one_coll in all_coll)
+        except ValueError:
+            # We have a problem that indicates the DB might be corrupted
+            print('Error: database returned an invalid timeout value when getting all ' \
+                                                                                'collections')
+            return None, None
 
-        return [json.loads(one_coll[1]) for one_coll in all_coll]
+        return [json.loads(one_coll[1]) for one_coll in all_coll], elapsed_sec
 
     def save_all_collections(self, s3_id: str, collections: tuple) -> None:
         """ Saves/replaces the collections into the database under the indicated ID
@@ -1102,12 +1291,28 @@ class SPARCdDatabase:
             s3_id: The ID of the S3 endpoint
             collections: a tuple of collection dicts containing the collection id
                 and other information
+        Notes:
+            The generation of the collections is incremented when they are saved
         """
         with self._main():
-            self._db.save_collections(s3_id,
+            if self._db.save_collections(s3_id,
                         [{'id': one_coll['id'], 'name': one_coll['name'], \
                                                             'json': json.dumps(one_coll)} \
-                                    for one_coll in collections])
+                                    for one_coll in collections]):
+                self._db.generation_increment(COLLECTIONS_GENERATION_PREFIX + s3_id)
+
+    def get_collections_generation(self, s3_id: str) -> int:
+        """ Returns a number that changes each time all the collections are saved
+        Arguments:
+            s3_id: The ID of the S3 endpoint
+        Return:
+            Returns the current generation of the saved collections
+        Notes:
+            This is a quick way for other processes to find out that collections were saved
+            without loading them
+        """
+        with self._main():
+            return self._db.generation_get(COLLECTIONS_GENERATION_PREFIX + s3_id)
 
     def collection_add(self, s3_id: str, collection: dict, timeout_sec: int=None) -> bool:
         """ Adds the collection in the database or updates it if it already exists
@@ -1167,6 +1372,43 @@ class SPARCdDatabase:
 
         return True
 
+    def collection_upload_update(self, s3_id: str, collection_id: str, upload: dict, \
+                                                                timeout_sec: int=None) -> bool:
+        """ Replaces one upload of a saved collection if the collection hasn't expired
+        Arguments:
+            s3_id: The ID of the S3 endpoint
+            collection_id: the ID of the collection of the upload
+            upload: the upload information, the upload with the same key is replaced
+            timeout_sec: the number of seconds all the saved collections are valid
+        Return:
+            Returns True if the upload was replaced and False if the collection has expired or
+            the upload isn't found
+        Notes:
+            The collection is read and written back in one transaction so that other changes
+            to the collection aren't lost
+        """
+        if timeout_sec is None:
+            raise RuntimeError('Missing timeout seconds parameter when updating a collection ' \
+                                                                                        'upload')
+
+        with self._main():
+            with self._db.transaction(immediate=True):
+                coll_res = self._db.collection_get(s3_id, collection_id)
+                if not coll_res or coll_res[1] is None or int(coll_res[1]) >= int(timeout_sec):
+                    return False
+
+                collection = json.loads(coll_res[0])
+                upload_idx = next((idx for idx, one_upload in \
+                                            enumerate(collection.get('uploads', [])) \
+                                                if one_upload['key'] == upload['key']), None)
+                if upload_idx is None:
+                    return False
+
+                collection['uploads'][upload_idx] = upload
+                self._db.collection_update(s3_id, collection_id, json.dumps(collection))
+
+        return True
+
     def get_lock(self, name: str, max_lock_sec: int=MAX_LOCK_WAIT_TIME_SEC) -> Optional[int]:
         """ Attempts to get a named lock in a non-blocking fashion
         Arguments:
@@ -1182,6 +1424,24 @@ class SPARCdDatabase:
         with self._main():
             return self._db.lock_get(name, max_lock_sec)
 
+    def is_lock_available(self, name: str, max_lock_sec: int=MAX_LOCK_WAIT_TIME_SEC) -> bool:
+        """ Checks if a named lock looks available without trying to get it
+        Arguments:
+            name: the name of the lock to check
+            max_lock_sec: maximum number of seconds to a lock is allowed to be locked before it's
+                    considered to be abandoned
+        Return:
+            Returns True if the lock isn't held or has been abandoned, and False if it's held
+        Notes:
+            This only reads the database, use it to avoid writing when waiting for a lock.
+            The lock may still be taken by someone else before get_lock() is called
+        """
+        if max_lock_sec is None or not name or max_lock_sec < 0:
+            raise RuntimeError(f'Invalid parameters for named lock "{name}": {max_lock_sec}')
+
+        with self._main():
+            return self._db.lock_available(name, max_lock_sec)
+
     def release_lock(self, name: str, lock_id: int) -> None:
         """ Releases a named lock
         Arguments:
@@ -1194,6 +1454,55 @@ class SPARCdDatabase:
         with self._main():
             self._db.lock_release(name, lock_id)
 
+    def get_upload_move(self, s3_id: str, source_bucket: str, source_path: str, \
+                                                    dest_bucket: str) -> UploadMoveProgress:
+        """ Returns the saved progress of moving an upload
+        Arguments:
+            s3_id: the ID of the S3 endpoint
+            source_bucket: the bucket the upload is being moved from
+            source_path: the path of the upload being moved
+            dest_bucket: the bucket the upload is being moved to
+        Return:
+            Returns the saved progress, or new progress if the move hasn't been started or the
+            saved progress is too old
+        """
+        with self._main():
+            res = self._db.get_upload_move(s3_id, source_bucket, source_path, dest_bucket,
+                                                                        UPLOAD_MOVE_TIMEOUT_SEC)
+
+        if not res:
+            return UploadMoveProgress()
+
+        return UploadMoveProgress(last_copied=res[0], num_copied=res[1], copy_complete=res[2])
+
+    def save_upload_move(self, s3_id: str, source_bucket: str, source_path: str, \
+                                        dest_bucket: str, progress: UploadMoveProgress) -> None:
+        """ Saves the progress of moving an upload
+        Arguments:
+            s3_id: the ID of the S3 endpoint
+            source_bucket: the bucket the upload is being moved from
+            source_path: the path of the upload being moved
+            dest_bucket: the bucket the upload is being moved to
+            progress: the progress of the move
+        """
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        with self._main():
+            self._db.save_upload_move(s3_id, source_bucket, source_path, dest_bucket,
+                                      (progress.last_copied, progress.num_copied,
+                                                                    progress.copy_complete))
+
+    def remove_upload_move(self, s3_id: str, source_bucket: str, source_path: str, \
+                                                                    dest_bucket: str) -> None:
+        """ Removes the saved progress of moving an upload
+        Arguments:
+            s3_id: the ID of the S3 endpoint
+            source_bucket: the bucket the upload was moved from
+            source_path: the path of the upload that was moved
+            dest_bucket: the bucket the upload was moved to
+        """
+        with self._main():
+            self._db.remove_upload_move(s3_id, source_bucket, source_path, dest_bucket)
+
     def upload_images_get(self, s3_id: str, collection_id: str, upload_name: str, \
                                                                     timeout_sec: int=None) -> tuple:
         """ Returns the images associated with a particular upload
@@ -1253,6 +1562,66 @@ class SPARCdDatabase:
             return self._db.upload_images_save(upload_id,
                                 [{'json':json.dumps(one_image)}|one_image for one_image in images])
 
+    def upload_images_species_update(self, s3_id: str, collection_id: str, upload_name: str, \
+                                    image_species: dict, timeout_sec: int=None) -> Optional[tuple]:
+        """ Applies species changes to the saved images of an upload
+        Arguments:
+            s3_id: The ID of the S3 endpoint
+            collection_id: collection ID  of the upload
+            upload_name: the name of the collection's upload
+            image_species: the changed species keyed by the S3 path of the image. Each species
+                    is a dict with the common and scientific names, and the count
+            timeout_sec: the number of seconds the upload data is considered valid
+        Return:
+            Returns all the images of the upload after the changes, or None if the upload's
+            images aren't saved or have expired
+        Notes:
+            A changed species replaces the image's species with the same scientific name or
+            one without a scientific name, or is added to the image. Species with a count of
+            zero or less are removed. This is the same as when the observations are updated
+        """
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        if timeout_sec is None:
+            raise RuntimeError('Missing timeout seconds parameter when updating upload images')
+
+        with self._main():
+            with self._db.transaction(immediate=True):
+                upload_res = self._db.upload_get(s3_id, collection_id, upload_name)
+                if not upload_res or upload_res[2] is None or \
+                                                        int(upload_res[2]) >= int(timeout_sec):
+                    return None
+
+                images = tuple(json.loads(one_res[0]) for one_res in \
+                                                    self._db.upload_images_get(upload_res[0]))
+                changed_images = []
+                for one_image in images:
+                    changed_species = image_species.get(one_image['s3_path'])
+                    if not changed_species:
+                        continue
+
+                    cur_species = one_image.get('species') or []
+                    for one_species in changed_species:
+                        found = next((orig_species for orig_species in cur_species \
+                                if orig_species['scientificName'] == one_species['scientific'] \
+                                   or not orig_species['scientificName']), None)
+                        if found is None:
+                            found = {}
+                            cur_species.append(found)
+                        found['name'] = one_species['common']
+                        found['scientificName'] = one_species['scientific']
+                        found['count'] = str(one_species['count'])
+
+                    # Species with a zero count are removed
+                    one_image['species'] = [one_species for one_species in cur_species \
+                                                                if int(one_species['count']) > 0]
+                    changed_images.append({'s3_path': one_image['s3_path'],
+                                           'json': json.dumps(one_image)})
+
+                if changed_images:
+                    self._db.upload_images_update(upload_res[0], changed_images)
+
+        return images
+
     def get_image_data(self, s3_id: str, collection_id: str, upload_name: str, \
                                                                 image_key: str) -> Optional[dict]:
         """ Returns the image data associated with the image key
@@ -1,17 +1,74 @@
 """ Location and species admin update utilities for SPARCd server """
 
 import json
+import os
+import tempfile
 from typing import Optional
 
 import spd_crypt as crypt
 import s3_utils as s3u
+from sparcd_file_utils import load_timed_info, save_timed_info
 from s3.s3_access_helpers import LOCATIONS_JSON_FILE_NAME, SPECIES_JSON_FILE_NAME, SPARCD_PREFIX
 from s3.s3_admin import S3AdminConnection
 from spd_types.s3info import S3Info
-from text_formatters.coordinate_utils import DEFAULT_UTM_ZONE, deg2utm, deg2utm_code
+from text_formatters.coordinate_utils import DEFAULT_UTM_ZONE, LAT_LONG_DATUM, add_utm_coords, \
+                                             deg2utm_coord, get_utm_coords
 
 # Name of temporary locations file
 TEMP_LOCATIONS_FILE_NAME = SPARCD_PREFIX + 'locations.json'
+# Name of temporary file of the locations' converted UTM coordinates
+TEMP_LOCATIONS_UTM_FILE_NAME = SPARCD_PREFIX + 'locations-utm.json'
+# Number of seconds to keep the converted UTM coordinates file around before it's invalid
+LOCATIONS_UTM_EXPIRE_SEC = 7 * 24 * 60 * 60
+
+
+def __get_locations_utm_path(s3_info: S3Info) -> str:
+    """ Returns the path to the converted UTM coordinates file of the locations
+    Arguments:
+        s3_info: the information on the S3 endpoint
+    Return:
+        The path of the file
+    """
+    return os.path.join(tempfile.gettempdir(), s3_info.id + '-' + TEMP_LOCATIONS_UTM_FILE_NAME)
+
+
+def __get_locations_utm(s3_info: S3Info, locations: tuple, keys: tuple) -> dict:
+    """ Returns the UTM conversions of the location points
+    Arguments:
+        s3_info: the information on the S3 endpoint
+        locations: the locations as loaded from the settings
+        keys: the (lat, lon, datum) tuples of the points to convert
+    Return:
+        Returns the dict of the (UTM code, X, Y) tuples keyed by their (lat, lon, datum)
+    Notes:
+        The conversions are kept in a file alongside the locations so that other server processes
+        don't need to convert them. The file is ignored when the locations change
+    """
+    coords = get_utm_coords(keys)
+    if len(coords) == len(keys):
+        return coords
+
+    # Load the saved conversions if they're for these locations
+    utm_path = __get_locations_utm_path(s3_info)
+    locations_hash = crypt.generate_hash((json.dumps(locations, sort_keys=True),))
+    saved_info = load_timed_info(utm_path, LOCATIONS_UTM_EXPIRE_SEC)
+    saved_coords = {}
+    if saved_info and saved_info.get('locations_hash') == locations_hash:
+        saved_coords = {(lat, lon, datum): (utm_code, utm_x, utm_y) for \
+                                    lat, lon, datum, utm_code, utm_x, utm_y in saved_info['coords']}
+        add_utm_coords(saved_coords)
+
+    # Convert any missing points and save everything
+    missing_keys = [one_key for one_key in keys if one_key not in saved_coords]
+    for one_key in missing_keys:
+        saved_coords[one_key] = deg2utm_coord(one_key[0], one_key[1])
+    if missing_keys:
+        save_timed_info(utm_path, {'locations_hash': locations_hash,
+                                   'coords': [one_key + one_coord for one_key, one_coord in \
+                                                                            saved_coords.items()]
+                                  })
+
+    return {one_key: saved_coords[one_key] for one_key in keys}
 
 
 def load_locations(s3_info: S3Info, for_admin: bool = False) -> tuple:
@@ -28,23 +85,34 @@ def load_locations(s3_info: S3Info, for_admin: bool = False) -> tuple:
     if not cur_locations:
         return cur_locations
 
-    # TODO: Store this information somewhere for easy fetching
+    # Find the points of the locations that need converting
+    convert_locs = []
     for one_loc in cur_locations:
         if 'utm_code' not in one_loc or 'utm_x' not in one_loc or 'utm_y' not in one_loc:
             if 'latProperty' in one_loc and 'lngProperty' in one_loc:
                 if not for_admin:
-                    one_loc['latProperty'] = round(float(one_loc['latProperty']), 3)
-                    one_loc['lngProperty'] = round(float(one_loc['lngProperty']), 3)
+                    loc_key = (round(float(one_loc['latProperty']), 3),
+                               round(float(one_loc['lngProperty']), 3),
+                               LAT_LONG_DATUM)
                 else:
-                    one_loc['latProperty'] = float(one_loc['latProperty'])
-                    one_loc['lngProperty'] = float(one_loc['lngProperty'])
+                    loc_key = (float(one_loc['latProperty']), float(one_loc['lngProperty']),
+                               LAT_LONG_DATUM)
+                convert_locs.append((one_loc, loc_key))
 
-                utm_x, utm_y = deg2utm(one_loc['latProperty'], one_loc['lngProperty'])
-                one_loc['utm_code'] = ''.join([str(one_res) for one_res in
-                                               deg2utm_code(float(one_loc['latProperty']),
-                                                            float(one_loc['lngProperty']))])
-                one_loc['utm_x'] = int(utm_x)
-                one_loc['utm_y'] = int(utm_y)
+    if not convert_locs:
+        return cur_locations
+
+    # The locations are updated after getting the conversions so that the unchanged locations
+    # can be checked against the saved conversions
+    coords = __get_locations_utm(s3_info, cur_locations,
+                                 tuple(set(loc_key for _, loc_key in convert_locs)))
+    for one_loc, loc_key in convert_locs:
+        utm_code, utm_x, utm_y = coords[loc_key]
+        one_loc['latProperty'] = loc_key[0]
+        one_loc['lngProperty'] = loc_key[1]
+        one_loc['utm_code'] = utm_code
+        one_loc['utm_x'] = int(utm_x)
+        one_loc['utm_y'] = int(utm_y)
 
     return cur_locations
 
@@ -119,6 +187,9 @@ def update_admin_locations(s3_info: S3Info, changes: dict) -> bool:
 
     s3u.save_sparcd_config(all_locs, LOCATIONS_JSON_FILE_NAME,
                             f'{s3_info.id}-{TEMP_LOCATIONS_FILE_NAME}', s3_info)
+
+    # Convert the changed locations' coordinates now, instead of on the next load
+    load_locations(s3_info)
     return True
 
 
@@ -1,7 +1,6 @@
 """ Species statistics utilities for SPARCd server """
 
 import concurrent.futures
-import json
 import os
 import tempfile
 import time
@@ -46,30 +45,40 @@ def list_uploads_thread(s3_info: S3Info, bucket: str) -> object:
     return {'bucket': bucket, 'uploads_info': uploads_info}
 
 
-def __load_db_uploads(db: SPARCdDatabase, s3_id: str,
-                      colls: tuple, s3_uploads: list) -> list:
-    """ Loads upload data from the database for all collections
+def __merge_species_counts(ret_stats: dict, species_counts: dict) -> None:
+    """ Merges species counts into the species stats
+    Arguments:
+        ret_stats: the dict of species stats to update in place
+        species_counts: the species counts to merge, keyed by species name and containing
+                        count and scientificName
+    """
+    for species_name, one_count in species_counts.items():
+        if species_name in ret_stats:
+            ret_stats[species_name]['count'] += one_count['count']
+        else:
+            ret_stats[species_name] = dict(one_count)
+
+
+def __load_db_species_counts(db: SPARCdDatabase, s3_id: str,
+                             colls: tuple, s3_uploads: list) -> dict:
+    """ Loads species counts from the database for all collections
     Arguments:
         db: the database connection
         s3_id: the S3 instance ID
         colls: the list of collections to load
         s3_uploads: list to append bucket names to when DB data is missing
     Return:
-        Returns the list of upload dicts loaded from the database
+        Returns the dict of species stats keyed by species name
     """
-    all_results = []
+    ret_stats = {}
     for one_coll in colls:
         cur_bucket = one_coll['bucket']
-        uploads_info = db.get_uploads(s3_id, cur_bucket, TIMEOUT_UPLOADS_SEC)
-        if uploads_info:
-            all_results.extend([{'bucket': cur_bucket,
-                                  'name': one_upload['name'],
-                                  'info': json.loads(one_upload['json'])
-                                          if one_upload['json'] else {}}
-                                 for one_upload in uploads_info])
+        if db.get_uploads(s3_id, cur_bucket, TIMEOUT_UPLOADS_SEC):
+            __merge_species_counts(ret_stats,
+                                   db.get_collection_species_counts(s3_id, cur_bucket))
         else:
             s3_uploads.append(cur_bucket)
-    return all_results
+    return ret_stats
 
 
 def __load_s3_uploads(db: SPARCdDatabase, s3_id: str,
@@ -96,8 +105,7 @@ def __load_s3_uploads(db: SPARCdDatabase, s3_id: str,
                     continue
                 uploads_info = [{'bucket': uploads_results['bucket'],
                                   'name': one_upload['name'],
-                                  'info': one_upload,
-                                  'json': json.dumps(one_upload)}
+                                  'info': one_upload}
                                  for one_upload in uploads_results['uploads_info']]
                 db.save_uploads(s3_id, uploads_results['bucket'], uploads_info)
                 all_results.extend(uploads_info)
@@ -142,12 +150,13 @@ def species_stats(db: SPARCdDatabase, colls: tuple,
         Returns the species stats dict keyed by species name
     """
     s3_uploads = []
-    all_results = __load_db_uploads(db, s3_id, colls, s3_uploads)
+    ret_stats = __load_db_species_counts(db, s3_id, colls, s3_uploads)
 
     if s3_uploads:
-        all_results.extend(__load_s3_uploads(db, s3_id, s3_info, s3_uploads))
+        __merge_species_counts(ret_stats,
+                               __count_species(__load_s3_uploads(db, s3_id, s3_info, s3_uploads)))
 
-    return __count_species(all_results)
+    return ret_stats
 
 
 def load_species_stats(db: SPARCdDatabase, is_admin: bool, s3_info: S3Info) -> Optional[tuple]:
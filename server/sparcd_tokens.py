@@ -0,0 +1,104 @@
+""" Session token functions for SPARCd server """
+
+import atexit
+import os
+import threading
+import time
+import traceback
+from typing import Optional
+
+from sparcd_db import SPARCdDatabase
+from sparcd_env import SESSION_EXPIRE_SECONDS
+
+# Environment variable name for the most number of seconds that the last time a token was seen
+# is held before it's saved to the database
+ENV_NAME_TOKEN_SEEN_SAVE_SEC = 'SPARCD_TOKEN_SEEN_SAVE_SEC'
+# Default most number of seconds that the last time a token was seen is held before it's saved
+DEFAULT_TOKEN_SEEN_SAVE_SEC = 60
+# The most number of seconds that the last time a token was seen is held before it's saved. It's
+# kept to a tenth of the session timeout so that other server processes don't expire sessions
+# that are still in use
+TOKEN_SEEN_SAVE_SEC = max(1, min(int(os.environ.get(ENV_NAME_TOKEN_SEEN_SAVE_SEC,
+                                                    DEFAULT_TOKEN_SEEN_SAVE_SEC)),
+                                 int(SESSION_EXPIRE_SECONDS) // 10))
+
+# The last time, in seconds since the epoch, that tokens were seen by this server process and
+# that aren't saved yet, keyed by token
+TOKENS_SEEN = {}
+TOKENS_SEEN_LOCK = threading.Lock()
+# The thread that saves the seen tokens of this server process
+TOKENS_SEEN_THREAD = None
+
+
+def __save_tokens_seen_loop(db: SPARCdDatabase) -> None:
+    """ Periodically saves the last time tokens were seen
+    Arguments:
+        db: the database to save to
+    """
+    while True:
+        time.sleep(TOKEN_SEEN_SAVE_SEC)
+        save_tokens_seen(db)
+
+
+def save_tokens_seen(db: SPARCdDatabase) -> None:
+    """ Saves the last time tokens were seen by this server process to the database
+    Arguments:
+        db: the database to save to
+    Notes:
+        If the tokens can't be saved they're kept for the next try
+    """
+    with TOKENS_SEEN_LOCK:
+        if not TOKENS_SEEN:
+            return
+        tokens_seen = tuple(TOKENS_SEEN.items())
+        TOKENS_SEEN.clear()
+
+    try:
+        db.update_token_timestamps(tokens_seen)
+    # pylint: disable=broad-exception-caught
+    except Exception as ex:
+        print(f'Unable to save the last time {len(tokens_seen)} tokens were seen', flush=True)
+        traceback.print_exception(ex)
+        with TOKENS_SEEN_LOCK:
+            for token, seen_ts in tokens_seen:
+                TOKENS_SEEN[token] = max(seen_ts, TOKENS_SEEN.get(token, 0))
+
+
+def token_seen(db: SPARCdDatabase, token: str) -> None:
+    """ Records that the token was just used
+    Arguments:
+        db: the database being accessed
+        token: the token that was used
+    Notes:
+        The time is saved to the database in the background along with the times of other
+        tokens, at most TOKEN_SEEN_SAVE_SEC seconds later, and when the server process exits.
+        The background thread is started when first needed so that each gunicorn worker has
+        its own
+    """
+    # pylint: disable=global-statement
+    global TOKENS_SEEN_THREAD
+
+    with TOKENS_SEEN_LOCK:
+        TOKENS_SEEN[token] = int(time.time())
+
+        if TOKENS_SEEN_THREAD is None or not TOKENS_SEEN_THREAD.is_alive():
+            save_db = db.new_instance()
+            TOKENS_SEEN_THREAD = threading.Thread(target=__save_tokens_seen_loop,
+                                                  args=(save_db,), name='tokens_seen',
+                                                  daemon=True)
+            TOKENS_SEEN_THREAD.start()
+            atexit.register(save_tokens_seen, save_db)
+
+
+def token_seen_elapsed_sec(token: str) -> Optional[int]:
+    """ Returns the number of seconds since this server process last saw the token
+    Arguments:
+        token: the token to check
+    Return:
+        Returns the number of seconds, or None if the token hasn't been seen since the last time
+        the tokens were saved
+    """
+    with TOKENS_SEEN_LOCK:
+        seen_ts = TOKENS_SEEN.get(token)
+
+    return int(time.time()) - seen_ts if seen_ts is not None else None
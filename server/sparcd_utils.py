@@ -1,5 +1,6 @@
 """ Core utility functions for SPARCd server """
 
+import glob
 import hashlib
 import json
 import math
@@ -9,6 +10,8 @@ from typing import Optional
 from flask import request
 
 from sparcd_db import SPARCdDatabase
+import sparcd_tokens
+import token_cache
 
 
 def make_boolean(value) -> bool:
@@ -93,17 +96,21 @@ def cleanup_old_queries(db: SPARCdDatabase, token: str) -> None:
     Arguments:
         db: connections to the current database
         token: the session token used to identify queries to clean up
+    Notes:
+        The files of any formatted query tabs are removed along with the query file
     """
     expired_queries = db.get_clear_queries(token)
     if expired_queries:
         for one_query_path in expired_queries:
-            if os.path.exists(one_query_path):
-                try:
-                    os.unlink(one_query_path)
-                # pylint: disable=broad-exception-caught
-                except Exception as ex:
-                    print(f'Unable to remove old query file: {one_query_path}')
-                    print(ex)
+            tab_paths = glob.glob(glob.escape(os.path.splitext(one_query_path)[0]) + '_*.json')
+            for one_path in [one_query_path] + tab_paths:
+                if os.path.exists(one_path):
+                    try:
+                        os.unlink(one_path)
+                    # pylint: disable=broad-exception-caught
+                    except Exception as ex:
+                        print(f'Unable to remove old query file: {one_path}')
+                        print(ex)
 
 
 def token_is_valid(token: str, client_ip: str, user_agent: str, db: SPARCdDatabase,
@@ -117,19 +124,33 @@ def token_is_valid(token: str, client_ip: str, user_agent: str, db: SPARCdDataba
         expire_seconds: the session expiration timeout
     Returns:
         Returns True if the token is valid and False if not
+    Notes:
+        Validated tokens are cached for a short time so that the database isn't checked on
+        each request
     """
-    login_info, elapsed_sec = db.get_token_user_info(token)
-    if login_info is not None and elapsed_sec is not None:
+    login_info = token_cache.cached_user_info(token)
+    if login_info is None:
+        login_info, elapsed_sec = db.get_token_user_info(token)
+        if login_info is None or elapsed_sec is None:
+            return False, None
+
+        # Use when we last saw the token if it hasn't been saved yet
+        seen_elapsed_sec = sparcd_tokens.token_seen_elapsed_sec(token)
+        if seen_elapsed_sec is not None:
+            elapsed_sec = min(int(elapsed_sec), seen_elapsed_sec)
+        if abs(int(elapsed_sec)) >= expire_seconds:
+            return False, None
+
         if login_info.settings:
             login_info.settings = json.loads(login_info.settings)
         if login_info.species:
             login_info.species = json.loads(login_info.species)
+        token_cache.cache_user_info(token, login_info)
 
-        if abs(int(elapsed_sec)) < expire_seconds and \
-           client_ip.rstrip('/') in (login_info.client_ip.rstrip('/'), '*') and \
-           login_info.user_agent == user_agent:
-            db.update_token_timestamp(token)
-            return True, login_info
+    if client_ip.rstrip('/') in (login_info.client_ip.rstrip('/'), '*') and \
+       login_info.user_agent == user_agent:
+        sparcd_tokens.token_seen(db, token)
+        return True, login_info
 
     return False, None
 
@@ -9,6 +9,11 @@ import sqlite3
 from time import sleep
 from typing import Generator, Optional
 
+from spd_database.spdsqlite_pool import CONNECTION_POOL
+
+# The PRAGMA statements run on new database connections
+DB_PRAGMAS = ('PRAGMA journal_mode=WAL', 'PRAGMA busy_timeout=10000',)
+
 class SPDSQLite:
     """Class handling access connections to the database
     """
@@ -21,6 +26,7 @@ class SPDSQLite:
             verbose: set to True to have more verbose logging
         """
         self._conn = None
+        self._conn_path = None
         self._path = db_path
         self._verbose = verbose
         self._logger = logger
@@ -32,8 +38,12 @@ class SPDSQLite:
         self.close()
 
     @contextmanager
-    def transaction(self) -> Generator:
+    def transaction(self, immediate: bool=False) -> Generator:
         """Context manager for atomic database transactions
+        Arguments:
+            immediate: set to True to lock the database for writing at the start of the
+                    transaction so that what's read can't be changed by others before it's
+                    written back
         Yields:
             The active database connection
         Raises:
@@ -55,6 +65,8 @@ class SPDSQLite:
                 self._savepoint_counter += 1
                 savepoint = f'sp_{self._savepoint_counter}'
                 self._conn.execute(f'SAVEPOINT {savepoint}')
+            elif immediate:
+                self._conn.execute('BEGIN IMMEDIATE')
             yield self._conn
             if in_transaction:
                 self._conn.execute(f'RELEASE SAVEPOINT {savepoint}')
@@ -100,10 +112,9 @@ class SPDSQLite:
                         f'database={database_path}' if database_path is not None else None,
                    ) if param is not None)
                 self._logger.info(f'Connecting to the database {print_params}')
-            # We disable thread checking since we're using thread-safe Sqlite
-            self._conn = sqlite3.connect(database_path, check_same_thread=False)
-            self._conn.execute('PRAGMA journal_mode=WAL')
-            self._conn.execute('PRAGMA busy_timeout=10000')
+            # Connections are kept open for each thread by the connection pool
+            self._conn = CONNECTION_POOL.get_connection(database_path, DB_PRAGMAS)
+            self._conn_path = database_path
 
     def reconnect(self) -> None:
         """Attempts a reconnection if we're not connected
@@ -113,10 +124,13 @@ class SPDSQLite:
 
     def close(self) -> None:
         """ Closes the connection to the database
+        Notes:
+            The connection is returned to the connection pool for reuse
         """
         if self._conn:
-            self._conn.close()
+            CONNECTION_POOL.release_connection(self._conn_path, self._conn)
             self._conn = None
+            self._conn_path = None
 
     def add_token(self, token: str, user: str, password: str, client_ip: str, user_agent: str, \
                                                             s3_url: str, s3_id: str) -> None:
@@ -176,6 +190,21 @@ class SPDSQLite:
             cursor.execute(query, (token,))
             cursor.close()
 
+    def update_token_timestamps(self, tokens: tuple) -> None:
+        """Updates the timestamps of the tokens when they're newer than the saved ones
+        Arguments:
+            tokens: tuple of token and timestamp (in seconds since the epoch) pairs
+        """
+        if self._conn is None:
+            raise RuntimeError('update_token_timestamps: attempting to access database before ' \
+                                        'connecting')
+
+        with self.transaction():
+            cursor = self._conn.cursor()
+            query = 'UPDATE tokens SET timestamp=? WHERE token=? AND timestamp<?'
+            cursor.executemany(query, [(seen_ts, token, seen_ts) for token, seen_ts in tokens])
+            cursor.close()
+
     def remove_token(self, token: str) -> None:
         """ Attempts to remove the token from the database
         Arguments:
@@ -381,6 +410,28 @@ class SPDSQLite:
                         f's3_id: {s3_id}')
             return None
 
+    def collection_get(self, s3_id: str, coll_id: str) -> Optional[tuple]:
+        """ Returns the saved collection information
+        Arguments:
+            s3_id: the endpoint ID of the collection
+            coll_id: the ID of the collection
+        Return:
+            Returns a tuple of the collection JSON and the elapsed seconds since the collection
+            was saved, or None if the collection isn't found
+        """
+        if self._conn is None:
+            raise RuntimeError('Attempting to get collection information from the database '\
+                                                                            'before connecting')
+
+        cursor = self._conn.cursor()
+        cursor.execute('SELECT json, (strftime("%s", "now")-timestamp) AS elapsed_sec ' \
+                                'FROM collections WHERE hash_id=?', (self.hash2str(s3_id+coll_id),))
+
+        res = cursor.fetchone()
+        cursor.close()
+
+        return res
+
     def collection_add(self, s3_id: str, coll_id: str, coll_name: str, coll_json: str) -> None:
         """ Adds the new collection information to the database
         Arguments:
@@ -537,9 +588,9 @@ class SPDSQLite:
         # Prepare for the insert
         insert_query = 'INSERT INTO upload_images(uploads_id, hash_id, name, key, json, ' \
                             'timestamp) VALUES(?, ?, ?, ?, ?, strftime("%s", "now"))'
-        insert_values = ([upload_id, self.hash2str(str(upload_id)+one_image['s3_path']), \
-                            one_image['name'], one_image['key'], one_image['json']] \
-                                                                        for one_image in images)
+        insert_values = [(upload_id, self.hash2str(str(upload_id)+one_image['s3_path']), \
+                            one_image['name'], one_image['key'], one_image['json']) \
+                                                                        for one_image in images]
 
         # Run the SQL
         try:
@@ -563,6 +614,25 @@ class SPDSQLite:
 
         return True
 
+    def upload_images_update(self, upload_id: int, images: tuple) -> None:
+        """ Updates saved images associated with the upload ID
+        Arguments:
+            upload_id: the ID associated with the image uploads
+            images: the tuple of image data containing the s3_path and the json to save
+        """
+        if self._conn is None:
+            raise RuntimeError('Attempting to update an upload\'s images in the database '\
+                                                                                'before connecting')
+
+        update_values = [(one_image['json'], self.hash2str(str(upload_id)+one_image['s3_path'])) \
+                                                                    for one_image in images]
+
+        with self.transaction():
+            cursor = self._conn.cursor()
+            cursor.executemany('UPDATE upload_images SET json=? WHERE hash_id=?', update_values)
+
+            cursor.close()
+
     def get_image_data(self, s3_id: str, collection_id: str, upload_name: str, \
                                                                 image_key: str) -> tuple:
         """ Returns the image data associated with the image key
@@ -622,31 +692,64 @@ class SPDSQLite:
 
         return res
 
-    def save_uploads(self, s3_id: str, bucket: str, uploads: tuple) -> bool:
+    def save_uploads(self, s3_id: str, bucket: str, uploads: tuple, images: tuple=None) -> bool:
         """ Save the upload information into the table
         Arguments:
             s3_id: the ID of the S3 instance endpoint
             bucket: The bucket to get uploads for
             uploads: the uploads to save containing the collection name,
                 upload name, and associated JSON
+            images: the image rows to save with each row containing the upload name, image
+                name, S3 path, timestamp, epoch seconds, year, month, day, hour, minute, day of
+                the year, day of the week, location ID, scientific name, common name, and count
         Return:
             Returns True if the data was saved and False if something went wrong
         """
         if self._conn is None:
             raise RuntimeError('Attempting to access database before connecting')
 
+        uploads_sql = 'INSERT INTO uploads(s3_id, bucket, name, json, timestamp) ' \
+                                                        'VALUES(?, ?, ?, ?, strftime("%s", "now"))'
+        images_sql = 'INSERT INTO collection_images(s3_id, bucket, upload, name, s3_path, ' \
+                            'timestamp, epoch, year, month, day, hour, minute, day_of_year, ' \
+                            'day_of_week, location, scientific, common, count) ' \
+                        'VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'
+
+        # Get the rows ready before writing so that the database is locked for less time
+        uploads_data = [(s3_id, bucket, one_upload['name'], one_upload['json']) \
+                                                                    for one_upload in uploads]
+        images_data = [(s3_id, bucket) + tuple(one_image) for one_image in images or []]
+        timeout_name = s3_id + bucket
+
         try:
             with self.transaction():
                 cursor = self._conn.cursor()
 
                 # Clean up old records
                 cursor.execute('DELETE FROM uploads where s3_id=? AND bucket=?', (s3_id, bucket))
+                cursor.execute('DELETE FROM collection_images where s3_id=? AND bucket=?',
+                                                                                (s3_id, bucket))
 
                 # Insert new records
-                for one_upload in uploads:
-                    cursor.execute('INSERT INTO uploads(s3_id, bucket, name, json, timestamp) ' \
-                                    'values(?, ?, ?, ?, strftime("%s", "now"))', \
-                                            (s3_id, bucket, one_upload['name'], one_upload['json']))
+                cursor.executemany(uploads_sql, uploads_data)
+                if images_data:
+                    cursor.executemany(images_sql, images_data)
+
+                # Update the timeout table for uploads and do some cleanup if needed
+                cursor.execute('SELECT COUNT(1) FROM table_timeout WHERE name=(?)',
+                                                                                (timeout_name,))
+                res = cursor.fetchone()
+                count = int(res[0]) if res and len(res) > 0 else 0
+                if count > 1:
+                    # Remove multiple old entries
+                    cursor.execute('DELETE FROM table_timeout WHERE name=(?)', (timeout_name,))
+                    count = 0
+                if count <= 0:
+                    cursor.execute('INSERT INTO table_timeout(name,timestamp) ' \
+                                        'VALUES (?,strftime("%s", "now"))', (timeout_name,))
+                else:
+                    cursor.execute('UPDATE table_timeout SET timestamp=strftime("%s", "now") ' \
+                                        'WHERE name=(?)', (timeout_name,))
 
                 cursor.close()
         except sqlite3.Error as ex:
@@ -655,29 +758,95 @@ class SPDSQLite:
             print(ex)
             return False
 
-        # Update the timeout table for uploads and do some cleanup if needed
+        return True
+
+    def get_collection_images(self, s3_id: str, bucket: str, locations: tuple=None, \
+                            species: tuple=None, start_epoch: int=None, \
+                            end_epoch: int=None, years: tuple=None, months: tuple=None, \
+                            hours: tuple=None, days_of_week: tuple=None) -> tuple:
+        """ Returns the image rows of a collection that match the filters
+        Arguments:
+            s3_id: the ID of the S3 instance endpoint
+            bucket: the bucket of the collection
+            locations: optional location IDs that images need to have
+            species: optional scientific names of which images need to have at least one
+            start_epoch: optional earliest image timestamp in seconds
+            end_epoch: optional latest image timestamp in seconds
+            years: optional tuple of the first and last years of the image timestamps
+            months: optional months of the image timestamps
+            hours: optional hours of the image timestamps
+            days_of_week: optional days of the week of the image timestamps (Monday is 0)
+        Return:
+            Returns a tuple of row tuples containing the upload name, image name, S3 path,
+            timestamp, epoch seconds, year, month, day, hour, minute, day of the year, day of the
+            week, scientific name, common name, and count. Images with more than one species
+            have a row for each species
+        """
+        # pylint: disable=too-many-arguments, too-many-positional-arguments, too-many-locals
+        if self._conn is None:
+            raise RuntimeError('Attempting to get collection images from the database before ' \
+                                                                                    'connecting')
+
+        query = 'SELECT upload, name, s3_path, timestamp, epoch, year, month, day, hour, ' \
+                        'minute, day_of_year, day_of_week, scientific, common, count ' \
+                    'FROM collection_images WHERE s3_id=? AND bucket=?'
+        params = [s3_id, bucket]
+
+        if locations is not None:
+            query += ' AND location IN (' + ','.join(['?'] * len(locations)) + ')'
+            params.extend(locations)
+        if start_epoch is not None:
+            query += ' AND epoch >= ?'
+            params.append(start_epoch)
+        if end_epoch is not None:
+            query += ' AND epoch <= ?'
+            params.append(end_epoch)
+        if years is not None:
+            query += ' AND year BETWEEN ? AND ?'
+            params.extend(years)
+        for column, values in (('month', months), ('hour', hours), ('day_of_week', days_of_week)):
+            if values is not None:
+                query += f' AND {column} IN (' + ','.join(['?'] * len(values)) + ')'
+                params.extend(values)
+        if species is not None:
+            # Keep all the species rows of an image that has at least one matching species
+            query += ' AND s3_path IN (SELECT s3_path FROM collection_images WHERE s3_id=? AND ' \
+                                'bucket=? AND scientific IN (' + \
+                                ','.join(['?'] * len(species)) + '))'
+            params.extend([s3_id, bucket])
+            params.extend(species)
+
+        query += ' ORDER BY upload, s3_path'
+
         cursor = self._conn.cursor()
-        cursor.execute('SELECT COUNT(1) FROM table_timeout WHERE name=(?)', (s3_id+bucket,))
-        res = cursor.fetchone()
+        cursor.execute(query, params)
+        res = cursor.fetchall()
         cursor.close()
 
-        with self.transaction():
-            cursor = self._conn.cursor()
-            count = int(res[0]) if res and len(res) > 0 else 0
-            if count > 1:
-                # Remove multiple old entries
-                cursor.execute('DELETE FROM table_timeout WHERE name=(?)', (s3_id+bucket,))
-                count = 0
-            if count <= 0:
-                cursor.execute('INSERT INTO table_timeout(name,timestamp) ' \
-                                    'VALUES (?,strftime("%s", "now"))', (s3_id+bucket,))
-            else:
-                cursor.execute('UPDATE table_timeout SET timestamp=strftime("%s", "now") ' \
-                                    'WHERE name=(?)', (s3_id+bucket,))
+        return res
 
-            cursor.close()
+    def get_collection_species_counts(self, s3_id: str, bucket: str) -> tuple:
+        """ Returns the number of image observations for each species in a collection
+        Arguments:
+            s3_id: the ID of the S3 instance endpoint
+            bucket: the bucket of the collection
+        Return:
+            Returns a tuple of row tuples containing the common name, a scientific name, and
+            the number of observations
+        """
+        if self._conn is None:
+            raise RuntimeError('Attempting to count collection species in the database before ' \
+                                                                                    'connecting')
 
-        return True
+        cursor = self._conn.cursor()
+        cursor.execute('SELECT TRIM(common) AS species_name, MIN(scientific), count(1) ' \
+                            'FROM collection_images WHERE s3_id=? AND bucket=? AND ' \
+                                'common IS NOT NULL AND TRIM(common) != "" ' \
+                            'GROUP BY species_name', (s3_id, bucket))
+        res = cursor.fetchall()
+        cursor.close()
+
+        return res
 
     def save_query_path(self, token: str, file_path: str) -> bool:
         """ Stores the specified query file path in the database
@@ -1242,7 +1411,7 @@ class SPDSQLite:
             raise RuntimeError('Attempting to get common file edits fron the database '\
                                                                                 'before connecting')
 
-        updated_query_fragment = 'AND updated <= ?' if check_smaller_values is True else \
+        updated_query_fragment = 'AND updated <= ? ' if check_smaller_values is True else \
                                                                                     'AND updated=? '
 
         cursor = self._conn.cursor()
@@ -1405,6 +1574,29 @@ class SPDSQLite:
         cursor.close()
         return None
 
+    def lock_available(self, name: str, max_lock_sec: int) -> bool:
+        """ Checks if the named lock can be obtained without changing it
+        Arguments:
+            name: the name of the lock
+            max_lock_sec: the maximum number of seconds a lock is allowed to be locked before
+                    its assumed abandoned
+        Return:
+            Returns True if the lock isn't held or has been abandoned, and False if it's held
+        """
+        if self._conn is None:
+            raise RuntimeError('Attempting to check a named lock in the database before ' \
+                                                                                    'connecting')
+
+        cursor = self._conn.cursor()
+        cursor.execute('SELECT count(1) FROM db_locks WHERE name=? AND value IS NOT NULL AND ' \
+                                            'strftime("%s", "now")-timestamp <= ?',
+                                    (name, max_lock_sec))
+
+        res = cursor.fetchone()
+        cursor.close()
+
+        return not res or int(res[0]) == 0
+
     def lock_release(self, name: str, value: int) -> None:
         """ Releases a named lock
         Arguments:
@@ -1424,6 +1616,127 @@ class SPDSQLite:
 
             cursor.close()
 
+    def generation_get(self, name: str) -> int:
+        """ Returns the current value of a named generation counter
+        Arguments:
+            name: the name of the generation counter
+        Return:
+            Returns the value of the counter, or 0 if the counter hasn't been incremented
+        """
+        if self._conn is None:
+            raise RuntimeError('Attempting to get a generation counter from the database ' \
+                                                                            'before connecting')
+
+        cursor = self._conn.cursor()
+        cursor.execute('SELECT generation FROM db_generations WHERE name=?', (name,))
+
+        res = cursor.fetchone()
+        cursor.close()
+
+        return int(res[0]) if res and res[0] is not None else 0
+
+    def generation_increment(self, name: str) -> None:
+        """ Increments a named generation counter, adding the counter if it doesn't exist
+        Arguments:
+            name: the name of the generation counter
+        """
+        if self._conn is None:
+            raise RuntimeError('Attempting to increment a generation counter in the database ' \
+                                                                            'before connecting')
+
+        with self.transaction():
+            cursor = self._conn.cursor()
+            cursor.execute('INSERT INTO db_generations(name, generation, timestamp) ' \
+                                'VALUES(?, 1, strftime("%s", "now")) ' \
+                            'ON CONFLICT(name) DO UPDATE SET generation=generation+1, ' \
+                                'timestamp=strftime("%s", "now")', (name,))
+
+            cursor.close()
+
+    def get_upload_move(self, s3_id: str, source_bucket: str, source_path: str, \
+                                        dest_bucket: str, timeout_sec: int) -> Optional[tuple]:
+        """ Returns the saved progress of moving an upload
+        Arguments:
+            s3_id: the ID of the S3 endpoint
+            source_bucket: the bucket the upload is being moved from
+            source_path: the path of the upload being moved
+            dest_bucket: the bucket the upload is being moved to
+            timeout_sec: the number of seconds before the saved progress is too old to be used
+        Return:
+            Returns a tuple of the name of the last copied object, the number of copied objects,
+            and whether or not the copy is complete. None is returned if there isn't any
+            progress saved
+        """
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        if self._conn is None:
+            raise RuntimeError('Attempting to get upload move progress from the database ' \
+                                                                            'before connecting')
+
+        cursor = self._conn.cursor()
+        cursor.execute('SELECT last_copied, num_copied, copy_complete FROM upload_moves WHERE ' \
+                            's3_id=? AND source_bucket=? AND source_path=? AND dest_bucket=? AND ' \
+                            '(strftime("%s", "now")-timestamp) <= ?',
+                        (s3_id, source_bucket, source_path, dest_bucket, timeout_sec))
+
+        res = cursor.fetchone()
+        cursor.close()
+
+        if not res or len(res) < 3:
+            return None
+
+        return res[0], int(res[1]), res[2] == 1
+
+    def save_upload_move(self, s3_id: str, source_bucket: str, source_path: str, \
+                         dest_bucket: str, progress: tuple) -> None:
+        """ Saves the progress of moving an upload
+        Arguments:
+            s3_id: the ID of the S3 endpoint
+            source_bucket: the bucket the upload is being moved from
+            source_path: the path of the upload being moved
+            dest_bucket: the bucket the upload is being moved to
+            progress: a tuple of the name of the last copied object, the number of copied
+                    objects, and whether or not the copy is complete
+        """
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        if self._conn is None:
+            raise RuntimeError('Attempting to save upload move progress to the database ' \
+                                                                            'before connecting')
+
+        last_copied, num_copied, copy_complete = progress
+        with self.transaction():
+            cursor = self._conn.cursor()
+            cursor.execute('DELETE FROM upload_moves WHERE s3_id=? AND source_bucket=? AND ' \
+                                                        'source_path=? AND dest_bucket=?',
+                                (s3_id, source_bucket, source_path, dest_bucket))
+            cursor.execute('INSERT INTO upload_moves(s3_id, source_bucket, source_path, ' \
+                                'dest_bucket, last_copied, num_copied, copy_complete, timestamp) ' \
+                            'VALUES(?, ?, ?, ?, ?, ?, ?, strftime("%s", "now"))',
+                                (s3_id, source_bucket, source_path, dest_bucket, last_copied,
+                                                            num_copied, 1 if copy_complete else 0))
+
+            cursor.close()
+
+    def remove_upload_move(self, s3_id: str, source_bucket: str, source_path: str, \
+                                                                    dest_bucket: str) -> None:
+        """ Removes the saved progress of moving an upload
+        Arguments:
+            s3_id: the ID of the S3 endpoint
+            source_bucket: the bucket the upload was moved from
+            source_path: the path of the upload that was moved
+            dest_bucket: the bucket the upload was moved to
+        """
+        if self._conn is None:
+            raise RuntimeError('Attempting to remove upload move progress from the database ' \
+                                                                            'before connecting')
+
+        with self.transaction():
+            cursor = self._conn.cursor()
+            cursor.execute('DELETE FROM upload_moves WHERE s3_id=? AND source_bucket=? AND ' \
+                                                        'source_path=? AND dest_bucket=?',
+                                (s3_id, source_bucket, source_path, dest_bucket))
+
+            cursor.close()
+
     def count_admin(self, s3_id: str) -> int:
         """ Counts the number of administrators found in the database for the S3 endpoint
         Arguments:
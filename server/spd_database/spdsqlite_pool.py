@@ -0,0 +1,130 @@
+"""This script contains the per-thread pool of SQLite connections for the SPARCd Web app
+"""
+
+import datetime
+import os
+import sqlite3
+import threading
+
+# Environment variable name for the maximum age of a pooled connection
+ENV_NAME_DB_CONNECTION_MAX_AGE = 'SPARCD_DB_CONNECTION_MAX_AGE'
+# Default maximum number of seconds a pooled connection is used before it's reopened
+DEFAULT_DB_CONNECTION_MAX_AGE_SEC = 60 * 60
+# The maximum number of seconds a pooled connection is used before it's reopened
+DB_CONNECTION_MAX_AGE_SEC = int(os.environ.get(ENV_NAME_DB_CONNECTION_MAX_AGE,
+                                               DEFAULT_DB_CONNECTION_MAX_AGE_SEC))
+
+
+class SQLiteConnectionPool:
+    """Class keeping long-lived SQLite connections for each thread. Each thread has one connection
+       for each database path so that the connection setup is only done once and SQLite's page
+       cache is kept between requests
+    """
+
+    def __init__(self, max_age_sec: int=DB_CONNECTION_MAX_AGE_SEC):
+        """Initialize an instance
+        Arguments:
+            max_age_sec: the maximum number of seconds a connection is used before it's reopened
+        """
+        self._max_age_sec = max_age_sec
+        self._local = threading.local()
+
+    def _thread_connections(self) -> dict:
+        """ Returns the current thread's connections
+        Return:
+            The dict of the thread's connections keyed by the database path. The values are
+            lists of the connection, the time it was opened, and the number of users
+        """
+        if not hasattr(self._local, 'connections'):
+            self._local.connections = {}
+        return self._local.connections
+
+    @staticmethod
+    def _is_healthy(conn: sqlite3.Connection) -> bool:
+        """ Checks that the connection can still be used
+        Arguments:
+            conn: the connection to check
+        Return:
+            Returns True if the connection is usable and False if not
+        """
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def get_connection(self, database_path: str, pragmas: tuple) -> sqlite3.Connection:
+        """ Returns the current thread's connection to the database, opening one if needed
+        Arguments:
+            database_path: the path to the database
+            pragmas: the PRAGMA statements to run when a connection is opened
+        Return:
+            The database connection
+        Notes:
+            Connections that are older than the maximum age, or fail the health check, are
+            closed and a new connection is opened
+        """
+        connections = self._thread_connections()
+        now = datetime.datetime.now(datetime.UTC)
+
+        if database_path in connections:
+            conn, opened_ts, num_users = connections[database_path]
+            # Connections that are in use aren't replaced
+            if num_users > 0 or ((now - opened_ts).total_seconds() <= self._max_age_sec and \
+                                                                    self._is_healthy(conn)):
+                connections[database_path][2] += 1
+                return conn
+            del connections[database_path]
+            try:
+                conn.close()
+            except sqlite3.Error as ex:
+                print(f'Unable to close pooled database connection: {database_path}', flush=True)
+                print(ex, flush=True)
+
+        # We disable thread checking since we're using thread-safe Sqlite
+        conn = sqlite3.connect(database_path, check_same_thread=False)
+        for one_pragma in pragmas:
+            conn.execute(one_pragma)
+
+        connections[database_path] = [conn, now, 1]
+        return conn
+
+    def release_connection(self, database_path: str, conn: sqlite3.Connection) -> None:
+        """ Returns the current thread's connection to the database to the pool
+        Arguments:
+            database_path: the path to the database
+            conn: the connection being returned
+        Notes:
+            Connections that don't belong to the current thread are left alone. Once the
+            connection has no more users, any transaction that's still open on it is rolled back
+        """
+        connections = self._thread_connections()
+        if database_path not in connections or connections[database_path][0] is not conn:
+            return
+
+        connections[database_path][2] = max(0, connections[database_path][2] - 1)
+        if connections[database_path][2] > 0:
+            return
+
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error as ex:
+            print(f'Unable to roll back pooled database connection: {database_path}', flush=True)
+            print(ex, flush=True)
+
+    def close_connections(self) -> None:
+        """ Closes all of the current thread's connections
+        """
+        connections = self._thread_connections()
+        for database_path, (conn, _, _) in connections.items():
+            try:
+                conn.close()
+            except sqlite3.Error as ex:
+                print(f'Unable to close pooled database connection: {database_path}', flush=True)
+                print(ex, flush=True)
+        connections.clear()
+
+
+# The connection pool shared by the SPARCd databases
+CONNECTION_POOL = SQLiteConnectionPool()
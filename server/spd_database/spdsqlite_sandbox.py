@@ -9,6 +9,11 @@ import sqlite3
 from typing import Generator, Optional
 import uuid
 
+from spd_database.spdsqlite_pool import CONNECTION_POOL
+
+# The PRAGMA statements run on new database connections
+DB_PRAGMAS = ('PRAGMA journal_mode=WAL', 'PRAGMA synchronous=NORMAL', 'PRAGMA busy_timeout=10000',)
+
 class SPDSQLiteSandbox:
     """Class handling access connections to the database for sandbox tables
     """
@@ -21,6 +26,7 @@ class SPDSQLiteSandbox:
             verbose: set to True to have more verbose logging
         """
         self._conn = None
+        self._conn_path = None
         self._path = db_path
         self._verbose = verbose
         self._logger = logger
@@ -100,11 +106,9 @@ class SPDSQLiteSandbox:
                         f'database={database_path}' if database_path is not None else None,
                    ) if param is not None)
                 self._logger.info(f'Connecting to the database {print_params}')
-            # We disable thread checking since we're using thread-safe Sqlite
-            self._conn = sqlite3.connect(database_path, check_same_thread=False)
-            self._conn.execute('PRAGMA journal_mode=WAL')
-            self._conn.execute('PRAGMA synchronous=NORMAL')
-            self._conn.execute('PRAGMA busy_timeout=10000')
+            # Connections are kept open for each thread by the connection pool
+            self._conn = CONNECTION_POOL.get_connection(database_path, DB_PRAGMAS)
+            self._conn_path = database_path
 
     def reconnect(self) -> None:
         """Attempts a reconnection if we're not connected
@@ -114,10 +118,26 @@ class SPDSQLiteSandbox:
 
     def close(self) -> None:
         """ Closes the connection to the database
+        Notes:
+            The connection is returned to the connection pool for reuse
         """
         if self._conn:
-            self._conn.close()
+            CONNECTION_POOL.release_connection(self._conn_path, self._conn)
             self._conn = None
+            self._conn_path = None
+
+    @staticmethod
+    def _insert_files(cursor: sqlite3.Cursor, sandbox_id: int, files: tuple) -> None:
+        """ Adds the upload files to the database
+        Arguments:
+            cursor: the cursor to add the files with
+            sandbox_id: the ID of the sandbox entry the files belong to
+            files: the list of filenames (or partial paths) to add
+        """
+        cursor.executemany('INSERT INTO sandbox_files(sandbox_id, filename, source_path, ' \
+                                                                                'timestamp) ' \
+                                'VALUES(?,?,?,strftime("%s", "now"))',
+                        [(sandbox_id, one_file, one_file) for one_file in files])
 
     def get_sandbox(self, s3_id: str) -> Optional[tuple]:
         """ Returns the sandbox items
@@ -340,11 +360,7 @@ class SPDSQLiteSandbox:
 
             sandbox_id = cursor.lastrowid
 
-            for one_file in files:
-                cursor.execute('INSERT INTO sandbox_files(sandbox_id, filename, source_path, ' \
-                                                                                    'timestamp) ' \
-                                        'VALUES(?,?,?,strftime("%s", "now"))',
-                                (sandbox_id, one_file, one_file))
+            self._insert_files(cursor, sandbox_id, files)
 
             cursor.close()
 
@@ -531,11 +547,7 @@ class SPDSQLiteSandbox:
             cursor = self._conn.cursor()
             cursor.execute('DELETE FROM sandbox_files WHERE sandbox_id=?', (sandbox_id, ))
 
-            for one_file in files:
-                cursor.execute('INSERT INTO sandbox_files(sandbox_id, filename, source_path, ' \
-                                                                                'timestamp) ' \
-                                'VALUES(?,?,?,strftime("%s", "now"))',
-                        (sandbox_id, one_file, one_file))
+            self._insert_files(cursor, sandbox_id, files)
 
             cursor.close()
 
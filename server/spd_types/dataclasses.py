@@ -13,3 +13,11 @@ class UploadResult:
     location: Optional[dict]
     upload_id: str
     original_name: str
+
+
+@dataclass
+class UploadMoveProgress:
+    """ Contains the progress of moving an upload so that an interrupted move can resume """
+    last_copied: Optional[str] = None
+    num_copied: int = 0
+    copy_complete: bool = False
@@ -2,6 +2,7 @@
 
 import dataclasses
 import datetime
+import functools
 import math
 
 import ephem
@@ -9,6 +10,12 @@ import ephem
 # The number of seconds in a day as a float to capture fractions of days
 SECONDS_IN_DAY = 60.0 * 60.0 * 24.0
 
+# Maximum number of years that have their moon dates kept
+MAX_CACHED_MOON_YEARS = 200
+# The indexes of the full moons and the new moons returned by Analysis.get_year_moons()
+FULL_MOONS_INDEX = 0
+NEW_MOONS_INDEX = 1
+
 @dataclasses.dataclass
 class Analysis:
     """ Performs analysis on image lists
@@ -157,6 +164,50 @@ class Analysis:
 
         return abundance
 
+    @staticmethod
+    @functools.lru_cache(maxsize=MAX_CACHED_MOON_YEARS)
+    def get_year_moons(year: int) -> tuple:
+        """ Returns the full moon and new moon dates of a year
+        Arguments:
+            year: the year to get the moons of
+        Return:
+            Returns a tuple of the sorted full moon dates and the sorted new moon dates
+        Notes:
+            The moons are cached since they don't change
+        """
+        year_moons = []
+        for next_moon in (ephem.next_full_moon, ephem.next_new_moon):
+            moons = []
+            date = ephem.Date(datetime.date(year, 1, 1))
+            while True:
+                date = next_moon(date)
+                moon_dt = date.datetime().replace(tzinfo=datetime.timezone.utc)
+                if moon_dt.year != year:
+                    break
+                moons.append(moon_dt)
+            year_moons.append(tuple(moons))
+
+        return tuple(year_moons)
+
+    @staticmethod
+    def _get_moons(first: datetime, last: datetime, moon_index: int) -> tuple:
+        """ Returns the moon dates that fall after the start of the first date and on or before
+            the last date
+        Arguments:
+            first: the starting datetime to get the moons for
+            last: the ending datetime to get the moons for
+            moon_index: the index of the moons in the get_year_moons() tuple
+        Return:
+            The tuple of moon dates
+        """
+        start_dt = datetime.datetime(first.year, first.month, first.day,
+                                                                    tzinfo=datetime.timezone.utc)
+        last_date = last.date()
+
+        return tuple(one_moon for one_year in range(first.year, last.year + 1)
+                        for one_moon in Analysis.get_year_moons(one_year)[moon_index]
+                            if start_dt < one_moon and one_moon.date() <= last_date)
+
     @staticmethod
     def get_full_moons(first: datetime, last: datetime) -> tuple:
         """ Returns the full moon dates that fall between the first and last dates, inclusive
@@ -166,17 +217,7 @@ class Analysis:
         Return:
             The tuple of calculated full moon dates
         """
-        full_moons = []
-
-        date = ephem.Date(datetime.date(first.year, first.month, first.day))
-        while True:
-            date = ephem.next_full_moon(date)
-            if date.datetime().date() <= last.date():
-                full_moons.append(date.datetime().replace(tzinfo=datetime.timezone.utc))
-            else:
-                break
-
-        return full_moons
+        return Analysis._get_moons(first, last, FULL_MOONS_INDEX)
 
     @staticmethod
     def get_new_moons(first: datetime, last: datetime) -> tuple:
@@ -187,14 +228,4 @@ class Analysis:
         Return:
             The tuple of calculated new moon dates
         """
-        new_moons = []
-
-        date = ephem.Date(datetime.date(first.year, first.month, first.day))
-        while True:
-            date = ephem.next_new_moon(date)
-            if date.datetime().date() <= last.date():
-                new_moons.append(date.datetime().replace(tzinfo=datetime.timezone.utc))
-            else:
-                break
-
-        return new_moons
+        return Analysis._get_moons(first, last, NEW_MOONS_INDEX)
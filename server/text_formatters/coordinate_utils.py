@@ -1,11 +1,24 @@
 """ Handles coordinate system conversions and measurements """
 
 import math
+import threading
 from osgeo import ogr
 from osgeo import osr
 
 LAT_LONG_WGS84_EPSG = 4326
 DEFAULT_UTM_ZONE = '12N'
+# The datum of the latitude and longitude coordinates
+LAT_LONG_DATUM = 'WGS84'
+# Maximum number of converted coordinates each server process keeps
+MAX_UTM_COORDS = 10000
+
+# The UTM code, easting, and northing of converted points keyed by (lat, lon, datum)
+UTM_COORDS = {}
+UTM_COORDS_LOCK = threading.Lock()
+
+# The coordinate transformations of each thread, keyed by the source and target EPSG codes.
+# Transformations can't be shared between threads
+TRANSFORMS = threading.local()
 
 def _get_utm_zone(lat: float, lon: float) -> int:
     """ Returns the UTM zone for the latitude and longitude
@@ -78,6 +91,32 @@ def _utm_epsg_code(zone: int, letter: str) -> int:
     return epsg_code
 
 
+def _get_transform(source_epsg: int, target_epsg: int) -> osr.CoordinateTransformation:
+    """ Returns the coordinate transformation between the EPSG codes for the current thread
+    Arguments:
+        source_epsg: the EPSG code of the points to transform
+        target_epsg: the EPSG code to transform the points to
+    Return:
+        The coordinate transformation
+    """
+    thread_transforms = getattr(TRANSFORMS, 'transforms', None)
+    if thread_transforms is None:
+        thread_transforms = {}
+        TRANSFORMS.transforms = thread_transforms
+
+    transform = thread_transforms.get((source_epsg, target_epsg))
+    if transform is None:
+        source_ref = osr.SpatialReference()
+        source_ref.ImportFromEPSG(source_epsg)
+        target_ref = osr.SpatialReference()
+        target_ref.ImportFromEPSG(target_epsg)
+
+        transform = osr.CoordinateTransformation(source_ref, target_ref)
+        thread_transforms[(source_epsg, target_epsg)] = transform
+
+    return transform
+
+
 def deg2utm_code(lat: float, lon: float) -> tuple:
     """ Returns the UTM zone and letter from the lat lon
     Arguments:
@@ -124,20 +163,57 @@ def deg2utm(lat: float, lon: float) -> tuple:
     point = ogr.Geometry(ogr.wkbPoint)
     point.AddPoint(lat, lon)
 
-    # Lat-Lon spatial reference
-    latlon_ref = osr.SpatialReference()
-    latlon_ref.ImportFromEPSG(LAT_LONG_WGS84_EPSG)
+    # Transform from Lat-Lon to UTM
+    point.Transform(_get_transform(LAT_LONG_WGS84_EPSG, _deg2utm_epsg_code(lat, lon)))
+
+    return (point.GetX(), point.GetY())
 
-    # UTM spatial reference
-    utm_ref = osr.SpatialReference()
-    utm_ref.ImportFromEPSG(_deg2utm_epsg_code(lat, lon))
 
-    # Transform from Lat-Lon to UTM
-    transform = osr.CoordinateTransformation(latlon_ref, utm_ref)
+def deg2utm_coord(lat: float, lon: float) -> tuple:
+    """ Returns the UTM code and point of the lat-lon degrees, using earlier conversions when
+        possible
+    Arguments:
+        lat: the latitude of the point
+        lon: the longitude of the point
+    Return:
+        Returns a tuple of the UTM code (zone number and letter), the X (easting), and the
+        Y (northing) of the point
+    """
+    key = (lat, lon, LAT_LONG_DATUM)
+    with UTM_COORDS_LOCK:
+        found = UTM_COORDS.get(key)
+    if found is not None:
+        return found
 
-    point.Transform(transform)
+    utm_x, utm_y = deg2utm(lat, lon)
+    found = (''.join([str(one_res) for one_res in deg2utm_code(lat, lon)]), utm_x, utm_y)
+    add_utm_coords({key: found})
 
-    return (point.GetX(), point.GetY())
+    return found
+
+
+def get_utm_coords(keys: tuple) -> dict:
+    """ Returns the known UTM conversions of the points
+    Arguments:
+        keys: the (lat, lon, datum) tuples of the points to look up
+    Return:
+        Returns the dict of the found (UTM code, X, Y) tuples keyed by the (lat, lon, datum)
+    """
+    with UTM_COORDS_LOCK:
+        return {one_key: UTM_COORDS[one_key] for one_key in keys if one_key in UTM_COORDS}
+
+
+def add_utm_coords(coords: dict) -> None:
+    """ Keeps the UTM conversions of points so they're not converted again
+    Arguments:
+        coords: the (UTM code, X, Y) tuples keyed by their (lat, lon, datum)
+    Notes:
+        All of the kept conversions are dropped when there are too many
+    """
+    with UTM_COORDS_LOCK:
+        if len(UTM_COORDS) + len(coords) > MAX_UTM_COORDS:
+            UTM_COORDS.clear()
+        UTM_COORDS.update(coords)
 
 
 def utm2deg(utm_x: float, utm_y: float, zone: int, letter: str) -> tuple:
@@ -153,17 +229,7 @@ def utm2deg(utm_x: float, utm_y: float, zone: int, letter: str) -> tuple:
     point = ogr.Geometry(ogr.wkbPoint)
     point.AddPoint(utm_x, utm_y)
 
-    # Lat-Lon spatial reference
-    latlon_ref = osr.SpatialReference()
-    latlon_ref.ImportFromEPSG(LAT_LONG_WGS84_EPSG)
-
-    # UTM spatial reference
-    utm_ref = osr.SpatialReference()
-    utm_ref.ImportFromEPSG(_utm_epsg_code(zone, letter))
-
     # Transform from UTM to Lat-Lon
-    transform = osr.CoordinateTransformation(utm_ref, latlon_ref)
-
-    point.Transform(transform)
+    point.Transform(_get_transform(_utm_epsg_code(zone, letter), LAT_LONG_WGS84_EPSG))
 
     return (point.GetX(), point.GetY())
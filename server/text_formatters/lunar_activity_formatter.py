@@ -1,11 +1,11 @@
 """ Formats statistics about lunar activity """
 
+import bisect
 import dataclasses
 import datetime
 import math
 import os
 
-from .analysis import Analysis
 from .results import Results
 
 # Number of days (in seconds) for a datetime to be considered to be within a moon phase
@@ -16,16 +16,20 @@ def in_moons(image_date: datetime.datetime, moons: tuple) -> bool:
     """ Returns whether or not the image date falls within a full moon
     Arguments:
         image_date: the date to check
-        moons: an iterator containing the datetime of the moons to check
+        moons: the sorted times of the moons to check in seconds since the epoch
     Return:
         Returns True/False for if the image date is within range of the moons
         contain None
+    Notes:
+        Only the moons right before and after the image date need to be checked
     """
-    for one_moon in moons:
-        if abs((one_moon - image_date).total_seconds()) < MOON_PHASE_DATE_DIFF_SEC:
-            return True
+    image_ts = image_date.timestamp()
+    moon_idx = bisect.bisect_left(moons, image_ts)
 
-    return False
+    if moon_idx < len(moons) and moons[moon_idx] - image_ts < MOON_PHASE_DATE_DIFF_SEC:
+        return True
+
+    return moon_idx > 0 and image_ts - moons[moon_idx - 1] < MOON_PHASE_DATE_DIFF_SEC
 
 def in_moons_debug(image_date: datetime.datetime, moons: tuple) -> bool:
     """ Returns whether or not the image date falls within a full moon
@@ -53,10 +57,7 @@ def create_lunar_activity_table(results: Results)-> tuple:
     """
     lunar_activities = []
 
-    full_moons = Analysis.get_full_moons(results.get_first_image()['image_dt'], \
-                                                            results.get_last_image()['image_dt'])
-    new_moons = Analysis.get_new_moons(results.get_first_image()['image_dt'], \
-                                                            results.get_last_image()['image_dt'])
+    full_moons, new_moons = results.get_moons()
 
     full_images = [one_image for one_image in results.get_images() if \
                                                         in_moons(one_image['image_dt'], full_moons)]
@@ -126,10 +127,7 @@ class LunarActivityFormatter:
         result += '  New and full moon +/- 5 days activity patterns' + os.linesep
         result += '  Difference (large is greater difference)' + os.linesep
 
-        full_moons = Analysis.get_full_moons(results.get_first_image()['image_dt'], \
-                                                            results.get_last_image()['image_dt'])
-        new_moons = Analysis.get_new_moons(results.get_first_image()['image_dt'], \
-                                                            results.get_last_image()['image_dt'])
+        full_moons, new_moons = results.get_moons()
 
         full_images = [one_image for one_image in results.get_images() if \
                                                         in_moons(one_image['image_dt'], full_moons)]
@@ -3,13 +3,40 @@
 from typing import Optional
 
 from .analysis import Analysis
-from .coordinate_utils import deg2utm_code, deg2utm, DEFAULT_UTM_ZONE
+from .coordinate_utils import deg2utm_coord, DEFAULT_UTM_ZONE
 
 from spd_types.s3info import S3Info
 
 # The default interval value
 DEFAULT_INTERVAL_MIN=0
 
+# The dimensions of the image index, in index key order
+INDEX_DIMENSIONS = ('year', 'location', 'month', 'species', 'hour')
+YEAR_DIMENSION = 0
+LOCATION_DIMENSION = 1
+MONTH_DIMENSION = 2
+SPECIES_DIMENSION = 3
+HOUR_DIMENSION = 4
+
+
+class ImageSlice(list):
+    """ A date sorted list of images that was looked up in the image index of a Results instance.
+        Filtering a slice with the Results filter methods looks up the narrower slice in the
+        index instead of scanning the images
+    """
+
+    def __init__(self, images: tuple, owner: object, index_key: tuple):
+        """ Initializer
+        Arguments:
+            images: the images of the slice
+            owner: the Results instance that has the image index
+            index_key: the index key that was used to look up the images
+        """
+        super().__init__(images)
+        self.owner = owner
+        self.index_key = index_key
+
+
 class Results:
     """ Contains the results of a query """
 
@@ -38,9 +65,10 @@ class Results:
         self._species = []
         self._years = []
         self._interval_minutes = interval_minutes
-        self._location_images = []
-        self._species_images = []
-        self._year_images = []
+        self._image_index = self._build_index(())
+        self._location_keys = {}
+        self._slices = {}
+        self._moons = None
         self._s3_info = s3_info
         self._user_settings = user_settings
 
@@ -64,15 +92,8 @@ class Results:
             print(ex, flush=True)
             return
 
-        # Sort images by year (we need a list of lists)
-        year_images = [[]] * len(cur_years)
-        for one_image in cur_images:
-            cur_index = cur_years.index(one_image['image_dt'].year)
-            year_images[cur_index].append(one_image)
-
-        # Get pre-filtered lists of images
-        by_location, by_species, by_year = self._prefilter(cur_images, cur_locations, cur_species, \
-                                                                                        cur_years)
+        # Index the images so that slices can be looked up instead of rescanning the images
+        image_index = self._build_index(cur_images)
 
         # We are initialized, set our results
         self._results = results
@@ -80,9 +101,8 @@ class Results:
         self._locations = cur_locations
         self._species = cur_species
         self._years = cur_years
-        self._location_images = by_location
-        self._species_images = by_species
-        self._year_images = by_year
+        self._image_index = image_index
+        self._location_keys = self._location_index_keys(cur_locations, image_index)
 
     @property
     def s3_info(self):
@@ -138,10 +158,9 @@ class Results:
                             try:
                                 # Build up our entry. If there's a problem with this entry, maybe
                                 # another would work out
-                                utm_x, utm_y = deg2utm(float(one_result['loc_lat']),
-                                                        float(one_result['loc_lon']))
-                                utm_zone, utm_letter = deg2utm_code(float(one_result['loc_lat']),
-                                                                    float(one_result['loc_lon']))
+                                utm_code, utm_x, utm_y = \
+                                                    deg2utm_coord(float(one_result['loc_lat']),
+                                                                  float(one_result['loc_lon']))
                                 new_loc = {
                                     'nameProperty': one_result['loc_name'], \
                                     'idProperty': test_value,
@@ -150,7 +169,7 @@ class Results:
                                     'elevationProperty': one_result['elevation'],
                                     'utm_x': str(round(utm_x)),
                                     'utm_y': str(round(utm_y)),
-                                    'utm_code': str(utm_zone)+str(utm_letter),
+                                    'utm_code': utm_code,
                                 }
                                 mapped_values.append(new_loc)
                                 break
@@ -209,44 +228,99 @@ class Results:
 
         return (sorted_images, sorted_locations, sorted_years, sorted_species)
 
-    def _prefilter(self, images: tuple, locations: tuple, species: tuple, years: tuple) -> tuple:
-        """ Performs prefiltering of the images by various values
+    def _build_index(self, images: tuple) -> tuple:
+        """ Builds the image index in one pass over the images
         Arguments:
-            images: the images to filter
-            locations: the list of unique locations to filter on
-            species: the list of unique species to filter on
-            years: the list of unique years to filter on
+            images: the date sorted images to index
         Return:
-            Returns a tuple of dicts with the values (such as location ID) as keys with the matching
-            images in a tuple. Image tuples may contain duplicate image entries across different
-            keys
-            e.g.: ((location image dict), (species image dict), (year image dict))
+            Returns a tuple with one dict per index dimension (see INDEX_DIMENSIONS). Each dict has
+            the dimension's values as keys with the set of matching image positions as the values
+        Notes:
+            Locations are indexed by their lowercase ID and an image is indexed under every
+            species scientific name it contains
         """
-        locations_filtered = {one_location['idProperty']: [] for one_location in locations}
-        species_filtered = {one_species['scientificName']: [] for one_species in species}
-        years_filtered = {one_year: [] for one_year in years}
-        upper_locations_filtered = [one_loc.upper() for one_loc in locations_filtered]
-
-        # Loop through the images and add them to the correct buckets
-        for one_image in images:
-            if one_image['loc'] in locations_filtered:
-                locations_filtered[one_image['loc']].append(one_image)
-            elif one_image['loc'].upper() in upper_locations_filtered:
-                # Find the right bucket to put this in
-                for one_loc in locations_filtered:
-                    if one_loc.upper() == one_image['loc'].upper():
-                        locations_filtered[one_loc].append(one_image)
-                        break
-            else:
-                locations_filtered['unknown'].append(one_image)
+        image_index = tuple({} for _ in INDEX_DIMENSIONS)
+        year_index, location_index, month_index, species_index, hour_index = image_index
+
+        for position, one_image in enumerate(images):
+            image_dt = one_image['image_dt']
+            year_index.setdefault(image_dt.year, set()).add(position)
+            location_index.setdefault(one_image['loc'].lower(), set()).add(position)
+            month_index.setdefault(image_dt.month, set()).add(position)
+            hour_index.setdefault(image_dt.hour, set()).add(position)
             for one_species in one_image['species']:
-                if 'name' not in one_species or 'scientificName' not in one_species or not \
-                                        one_species['name'] or not one_species['scientificName']:
-                    continue
-                species_filtered[one_species['scientificName']].append(one_image)
-            years_filtered[one_image['image_dt'].year].append(one_image)
+                species_index.setdefault(one_species.get('scientificName'), set()).add(position)
 
-        return locations_filtered, species_filtered, years_filtered
+        return image_index
+
+    @staticmethod
+    def _location_index_keys(locations: tuple, image_index: tuple) -> dict:
+        """ Returns the location index values that belong to each of the locations
+        Arguments:
+            locations: the list of unique locations
+            image_index: the image index to find the location values in
+        Return:
+            Returns a dict with the location IDs as keys and the set of indexed location values as
+            the values. Indexed location values that don't match a location belong to the
+            'unknown' location
+        """
+        location_keys = {one_location['idProperty']: \
+                                            frozenset((one_location['idProperty'].lower(),)) \
+                                                                    for one_location in locations}
+        known_keys = frozenset().union(*location_keys.values())
+        unknown_keys = frozenset(one_key for one_key in image_index[LOCATION_DIMENSION] if \
+                                                                    one_key not in known_keys)
+        if 'unknown' in location_keys:
+            location_keys['unknown'] = location_keys['unknown'] | unknown_keys
+
+        return location_keys
+
+    def _get_slice(self, index_key: tuple) -> ImageSlice:
+        """ Returns the images matching the index key
+        Arguments:
+            index_key: a tuple with an entry for each of the INDEX_DIMENSIONS. Each entry is either
+                    None to match all values, or a set of values to match
+        Return:
+            Returns the date sorted images that match the key
+        """
+        if index_key in self._slices:
+            return self._slices[index_key]
+
+        positions = None
+        for dimension_index, dimension_values in zip(self._image_index, index_key):
+            if dimension_values is None:
+                continue
+            value_positions = set().union(*(dimension_index.get(one_value, ()) for one_value in \
+                                                                                dimension_values))
+            positions = value_positions if positions is None else positions & value_positions
+
+        if positions is None:
+            found_images = self._images
+        else:
+            found_images = [self._images[one_position] for one_position in sorted(positions)]
+
+        self._slices[index_key] = ImageSlice(found_images, self, index_key)
+        return self._slices[index_key]
+
+    def _filter_slice(self, images: tuple, dimension: int, values: frozenset) -> Optional[tuple]:
+        """ Narrows the images using the image index when they are a slice of it
+        Arguments:
+            images: the tuple of images to narrow
+            dimension: the index of the dimension to narrow (see INDEX_DIMENSIONS)
+            values: the set of values to restrict the dimension to
+        Return:
+            Returns the narrowed images, or None if the images aren't a slice of our index
+        """
+        if not isinstance(images, ImageSlice) or images.owner is not self:
+            return None
+
+        index_key = list(images.index_key)
+        if index_key[dimension] is None:
+            index_key[dimension] = values
+        else:
+            index_key[dimension] = index_key[dimension] & values
+
+        return self._get_slice(tuple(index_key))
 
     def get_interval(self) -> int:
         """ Returns the image interval in seconds """
@@ -258,7 +332,7 @@ class Results:
             The tuple of images sorted by date
         """
         if self._images is not None:
-            return self._images
+            return self._get_slice((None,) * len(INDEX_DIMENSIONS))
 
         raise RuntimeError('Call made to Results.get_images after bad initialization')
 
@@ -316,9 +390,9 @@ class Results:
         Return:
             A tuple containing the images for that location
         """
-        if self._location_images is not None:
-            if location_id in self._location_images:
-                return self._location_images[location_id]
+        if self._image_index is not None:
+            if location_id in self._location_keys:
+                return self._get_slice((None, self._location_keys[location_id], None, None, None))
             return ()
 
         raise RuntimeError('Call made to Results.get_location_images after bad initialization')
@@ -330,9 +404,9 @@ class Results:
         Return:
             A tuple containing the images for that species
         """
-        if self._species_images is not None:
-            if species_sci_name in self._species_images:
-                return self._species_images[species_sci_name]
+        if self._image_index is not None:
+            if species_sci_name in self._image_index[SPECIES_DIMENSION]:
+                return self._get_slice((None, None, None, frozenset((species_sci_name,)), None))
             return ()
 
         raise RuntimeError('Call made to Results.get_species_images after bad initialization')
@@ -345,9 +419,9 @@ class Results:
             Returns the tuple of images for the specified year. An empty tuple is returned if the
             year doesn't have any images associated with it
         """
-        if self._year_images is not None:
-            if year in self._year_images:
-                return self._year_images[year]
+        if self._image_index is not None:
+            if year in self._image_index[YEAR_DIMENSION]:
+                return self._get_slice((frozenset((year,)), None, None, None, None))
             return ()
 
         raise RuntimeError('Call made to Results.get_year_images after bad initialization')
@@ -376,6 +450,28 @@ class Results:
 
         raise RuntimeError('Call made to Results.get_last_image after bad initialization')
 
+    def get_moons(self) -> tuple:
+        """ Returns the full moons and new moons that fall between the first and last images
+        Return:
+            Returns a tuple of the sorted full moon times and the sorted new moon times, in
+            seconds since the epoch
+        Notes:
+            The moons are found the first time they're requested
+        """
+        if self._moons is None:
+            first_image = self.get_first_image()
+            last_image = self.get_last_image()
+            if first_image is None or last_image is None:
+                return (), ()
+
+            self._moons = tuple(tuple(one_moon.timestamp() for one_moon in moons) for moons in \
+                            (Analysis.get_full_moons(first_image['image_dt'],
+                                                     last_image['image_dt']),
+                             Analysis.get_new_moons(first_image['image_dt'],
+                                                    last_image['image_dt'])))
+
+        return self._moons
+
     def get_first_year(self) -> Optional[int]:
         """ Returns the first unique year
         Return:
@@ -448,6 +544,10 @@ class Results:
         Return:
             A tuple containing the images for that hour range
         """
+        found_images = self._filter_slice(images, YEAR_DIMENSION, frozenset((year,)))
+        if found_images is not None:
+            return found_images
+
         return [one_image for one_image in images if \
                                             one_image['image_dt'].year == year]
 
@@ -460,6 +560,11 @@ class Results:
         Return:
             A tuple containing the images for that hour range
         """
+        found_images = self._filter_slice(images, HOUR_DIMENSION, \
+                                                            frozenset(range(hour_start, hour_end)))
+        if found_images is not None:
+            return found_images
+
         return [one_image for one_image in images if \
                                             one_image['image_dt'].hour >= hour_start and \
                                             one_image['image_dt'].hour < hour_end]
@@ -472,6 +577,12 @@ class Results:
         Return:
             A tuple containing the images for that month
         """
+        # Only single months can be looked up in the index, anything else is compared as-is
+        if isinstance(month, int):
+            found_images = self._filter_slice(images, MONTH_DIMENSION, frozenset((month,)))
+            if found_images is not None:
+                return found_images
+
         return [one_image for one_image in images if one_image['image_dt'].month == month]
 
     def filter_month_list(self, images: tuple, months: tuple) -> tuple:
@@ -482,6 +593,10 @@ class Results:
         Return:
             A tuple containing the images for those months
         """
+        found_images = self._filter_slice(images, MONTH_DIMENSION, frozenset(months))
+        if found_images is not None:
+            return found_images
+
         return [one_image for one_image in images if one_image['image_dt'].month in months]
 
     def filter_location(self, images: tuple, location_id: str) -> tuple:
@@ -492,6 +607,11 @@ class Results:
         Return:
             A tuple containing the images for that location
         """
+        found_images = self._filter_slice(images, LOCATION_DIMENSION, \
+                                                                frozenset((location_id.lower(),)))
+        if found_images is not None:
+            return found_images
+
         return [one_image for one_image in images if one_image['loc'].lower() == \
                                                                             location_id.lower()]
 
@@ -503,6 +623,11 @@ class Results:
         Return:
             A tuple containing the images for that species
         """
+        found_images = self._filter_slice(images, SPECIES_DIMENSION, \
+                                                                frozenset((species_sci_name,)))
+        if found_images is not None:
+            return found_images
+
         return [one_image for one_image in images if \
                                             Analysis.image_has_species(one_image, species_sci_name)]
 
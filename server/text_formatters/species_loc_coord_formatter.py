@@ -3,7 +3,7 @@
 import dataclasses
 import os
 
-from .coordinate_utils import deg2utm
+from .coordinate_utils import deg2utm_coord
 from .results import Results
 
 # pylint: disable=consider-using-f-string
@@ -32,14 +32,15 @@ class SpeciesLocCoordFormatter:
             for location in results.locations_for_image_list(species_images):
                 # Get the full location entry
                 location = results.get_image_location(location)
-                utm_coord = deg2utm(float(location['latProperty']), float(location['lngProperty']))
+                _, utm_x, utm_y = deg2utm_coord(float(location['latProperty']),
+                                                float(location['lngProperty']))
 
                 # We format the easting then northing of the UTM coordiantes
                 result += '{:<28s}  {:8d}  {:8d}  {:7.0f}      {:8.6f}  {:8.6f}'. \
                                 format(
                                     location['nameProperty'],
-                                    round(utm_coord[0]), 
-                                    round(utm_coord[1]),
+                                    round(utm_x),
+                                    round(utm_y),
                                     float(location['elevationProperty']),
                                     float(location['latProperty']),
                                     float(location['lngProperty'])
@@ -0,0 +1,149 @@
+""" Validated session tokens that are kept by each server process """
+
+import collections
+import copy
+import os
+import threading
+import time
+from typing import Optional
+
+from spd_types.userinfo import UserInfo
+
+# Environment variable name for the number of seconds a validated token is kept
+ENV_NAME_TOKEN_CACHE_SEC = 'SPARCD_TOKEN_CACHE_SEC'
+# Default number of seconds a validated token is kept
+DEFAULT_TOKEN_CACHE_SEC = 30
+# The number of seconds a validated token is kept. This is how long changes made by other server
+# processes (such as removing the token, or an admin changing the user) can go unnoticed
+TOKEN_CACHE_SEC = int(os.environ.get(ENV_NAME_TOKEN_CACHE_SEC, DEFAULT_TOKEN_CACHE_SEC))
+# Maximum number of validated tokens each server process keeps
+MAX_CACHED_TOKENS = 500
+
+# The validated tokens of this server process with their user and S3 information, keyed by token
+CACHED_TOKENS = collections.OrderedDict()
+CACHED_TOKENS_LOCK = threading.Lock()
+
+
+def __get_entry(token: str) -> Optional[dict]:
+    """ Returns the unexpired cache entry of the token. The lock needs to be held by the caller
+    Arguments:
+        token: the token to find
+    Return:
+        Returns the found entry or None if the token isn't cached or has expired
+    """
+    entry = CACHED_TOKENS.get(token)
+    if entry is None:
+        return None
+
+    if time.monotonic() - entry['cached_ts'] >= TOKEN_CACHE_SEC:
+        del CACHED_TOKENS[token]
+        return None
+
+    CACHED_TOKENS.move_to_end(token)
+    return entry
+
+
+def cached_user_info(token: str) -> Optional[UserInfo]:
+    """ Returns the user information of a validated token
+    Arguments:
+        token: the token to find
+    Return:
+        Returns a copy of the user information, or None if the token isn't cached
+    Notes:
+        A copy is returned so that changes made while handling a request aren't kept
+    """
+    if TOKEN_CACHE_SEC <= 0:
+        return None
+
+    with CACHED_TOKENS_LOCK:
+        entry = __get_entry(token)
+        user_info = entry['user_info'] if entry is not None else None
+
+    return copy.deepcopy(user_info) if user_info is not None else None
+
+
+def cache_user_info(token: str, user_info: UserInfo) -> None:
+    """ Keeps the user information of a validated token
+    Arguments:
+        token: the validated token
+        user_info: the user information of the token
+    """
+    if TOKEN_CACHE_SEC <= 0:
+        return
+
+    user_info = copy.deepcopy(user_info)
+    with CACHED_TOKENS_LOCK:
+        CACHED_TOKENS[token] = {'cached_ts': time.monotonic(),
+                                'user_info': user_info,
+                                's3_endpoint': None,
+                                'password': None,
+                               }
+        CACHED_TOKENS.move_to_end(token)
+        while len(CACHED_TOKENS) > MAX_CACHED_TOKENS:
+            CACHED_TOKENS.popitem(last=False)
+
+
+def cached_s3_info(token: str) -> tuple:
+    """ Returns the S3 information kept for a validated token
+    Arguments:
+        token: the token to find
+    Return:
+        Returns a tuple of the S3 endpoint (itself a tuple of the URI and the secure flag) and
+        the plain text password. Each value is None if it isn't cached
+    """
+    with CACHED_TOKENS_LOCK:
+        entry = __get_entry(token)
+        if entry is None:
+            return None, None
+
+        return entry['s3_endpoint'], entry['password']
+
+
+def cache_s3_endpoint(token: str, s3_endpoint: tuple) -> None:
+    """ Keeps the S3 endpoint for a validated token
+    Arguments:
+        token: the validated token
+        s3_endpoint: tuple of the S3 URI and the secure flag
+    Notes:
+        Nothing is kept if the token's user information isn't cached
+    """
+    with CACHED_TOKENS_LOCK:
+        entry = __get_entry(token)
+        if entry is not None:
+            entry['s3_endpoint'] = s3_endpoint
+
+
+def cache_password(token: str, password: str) -> None:
+    """ Keeps the plain text S3 password for a validated token
+    Arguments:
+        token: the validated token
+        password: the plain text password
+    Notes:
+        Nothing is kept if the token's user information isn't cached
+    """
+    with CACHED_TOKENS_LOCK:
+        entry = __get_entry(token)
+        if entry is not None:
+            entry['password'] = password
+
+
+def invalidate_token(token: str) -> None:
+    """ Removes the token from the cache
+    Arguments:
+        token: the token to remove
+    """
+    with CACHED_TOKENS_LOCK:
+        CACHED_TOKENS.pop(token, None)
+
+
+def invalidate_user(username: str) -> None:
+    """ Removes all the tokens of the user from the cache
+    Arguments:
+        username: the name of the user whose tokens are removed
+    Notes:
+        Tokens with the same user name on other S3 endpoints are removed as well
+    """
+    with CACHED_TOKENS_LOCK:
+        for token in [token for token, entry in CACHED_TOKENS.items() \
+                                                    if entry['user_info'].name == username]:
+            del CACHED_TOKENS[token]
@@ -1,107 +1,77 @@
 """ Zip utilities """
 
-from multiprocessing import Lock, synchronize
+import concurrent.futures
 import os
 import shutil
 import tempfile
-import threading
-import time
+import traceback
+from typing import Iterator
 import zipfile
 
 from spd_types.s3info import S3Info
-from s3.s3_access_helpers import SPARCD_PREFIX, S3_UPLOADS_PATH_PART
-from s3.s3_images import S3ImageConnection
-
-
-def zip_downloaded_files(write_fd: int, file_list: list, \
-                            files_lock: synchronize.Lock, done_sem: threading.Semaphore, \
-                            save_folder: str) -> None:
-    """ Compresses the downloaded files and streams the data into the data pipe
-    Arguments:
-        write_pipe: the pipe to use for the zipping output
-        file_list: the list of files to compress
-        files_lock: the lock access to the list of files
-        done_sem: the lock indicating the downloads have completed
-        save_folder: the base folder where the downloads are being saved. Use for relative
-                    path names
+from s3.s3_access_helpers import SPARCD_PREFIX, S3_UPLOADS_PATH_PART, download_data_thread
+from s3.s3_connect import s3_connect, S3_POOL_SIZE
+
+# Environment variable name for how the downloaded files are compressed
+ENV_NAME_ZIP_CODEC = 'SPARCD_ZIP_CODEC'
+# The compression methods that can be used for downloaded files
+ZIP_CODECS = {'stored': zipfile.ZIP_STORED,
+              'deflated': zipfile.ZIP_DEFLATED,
+              'bzip2': zipfile.ZIP_BZIP2,
+              'lzma': zipfile.ZIP_LZMA,
+             }
+# Default compression of downloaded files. Images and movies are already compressed so they're
+# stored as-is
+DEFAULT_ZIP_CODEC = 'stored'
+# The compression of downloaded files
+ZIP_COMPRESSION = ZIP_CODECS.get(os.environ.get(ENV_NAME_ZIP_CODEC, DEFAULT_ZIP_CODEC).lower(),
+                                 ZIP_CODECS[DEFAULT_ZIP_CODEC])
+# Environment variable name for the number of files downloaded at the same time
+ENV_NAME_ZIP_DOWNLOAD_WORKERS = 'SPARCD_ZIP_DOWNLOAD_WORKERS'
+# The number of files downloaded at the same time. Defaults to the number of connections kept
+# open to the S3 endpoint
+ZIP_DOWNLOAD_WORKERS = int(os.environ.get(ENV_NAME_ZIP_DOWNLOAD_WORKERS, S3_POOL_SIZE))
+# The maximum number of files that are downloaded ahead of being added to the zip
+ZIP_PREFETCH_FILES = ZIP_DOWNLOAD_WORKERS * 2
+# The number of bytes of zip data collected before they're returned
+ZIP_CHUNK_SIZE = 1024 * 1024
+
+
+class ZipStreamBuffer:
+    """ Write-only file object that collects the zip data until it's drained. It can't seek,
+        so zipfile writes data descriptors after each file instead of going back and
+        updating the file headers
     """
-    if not save_folder.endswith(os.path.sep):
-        save_folder += os.path.sep
-
-    with os.fdopen(write_fd, 'wb') as zip_out:
-        with zipfile.ZipFile(zip_out, mode='w', compression=zipfile.ZIP_BZIP2, \
-                                                                    compresslevel=2) as compressed:
-            lock_acquired = False
-            while True:
-                next_file = None
-
-                # Only get the lock one time
-                if not lock_acquired:
-                    files_lock.acquire()
-                    lock_acquired = True
-
-                # Get the next file to work on and relase the lock if we don't have too
-                # many files queued up already
-                try:
-                    # Check if all the files have been downloaded
-                    if len(file_list) == 0:
-                        # Release the lock on file list
-                        if lock_acquired:
-                            files_lock.release()
-                            lock_acquired = False
-
-                        # Check if we hit a download lull or we're done
-                        if done_sem.acquire(blocking=False, timeout=None):
-                            done_sem.release()
-                            break
-
-                        # Not done yet, wait for a little
-                        time.sleep(0.5)
-                        continue
-
-                    # Grab the next file
-                    next_file, _, _ = file_list.pop(0) # unused next_bucket, next_s3_path
-                finally:
-                    # We hold onto the list lock if there's a bunch of files downloaded already.
-                    # This will allow us to catch up
-                    if len(file_list) < 200 and lock_acquired:
-                        files_lock.release()
-                        lock_acquired = False
-
-                if not next_file:
-                    continue
-
-                compressed.write(next_file, next_file[len(save_folder):])
-
-                os.unlink(next_file)
 
-    # Remove the downloading folder
-    shutil.rmtree(save_folder)
-
-
-def gzip_cb(info: tuple, bucket: str, s3_path: str, local_path: str):
-    """ Handles the downloaded file as part of the GZIP creation
-    Arguments:
-        info: additional information from the calling function
-        bucket: the bucket downloaded from
-        s3_path: the S3 path of the downloaded file
-        local_path: where the data is locally
-    """
-    # Check for being done and indicate that we're done
-    if bucket is None:
-        finish_lock = info[2]
-        finish_lock.release()
-
-    # Add our file information to the list
-    file_list = info[0]
-    list_lock = info[1]
-
-    # Add our file to the list
-    list_lock.acquire()
-    try:
-        file_list.append((local_path, bucket, s3_path))
-    finally:
-        list_lock.release()
+    def __init__(self):
+        """ Initializer """
+        self._data = bytearray()
+
+    def __len__(self) -> int:
+        """ Returns the number of bytes waiting to be drained """
+        return len(self._data)
+
+    def write(self, data: bytes) -> int:
+        """ Adds the data to the buffer
+        Arguments:
+            data: the data to add
+        Return:
+            Returns the number of bytes written
+        """
+        self._data += data
+        return len(data)
+
+    def flush(self) -> None:
+        """ Nothing to do, the data is kept until drained """
+
+    def drain(self) -> bytes:
+        """ Returns all the data in the buffer and empties it
+        Return:
+            The data that was in the buffer
+        """
+        data = bytes(self._data)
+        self._data.clear()
+        return data
 
 
 def get_zip_dl_info(file_str: str) -> tuple:
@@ -121,41 +91,78 @@ def get_zip_dl_info(file_str: str) -> tuple:
     return bucket, s3_path, target_path
 
 
-def generate_zip(s3_info: S3Info, s3_files: tuple, \
-                 							write_fd: int, done_sem: threading.Semaphore) -> None:
-    """ Creates a gz file containing the images
-    Arguments:
-        s3_info: the information on the S3 endpoint
-        s3_files: the list of files to compress in the format of bucket:path
-        write_pipe: the pipe to write the ZIP data to
-        done_sem: the lock indicating the last file has been downloaded
-    Returns:
-        The contents of the compressed files
-    """
-    # This folder is removed in zip_downloaded_files
-    save_folder = tempfile.mkdtemp(prefix=SPARCD_PREFIX + 'gz_')
-    downloaded_files = []
-    download_files_lock = Lock()
-
-    zip_thread = threading.Thread(target=zip_downloaded_files,
-                          args=(write_fd, downloaded_files, download_files_lock, done_sem, \
-                                                                                        save_folder)
-                         )
-    zip_thread.start()
-
-    S3ImageConnection.download_images_cb(s3_info,
-                                        [get_zip_dl_info(one_file) for one_file in s3_files],
-                                        save_folder, gzip_cb,
-                                        (downloaded_files, download_files_lock, done_sem))
-
-def zip_iterator(read_fd: int):
-    """ Reads the data in the pipe and yields it
+def __zip_file(compressed: zipfile.ZipFile, stream: ZipStreamBuffer, local_path: str,
+                                                                arc_name: str) -> Iterator[bytes]:
+    """ Adds a downloaded file to the zip
     Arguments:
-        read_conn: the reading pipe to read from
+        compressed: the zip to add the file to
+        stream: the buffer the zip is writing to
+        local_path: the path of the downloaded file
+        arc_name: the name of the file in the zip
+    Return:
+        Yields the zip data as it fills chunks
     """
-    with os.fdopen(read_fd, 'rb') as zip_in:
+    zip_info = zipfile.ZipInfo.from_file(local_path, arc_name)
+    zip_info.compress_type = ZIP_COMPRESSION
+
+    with open(local_path, 'rb') as in_file, compressed.open(zip_info, 'w') as zip_file:
         while True:
-            data = zip_in.read(1024)
+            data = in_file.read(ZIP_CHUNK_SIZE)
             if not data:
                 break
-            yield data
+            zip_file.write(data)
+            if len(stream) >= ZIP_CHUNK_SIZE:
+                yield stream.drain()
+
+
+def zip_iterator(s3_info: S3Info, s3_files: tuple) -> Iterator[bytes]:
+    """ Downloads the files and yields a zip file containing them
+    Arguments:
+        s3_info: the information on the S3 endpoint
+        s3_files: the list of files to compress in the format of bucket:path
+    Return:
+        Yields the zip data in chunks
+    Notes:
+        Files are downloaded in the background while earlier files are added to the zip. Files
+        that can't be downloaded are left out of the zip
+    """
+    minio = s3_connect(s3_info)
+    save_folder = tempfile.mkdtemp(prefix=SPARCD_PREFIX + 'zip_')
+    dl_files = iter([get_zip_dl_info(one_file) for one_file in s3_files])
+    stream = ZipStreamBuffer()
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=ZIP_DOWNLOAD_WORKERS)
+    try:
+        with zipfile.ZipFile(stream, mode='w', compression=ZIP_COMPRESSION) as compressed:
+            pending = set()
+            while True:
+                # Keep the downloads ahead of the zipping
+                for one_file in dl_files:
+                    pending.add(executor.submit(download_data_thread, minio, one_file,
+                                                                                save_folder))
+                    if len(pending) >= ZIP_PREFETCH_FILES:
+                        break
+
+                if not pending:
+                    break
+
+                done, pending = concurrent.futures.wait(pending,
+                                                return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        _, _, local_path = future.result()
+                    # pylint: disable=broad-exception-caught
+                    except Exception as ex:
+                        print(f'Generated zip download exception: {ex}', flush=True)
+                        traceback.print_exception(ex)
+                        continue
+
+                    yield from __zip_file(compressed, stream, local_path,
+                                          os.path.relpath(local_path, save_folder))
+                    os.unlink(local_path)
+
+        # Return the rest of the zip data
+        yield stream.drain()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(save_folder, ignore_errors=True)
@@ -0,0 +1,254 @@
+#!/usr/bin/python3
+""" Times saving generated uploads and sandbox files to the database, and how long the database
+    is locked for writing while they're saved
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmark_utils import add_report_arguments, report_header, write_report
+
+# pylint: disable=wrong-import-order
+from create_db import build_database, build_sandbox_database
+from spd_database.spdsqlite import SPDSQLite
+from spd_database.spdsqlite_sandbox import SPDSQLiteSandbox
+
+# The default number of uploads saved for a bucket
+DEFAULT_NUM_UPLOADS = 2000
+# The default number of images in each upload
+DEFAULT_NUM_IMAGES = 50
+# The default number of files in a sandbox upload
+DEFAULT_NUM_FILES = 20000
+# The default number of times each save is timed
+DEFAULT_REPEAT = 3
+
+# The endpoint, bucket, and user the generated data is saved under
+BENCH_S3_ID = 'sparcd-bench'
+BENCH_BUCKET = 'sparcd-bench-bucket'
+BENCH_USER = 'sparcd-bench-user'
+
+# The name of our script
+SCRIPT_NAME = os.path.basename(__file__)
+
+# Description of what this script does
+ARGPARSE_PROGRAM_DESC = 'Times saving generated uploads and sandbox files to the database, ' \
+                        'and how long the database is locked for writing while they are saved, ' \
+                        'and writes the timings as JSON'
+# Argparse help strings
+ARGPARSE_HELP_UPLOADS = f'The number of uploads saved for a bucket (default: {DEFAULT_NUM_UPLOADS})'
+ARGPARSE_HELP_IMAGES = f'The number of images in each upload (default: {DEFAULT_NUM_IMAGES})'
+ARGPARSE_HELP_FILES = f'The number of files in a sandbox upload (default: {DEFAULT_NUM_FILES})'
+ARGPARSE_HELP_REPEAT = 'The number of times to time each save. The fastest and median ' \
+                        f'times are reported (default: {DEFAULT_REPEAT})'
+
+
+class WriteLockTimer:
+    """ Times how long a connection keeps the database locked for writing by watching the
+        statements it runs
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        """ Initializer
+        Arguments:
+            conn: the connection to watch
+        """
+        self._conn = conn
+        self._begin_ts = None
+        self.locked_sec = 0.0
+        self.max_locked_sec = 0.0
+
+    def __enter__(self):
+        """ Starts watching the connection """
+        self._conn.set_trace_callback(self._trace)
+        return self
+
+    def __exit__(self, *_):
+        """ Stops watching the connection """
+        self._conn.set_trace_callback(None)
+
+    def _trace(self, statement: str) -> None:
+        """ Times the transactions
+        Arguments:
+            statement: the statement being run
+        Notes:
+            Transactions are started right before their first write, so the time from the start
+            of a transaction to its end is how long other workers can't write
+        """
+        if statement.startswith('BEGIN'):
+            self._begin_ts = time.perf_counter()
+        elif self._begin_ts is not None and statement in ('COMMIT', 'ROLLBACK'):
+            locked_sec = time.perf_counter() - self._begin_ts
+            self.locked_sec += locked_sec
+            self.max_locked_sec = max(self.max_locked_sec, locked_sec)
+            self._begin_ts = None
+
+
+def get_arguments() -> argparse.Namespace:
+    """ Returns the data from the parsed command line arguments
+    Returns:
+        The parsed arguments
+    """
+    parser = argparse.ArgumentParser(prog=SCRIPT_NAME, description=ARGPARSE_PROGRAM_DESC)
+    parser.add_argument('--uploads', type=int, default=DEFAULT_NUM_UPLOADS,
+                        help=ARGPARSE_HELP_UPLOADS)
+    parser.add_argument('--images', type=int, default=DEFAULT_NUM_IMAGES,
+                        help=ARGPARSE_HELP_IMAGES)
+    parser.add_argument('--files', type=int, default=DEFAULT_NUM_FILES, help=ARGPARSE_HELP_FILES)
+    add_report_arguments(parser, DEFAULT_REPEAT, ARGPARSE_HELP_REPEAT)
+
+    args = parser.parse_args()
+    if args.uploads < 1 or args.images < 1 or args.files < 1 or args.repeat < 1:
+        sys.exit(f'{SCRIPT_NAME}: the sizes and repeat count must be greater than zero')
+
+    return args
+
+
+def generate_uploads(num_uploads: int, num_images: int) -> tuple:
+    """ Generates the uploads of a bucket in the form saved to the database
+    Arguments:
+        num_uploads: the number of uploads
+        num_images: the number of images in each upload
+    Return:
+        Returns the upload rows and the image rows
+    """
+    uploads = []
+    images = []
+    image_dt = datetime.datetime(2024, 1, 1)
+    for upload_idx in range(0, num_uploads):
+        upload_name = f'{image_dt.strftime("%Y.%m.%d.%H.%M.%S")}_{BENCH_USER}_{upload_idx}'
+        uploads.append({'name': upload_name,
+                        'json': json.dumps({'name': upload_name, 'loc': f'LOC{upload_idx%50}',
+                                            'imagesCount': num_images})})
+        for image_idx in range(0, num_images):
+            image_name = f'IMG_{image_idx:05d}.JPG'
+            images.append((upload_name, image_name, f'Uploads/{upload_name}/{image_name}',
+                           image_dt.isoformat(), int(image_dt.timestamp()), image_dt.year,
+                           image_dt.month, image_dt.day, image_dt.hour, image_dt.minute,
+                           image_dt.timetuple().tm_yday, image_dt.weekday(),
+                           f'LOC{upload_idx%50}', 'Canis latrans', 'Coyote', 1))
+            image_dt += datetime.timedelta(minutes=5)
+
+    return uploads, images
+
+
+def time_save(db, func, repeat: int) -> dict:
+    """ Times calling the save function and how long it locks the database
+    Arguments:
+        db: the database instance that's saving
+        func: the function to call without any parameters
+        repeat: the number of times to call the function
+    Return:
+        Returns the fastest and median times in seconds, the fastest and median times the
+        database was locked, the longest single lock, and the number of runs
+    """
+    times = []
+    locked = []
+    max_locked = 0.0
+    for _ in range(0, repeat):
+        # pylint: disable=protected-access
+        with WriteLockTimer(db._conn) as lock_timer:
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+        locked.append(lock_timer.locked_sec)
+        max_locked = max(max_locked, lock_timer.max_locked_sec)
+
+    return {'min_sec': round(min(times), 6),
+            'median_sec': round(statistics.median(times), 6),
+            'min_locked_sec': round(min(locked), 6),
+            'median_locked_sec': round(statistics.median(locked), 6),
+            'max_single_lock_sec': round(max_locked, 6),
+            'runs': repeat}
+
+
+def benchmark_main(args: argparse.Namespace, folder: str) -> dict:
+    """ Times saving uploads and upload images to the main database
+    Arguments:
+        args: the command line arguments
+        folder: the folder to create the database in
+    Return:
+        Returns the timings
+    """
+    db_path = os.path.join(folder, 'sparcd_bench.sqlite')
+    with contextlib.redirect_stdout(io.StringIO()):
+        build_database(db_path)
+
+    uploads, images = generate_uploads(args.uploads, args.images)
+    upload_images = [{'name': one_image[1], 's3_path': one_image[2], 'key': one_image[2],
+                      'json': json.dumps({'name': one_image[1], 's3_path': one_image[2]})}
+                                                        for one_image in images[:args.files]]
+
+    db = SPDSQLite(db_path)
+    db.connect()
+    try:
+        upload_id = db.upload_save(BENCH_S3_ID, BENCH_BUCKET, 'bench', uploads[0]['name'], '{}')
+        return {'save_uploads': time_save(db,
+                                lambda: db.save_uploads(BENCH_S3_ID, BENCH_BUCKET, uploads, images),
+                                args.repeat),
+                'upload_images_save': time_save(db,
+                                lambda: db.upload_images_save(upload_id, upload_images),
+                                args.repeat),
+               }
+    finally:
+        db.close()
+
+
+def benchmark_sandbox(args: argparse.Namespace, folder: str) -> dict:
+    """ Times adding sandbox uploads to the sandbox database
+    Arguments:
+        args: the command line arguments
+        folder: the folder to create the database in
+    Return:
+        Returns the timings
+    """
+    db_path = os.path.join(folder, 'sparcd_bench_sandbox.sqlite')
+    with contextlib.redirect_stdout(io.StringIO()):
+        build_sandbox_database(db_path)
+
+    files = [f'images/IMG_{idx:06d}.JPG' for idx in range(0, args.files)]
+
+    db = SPDSQLiteSandbox(db_path)
+    db.connect()
+    try:
+        upload_ids = [db.sandbox_new_upload(BENCH_S3_ID, BENCH_USER, '/bench', files[:1],
+                                            BENCH_BUCKET, 'Uploads/bench', 'LOC1', 'Bench', 32.0,
+                                            -110.0, 1000.0)]
+        return {'sandbox_new_upload': time_save(db,
+                                lambda: upload_ids.append(db.sandbox_new_upload(BENCH_S3_ID,
+                                            BENCH_USER, '/bench', files, BENCH_BUCKET,
+                                            'Uploads/bench', 'LOC1', 'Bench', 32.0, -110.0,
+                                            1000.0)),
+                                args.repeat),
+                'sandbox_reset_upload': time_save(db,
+                                lambda: db.sandbox_reset_upload(BENCH_USER, upload_ids[0], files),
+                                args.repeat),
+               }
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    cmd_args = get_arguments()
+
+    with tempfile.TemporaryDirectory() as bench_folder:
+        timings = benchmark_main(cmd_args, bench_folder) | \
+                                                    benchmark_sandbox(cmd_args, bench_folder)
+
+    benchmark = report_header()
+    benchmark.update({'sqlite': sqlite3.sqlite_version,
+                      'uploads': cmd_args.uploads,
+                      'images_per_upload': cmd_args.images,
+                      'sandbox_files': cmd_args.files,
+                      'timings': timings,
+                     })
+
+    write_report(benchmark, cmd_args.output)
@@ -0,0 +1,308 @@
+#!/usr/bin/python3
+""" Times the query results formatters on generated camera trap collections
+"""
+
+import argparse
+import datetime
+import inspect
+import os
+import random
+import sys
+import tempfile
+
+from benchmark_utils import add_report_arguments, report_header, time_call, write_report
+
+# The server configuration needs a database path even though the database isn't used here
+os.environ.setdefault('SPARCD_DB', os.path.join(tempfile.gettempdir(), 'sparcd_benchmark.sqlite'))
+
+# pylint: disable=wrong-import-position,wrong-import-order
+import query_helpers
+from format_dr_sanderson import get_dr_sanderson_output
+from text_formatters.activity_pattern_formatter import ActivityPatternFormatter
+from text_formatters.act_per_abu_loc_formatter import ActPerAbuLocFormatter
+from text_formatters.detection_rate_formatter import DetectionRateFormatter
+from text_formatters.first_last_species_formatter import FirstLastSpeciesFormatter
+from text_formatters.header_formatter import HeaderFormatter
+from text_formatters.location_stat_formatter import LocationStatFormatter
+from text_formatters.lunar_activity_formatter import LunarActivityFormatter
+from text_formatters.occurance_formatter import OccuranceFormatter
+from text_formatters.richness_formatter import RichnessFormatter
+from text_formatters.species_loc_coord_formatter import SpeciesLocCoordFormatter
+from text_formatters.total_day_formatter import TotalDayFormatter
+from text_formatters.trap_days_and_effort_formatter import TrapDaysAndEffortFormatter
+from text_formatters.results import Results
+
+# The formatter classes that are timed
+FORMATTER_CLASSES = (HeaderFormatter, FirstLastSpeciesFormatter, ActPerAbuLocFormatter,
+                     TrapDaysAndEffortFormatter, LocationStatFormatter, ActivityPatternFormatter,
+                     LunarActivityFormatter, RichnessFormatter, SpeciesLocCoordFormatter,
+                     OccuranceFormatter, TotalDayFormatter, DetectionRateFormatter)
+
+# The query tabs that are timed. Image downloads are left out since they need an S3 endpoint
+QUERY_TABS = tuple(one_tab for one_tab in query_helpers.QUERY_TAB_FORMATTERS \
+                                                                if one_tab != 'imageDownloads')
+
+# The default sizes of the generated collections
+DEFAULT_NUM_IMAGES = (10000,)
+DEFAULT_NUM_LOCATIONS = 20
+DEFAULT_NUM_SPECIES = 15
+DEFAULT_IMAGES_PER_UPLOAD = 1000
+DEFAULT_INTERVAL_MINUTES = 60
+DEFAULT_REPEAT = 3
+DEFAULT_SEED = 1
+
+# The first and last years of the generated image timestamps
+FIRST_YEAR = 2018
+LAST_YEAR = 2024
+# The timezone of the generated image timestamps
+IMAGE_TIMEZONE = datetime.timezone(datetime.timedelta(hours=-7))
+
+# The name of our script
+SCRIPT_NAME = os.path.basename(__file__)
+
+# Description of what this script does
+ARGPARSE_PROGRAM_DESC = 'Times the query results formatters on generated camera trap ' \
+                        'collections and writes the timings as JSON'
+# Argparse help strings
+ARGPARSE_HELP_IMAGES = 'The number of images in each generated collection. Specify more than ' \
+                        'one number to time several collection sizes ' \
+                        f'(default: {DEFAULT_NUM_IMAGES[0]})'
+ARGPARSE_HELP_LOCATIONS = 'The number of locations in each generated collection ' \
+                        f'(default: {DEFAULT_NUM_LOCATIONS})'
+ARGPARSE_HELP_SPECIES = 'The number of species in each generated collection ' \
+                        f'(default: {DEFAULT_NUM_SPECIES})'
+ARGPARSE_HELP_UPLOAD = 'The number of images in each generated upload ' \
+                        f'(default: {DEFAULT_IMAGES_PER_UPLOAD})'
+ARGPARSE_HELP_INTERVAL = 'The query interval in minutes ' \
+                        f'(default: {DEFAULT_INTERVAL_MINUTES})'
+ARGPARSE_HELP_REPEAT = 'The number of times to time each formatter. The fastest and median ' \
+                        f'times are reported (default: {DEFAULT_REPEAT})'
+ARGPARSE_HELP_SEED = 'The seed used when generating the collections. The same seed always ' \
+                        f'generates the same collections (default: {DEFAULT_SEED})'
+ARGPARSE_HELP_FILTER = 'Only time the formatters whose names contain this text'
+
+
+def get_arguments() -> argparse.Namespace:
+    """ Returns the data from the parsed command line arguments
+    Returns:
+        The parsed arguments
+    """
+    parser = argparse.ArgumentParser(prog=SCRIPT_NAME, description=ARGPARSE_PROGRAM_DESC)
+    parser.add_argument('--images', type=int, nargs='+', default=DEFAULT_NUM_IMAGES,
+                        help=ARGPARSE_HELP_IMAGES)
+    parser.add_argument('--locations', type=int, default=DEFAULT_NUM_LOCATIONS,
+                        help=ARGPARSE_HELP_LOCATIONS)
+    parser.add_argument('--species', type=int, default=DEFAULT_NUM_SPECIES,
+                        help=ARGPARSE_HELP_SPECIES)
+    parser.add_argument('--upload_size', type=int, default=DEFAULT_IMAGES_PER_UPLOAD,
+                        help=ARGPARSE_HELP_UPLOAD)
+    parser.add_argument('--interval', type=int, default=DEFAULT_INTERVAL_MINUTES,
+                        help=ARGPARSE_HELP_INTERVAL)
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help=ARGPARSE_HELP_SEED)
+    parser.add_argument('--filter', help=ARGPARSE_HELP_FILTER)
+    add_report_arguments(parser, DEFAULT_REPEAT, ARGPARSE_HELP_REPEAT)
+
+    args = parser.parse_args()
+    if any(one_num < 1 for one_num in args.images) or args.locations < 1 or \
+                        args.species < 1 or args.upload_size < 1 or args.repeat < 1:
+        sys.exit(f'{SCRIPT_NAME}: the sizes and repeat count must be greater than zero')
+
+    return args
+
+
+def generate_locations(rng: random.Random, num_locations: int) -> list:
+    """ Generates the locations of a collection
+    Arguments:
+        rng: the random number generator to use
+        num_locations: the number of locations to generate
+    Return:
+        Returns the list of locations
+    """
+    locations = []
+    for index in range(0, num_locations):
+        lat = round(rng.uniform(31.3, 32.9), 6)
+        lng = round(rng.uniform(-111.5, -109.1), 6)
+        locations.append({'nameProperty': f'Location {index + 1}',
+                          'idProperty': f'LOC{index + 1:04d}',
+                          'latProperty': lat,
+                          'lngProperty': lng,
+                          'elevationProperty': round(rng.uniform(600, 2800), 1),
+                          # Approximate UTM values, they are only displayed
+                          'utm_code': '12R',
+                          'utm_x': str(round(500000 + (lng + 111) * 95000)),
+                          'utm_y': str(round(lat * 110900)),
+                         })
+
+    return locations
+
+
+def generate_species(num_species: int) -> list:
+    """ Generates the species of a collection
+    Arguments:
+        num_species: the number of species to generate
+    Return:
+        Returns the list of species
+    """
+    return [{'name': f'Species {index + 1}',
+             'scientificName': f'Genus{index + 1} species{index + 1}',
+             'speciesIconURL': '',
+             'keyBinding': None,
+            } for index in range(0, num_species)]
+
+
+def generate_uploads(rng: random.Random, num_images: int, locations: tuple, species: tuple,
+                                                                    upload_size: int) -> list:
+    """ Generates the uploads of a collection in the form returned by a query
+    Arguments:
+        rng: the random number generator to use
+        num_images: the total number of images to generate
+        locations: the locations of the collection
+        species: the species of the collection
+        upload_size: the number of images in each upload
+    Return:
+        Returns the list of uploads
+    Notes:
+        Images are taken in bursts at each location. Some species are seen much more than
+        others and some images have more than one species
+    """
+    # pylint: disable=too-many-locals
+    species_weights = [1.0 / (index + 1) for index in range(0, len(species))]
+    first_dt = datetime.datetime(FIRST_YEAR, 1, 1, tzinfo=IMAGE_TIMEZONE)
+    span_sec = int((datetime.datetime(LAST_YEAR, 12, 31, tzinfo=IMAGE_TIMEZONE) - first_dt) \
+                                                                            .total_seconds())
+
+    uploads = []
+    image_num = 0
+    while image_num < num_images:
+        location = rng.choice(locations)
+        upload_name = f'upload_{len(uploads) + 1:06d}'
+        image_dt = first_dt + datetime.timedelta(seconds=rng.randrange(0, span_sec))
+
+        images = []
+        while len(images) < upload_size and image_num < num_images:
+            # Each burst sees the same species
+            burst_species = rng.choices(species, weights=species_weights,
+                                                                k=1 if rng.random() < 0.9 else 2)
+            burst_species = {one_species['scientificName']: one_species \
+                                                for one_species in burst_species}.values()
+            for _ in range(0, rng.randint(1, 5)):
+                if len(images) >= upload_size or image_num >= num_images:
+                    break
+                image_name = f'IMG_{image_num:07d}.JPG'
+                s3_path = f'Collections/bench/Uploads/{upload_name}/{image_name}'
+                images.append({'name': image_name,
+                               'bucket': 'sparcd-bench',
+                               's3_path': s3_path,
+                               'key': s3_path,
+                               'image_dt': image_dt,
+                               'species': [{'name': one_species['name'],
+                                            'scientificName': one_species['scientificName'],
+                                            'count': str(rng.randint(1, 4))
+                                           } for one_species in burst_species],
+                             })
+                image_num += 1
+                image_dt += datetime.timedelta(seconds=rng.randint(1, 30))
+
+            # Wait for the next burst
+            image_dt += datetime.timedelta(minutes=rng.randint(5, 3 * 24 * 60))
+
+        uploads.append({'name': upload_name,
+                        'bucket': 'sparcd-bench',
+                        'loc': location['idProperty'],
+                        'loc_name': location['nameProperty'],
+                        'loc_lat': location['latProperty'],
+                        'loc_lon': location['lngProperty'],
+                        'elevation': location['elevationProperty'],
+                        'images': images,
+                       })
+
+    return uploads
+
+
+def get_formatters() -> list:
+    """ Returns the formatter methods to time
+    Return:
+        Returns a list of the formatter name, the method, and whether the method takes the
+        results as a parameter
+    """
+    formatters = []
+    for one_class in FORMATTER_CLASSES:
+        for name, method in inspect.getmembers(one_class, inspect.isfunction):
+            if not name.startswith('print_'):
+                continue
+            formatters.append((f'{one_class.__name__}.{name}', method,
+                               len(inspect.signature(method).parameters) > 0))
+
+    return formatters
+
+
+def benchmark_collection(args: argparse.Namespace, num_images: int) -> dict:
+    """ Generates a collection and times the formatters on it
+    Arguments:
+        args: the command line arguments
+        num_images: the number of images in the collection
+    Return:
+        Returns the collection information and the timings of each formatter
+    """
+    rng = random.Random(args.seed)
+    locations = generate_locations(rng, args.locations)
+    species = generate_species(args.species)
+    uploads = generate_uploads(rng, num_images, locations, species, args.upload_size)
+
+    def make_results() -> Results:
+        return Results(uploads, species, locations, None, {}, args.interval)
+
+    def include(name: str) -> bool:
+        return not args.filter or args.filter in name
+
+    timings = {}
+    results = make_results()
+    if include('Results'):
+        timings['Results'] = time_call(make_results, args.repeat)
+
+    # The formatters share the same results, the same as when a query's tabs are formatted
+    for name, method, takes_results in get_formatters():
+        if include(name):
+            timings[name] = time_call((lambda method=method: method(results)) if takes_results \
+                                                                        else method, args.repeat)
+
+    if include('get_dr_sanderson_output'):
+        timings['get_dr_sanderson_output'] = time_call(
+                                lambda: get_dr_sanderson_output(make_results()), args.repeat)
+
+    # The complete query pipeline starting from the filtered uploads
+    for one_tab in QUERY_TABS:
+        name = f'query_tab_output.{one_tab}'
+        if include(name):
+            timings[name] = time_call(
+                        lambda one_tab=one_tab: query_helpers.query_tab_output(make_results(),
+                                                                                one_tab),
+                        args.repeat)
+
+    if include('query_output'):
+        def run_query_output() -> None:
+            cur_results = make_results()
+            query_helpers.query_output(cur_results, 'benchmark')
+            for one_tab in QUERY_TABS:
+                query_helpers.query_tab_output(cur_results, one_tab)
+        timings['query_output'] = time_call(run_query_output, args.repeat)
+
+    return {'images': num_images,
+            'locations': args.locations,
+            'species': args.species,
+            'uploads': len(uploads),
+            'upload_size': args.upload_size,
+            'interval': args.interval,
+            'seed': args.seed,
+            'timings': timings,
+           }
+
+
+if __name__ == '__main__':
+    cmd_args = get_arguments()
+
+    benchmark = report_header()
+    benchmark['collections'] = [benchmark_collection(cmd_args, one_num) \
+                                                            for one_num in cmd_args.images]
+
+    write_report(benchmark, cmd_args.output)
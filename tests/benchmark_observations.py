@@ -0,0 +1,219 @@
+#!/usr/bin/python3
+""" Times loading the observations of generated uploads to check that it scales linearly with the
+    number of observations
+"""
+
+import argparse
+import csv
+import datetime
+import io
+import os
+import random
+import sys
+
+from benchmark_utils import add_report_arguments, report_header, time_call, write_report
+
+# pylint: disable=wrong-import-order
+from camtrap.v016 import camtrap
+from s3.s3_access_helpers import (MEDIA_CSV_FILE_NAME, OBSERVATIONS_CSV_FILE_NAME,
+                                  apply_media_timestamps, apply_observation_species,
+                                  load_upload_observations, make_s3_path, temp_s3_file)
+
+# The default number of images in the generated uploads
+DEFAULT_NUM_IMAGES = (2500, 5000, 10000, 20000, 40000)
+# The default maximum number of observations of each image
+DEFAULT_MAX_SPECIES = 3
+# The default number of times each load is timed
+DEFAULT_REPEAT = 3
+# The default seed for generating the uploads
+DEFAULT_SEED = 1
+# The default largest allowed increase in the time per observation between the smallest and
+# the largest upload. Linear loading keeps the time per observation about the same
+DEFAULT_MAX_SCALING = 2.0
+
+# The bucket and path of the generated uploads
+UPLOAD_BUCKET = 'sparcd-bench'
+UPLOAD_PATH = 'Collections/bench/Uploads/upload_000001'
+
+# The name of our script
+SCRIPT_NAME = os.path.basename(__file__)
+
+# Description of what this script does
+ARGPARSE_PROGRAM_DESC = 'Times loading the observations of generated uploads and writes the ' \
+                        'timings as JSON. Exits with an error if the time per observation ' \
+                        'grows by more than the allowed scaling'
+# Argparse help strings
+ARGPARSE_HELP_IMAGES = 'The number of images in each generated upload. Specify more than ' \
+                        'one number to time several upload sizes (default: ' \
+                        f'{" ".join(str(one_num) for one_num in DEFAULT_NUM_IMAGES)})'
+ARGPARSE_HELP_SPECIES = 'The maximum number of observations of each image ' \
+                        f'(default: {DEFAULT_MAX_SPECIES})'
+ARGPARSE_HELP_REPEAT = 'The number of times to time each load. The fastest and median ' \
+                        f'times are reported (default: {DEFAULT_REPEAT})'
+ARGPARSE_HELP_SEED = 'The seed used when generating the uploads. The same seed always ' \
+                        f'generates the same uploads (default: {DEFAULT_SEED})'
+ARGPARSE_HELP_SCALING = 'The largest allowed increase in the fastest time per observation ' \
+                        f'from the smallest to the largest upload (default: {DEFAULT_MAX_SCALING})'
+
+
+class LocalS3Files:
+    """ Serves generated files in place of an S3 endpoint """
+
+    def __init__(self, files: dict):
+        """ Initializer
+        Arguments:
+            files: the file contents keyed by the bucket and path
+        """
+        self._files = files
+
+    def fget_object(self, bucket: str, path: str, dest_file: str) -> None:
+        """ Writes the file to the destination the same as Minio
+        Arguments:
+            bucket: the bucket of the file
+            path: the path of the file
+            dest_file: where to write the file
+        """
+        with open(dest_file, 'w', encoding='utf-8') as out_file:
+            out_file.write(self._files[(bucket, path)])
+
+
+def get_arguments() -> argparse.Namespace:
+    """ Returns the data from the parsed command line arguments
+    Returns:
+        The parsed arguments
+    """
+    parser = argparse.ArgumentParser(prog=SCRIPT_NAME, description=ARGPARSE_PROGRAM_DESC)
+    parser.add_argument('--images', type=int, nargs='+', default=DEFAULT_NUM_IMAGES,
+                        help=ARGPARSE_HELP_IMAGES)
+    parser.add_argument('--species', type=int, default=DEFAULT_MAX_SPECIES,
+                        help=ARGPARSE_HELP_SPECIES)
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help=ARGPARSE_HELP_SEED)
+    parser.add_argument('--max_scaling', type=float, default=DEFAULT_MAX_SCALING,
+                        help=ARGPARSE_HELP_SCALING)
+    add_report_arguments(parser, DEFAULT_REPEAT, ARGPARSE_HELP_REPEAT)
+
+    args = parser.parse_args()
+    if any(one_num < 1 for one_num in args.images) or args.species < 1 or args.repeat < 1:
+        sys.exit(f'{SCRIPT_NAME}: the sizes and repeat count must be greater than zero')
+
+    return args
+
+
+def generate_upload(rng: random.Random, num_images: int, max_species: int) -> tuple:
+    """ Generates the media and observations CSV files of an upload
+    Arguments:
+        rng: the random number generator to use
+        num_images: the number of images in the upload
+        max_species: the maximum number of observations of each image
+    Return:
+        Returns the media CSV, the observations CSV, and the number of observations
+    Notes:
+        The observations of an image aren't always next to each other, the same as when
+        species are added to images at different times
+    """
+    image_dt = datetime.datetime(2024, 1, 1)
+    media = io.StringIO()
+    media_writer = csv.writer(media)
+    observations = []
+    for index in range(0, num_images):
+        media_id = make_s3_path((UPLOAD_PATH, f'IMG_{index:07d}.JPG'))
+        timestamp = image_dt.isoformat()
+        image_dt += datetime.timedelta(seconds=rng.randint(1, 600))
+
+        media_row = [''] * (camtrap.CAMTRAP_MEDIA_ID_INTERNAL_IDX + 1)
+        media_row[camtrap.CAMTRAP_MEDIA_ID_IDX] = media_id
+        media_row[camtrap.CAMTRAP_MEDIA_TIMESTAMP_IDX] = timestamp
+        media_writer.writerow(media_row)
+
+        for species_index in range(0, rng.randint(1, max_species)):
+            obs_row = [''] * (camtrap.CAMTRAP_OBSERVATION_ID_INTERNAL_IDX + 1)
+            obs_row[camtrap.CAMTRAP_OBSERVATION_MEDIA_ID_IDX] = media_id
+            obs_row[camtrap.CAMTRAP_OBSERVATION_TIMESTAMP_IDX] = timestamp
+            obs_row[camtrap.CAMTRAP_OBSERVATION_SCIENTIFIC_NAME_IDX] = \
+                                                f'Genus{species_index} species{species_index}'
+            obs_row[camtrap.CAMTRAP_OBSERVATION_COUNT_IDX] = str(rng.randint(1, 4))
+            obs_row[camtrap.CAMTRAP_OBSERVATION_COMMENT_IDX] = \
+                                                f'[COMMONNAME:Species {species_index}]'
+            observations.append(obs_row)
+
+    # Spread out the observations of each image
+    rng.shuffle(observations)
+    obs_csv = io.StringIO()
+    csv.writer(obs_csv).writerows(observations)
+
+    return media.getvalue(), obs_csv.getvalue(), len(observations)
+
+
+def benchmark_upload(args: argparse.Namespace, num_images: int) -> dict:
+    """ Generates an upload and times loading its observations
+    Arguments:
+        args: the command line arguments
+        num_images: the number of images in the upload
+    Return:
+        Returns the upload information and the timings
+    """
+    media_csv, obs_csv, num_observations = generate_upload(random.Random(args.seed),
+                                                           num_images, args.species)
+    s3_files = LocalS3Files({
+            (UPLOAD_BUCKET, make_s3_path((UPLOAD_PATH, MEDIA_CSV_FILE_NAME))): media_csv,
+            (UPLOAD_BUCKET, make_s3_path((UPLOAD_PATH, OBSERVATIONS_CSV_FILE_NAME))): obs_csv,
+        })
+
+    with temp_s3_file() as temp_path:
+        def load_observations() -> None:
+            load_upload_observations(s3_files, UPLOAD_BUCKET, UPLOAD_PATH, temp_path)
+
+        def apply_to_images() -> None:
+            images_dict = {one_image['s3_path']: one_image for one_image in
+                           ({'s3_path': make_s3_path((UPLOAD_PATH, f'IMG_{index:07d}.JPG')),
+                             'species': []} for index in range(0, num_images))}
+            apply_media_timestamps(s3_files, UPLOAD_BUCKET, UPLOAD_PATH, images_dict,
+                                                                                    temp_path)
+            apply_observation_species(s3_files, UPLOAD_BUCKET, UPLOAD_PATH, images_dict,
+                                                                                    temp_path)
+
+        timings = {'load_upload_observations': time_call(load_observations, args.repeat),
+                   'apply_media_observations': time_call(apply_to_images, args.repeat),
+                  }
+
+    for one_timing in timings.values():
+        one_timing['min_usec_per_observation'] = \
+                                round(one_timing['min_sec'] * 1000000 / num_observations, 3)
+
+    return {'images': num_images,
+            'observations': num_observations,
+            'seed': args.seed,
+            'timings': timings,
+           }
+
+
+def get_scaling(uploads: tuple) -> dict:
+    """ Returns how much the time per observation grew from the smallest to the largest upload
+    Arguments:
+        uploads: the upload timings
+    Return:
+        Returns the increase of the time per observation for each timing
+    """
+    smallest = min(uploads, key=lambda one_upload: one_upload['observations'])
+    largest = max(uploads, key=lambda one_upload: one_upload['observations'])
+
+    return {name: round(largest['timings'][name]['min_usec_per_observation'] /
+                        max(one_timing['min_usec_per_observation'], 0.001), 3)
+                for name, one_timing in smallest['timings'].items()}
+
+
+if __name__ == '__main__':
+    cmd_args = get_arguments()
+
+    upload_timings = [benchmark_upload(cmd_args, one_num) for one_num in cmd_args.images]
+    benchmark = report_header()
+    benchmark.update({'uploads': upload_timings,
+                      'scaling': get_scaling(upload_timings),
+                      'max_scaling': cmd_args.max_scaling,
+                     })
+
+    write_report(benchmark, cmd_args.output)
+
+    if any(one_scaling > cmd_args.max_scaling for one_scaling in benchmark['scaling'].values()):
+        sys.exit(f'{SCRIPT_NAME}: the time per observation grew more than ' \
+                 f'{cmd_args.max_scaling} times from the smallest to the largest upload')
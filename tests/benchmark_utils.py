@@ -0,0 +1,89 @@
+""" Shared helpers for the benchmark scripts
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+# The folder containing the server code
+SERVER_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server')
+if SERVER_FOLDER not in sys.path:
+    sys.path.insert(0, SERVER_FOLDER)
+
+# Argparse help string for where the timings are written
+ARGPARSE_HELP_OUTPUT = 'The file to write the JSON timings to (default: standard output)'
+
+
+def add_report_arguments(parser: argparse.ArgumentParser, default_repeat: int,
+                                                                    repeat_help: str) -> None:
+    """ Adds the arguments for the number of timing runs and where the timings are written
+    Arguments:
+        parser: the parser to add the arguments to
+        default_repeat: the default number of times each call is timed
+        repeat_help: the help string for the number of times each call is timed
+    """
+    parser.add_argument('--repeat', type=int, default=default_repeat, help=repeat_help)
+    parser.add_argument('--output', help=ARGPARSE_HELP_OUTPUT)
+
+
+def time_call(func, repeat: int) -> dict:
+    """ Times calling the function
+    Arguments:
+        func: the function to call without any parameters
+        repeat: the number of times to call the function
+    Return:
+        Returns the fastest and median times in seconds and the number of runs
+    """
+    times = []
+    for _ in range(0, repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    return {'min_sec': round(min(times), 6),
+            'median_sec': round(statistics.median(times), 6),
+            'runs': repeat}
+
+
+def get_commit() -> str:
+    """ Returns the git commit of the code being timed
+    Return:
+        Returns the commit hash, or None if it can't be found
+    """
+    try:
+        res = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=SERVER_FOLDER,
+                                                            capture_output=True, check=True)
+        return res.stdout.decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report_header() -> dict:
+    """ Returns the information on what was timed and where, for the start of a report
+    Return:
+        Returns the commit, the time of the report, and the Python version and platform
+    """
+    return {'commit': get_commit(),
+            'timestamp': datetime.datetime.now(datetime.UTC).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+           }
+
+
+def write_report(report: dict, output: str = None) -> None:
+    """ Writes the report as JSON
+    Arguments:
+        report: the report to write
+        output: the file to write the report to. The report is printed when not specified
+    """
+    if output:
+        with open(output, 'w', encoding='utf-8') as ofile:
+            json.dump(report, ofile, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
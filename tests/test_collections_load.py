@@ -0,0 +1,139 @@
+"""This script contains testing of loading collections that are shared between requests
+"""
+
+import copy
+import os
+import tempfile
+import threading
+import types
+
+# The server configuration is read when the server modules are imported
+os.environ.setdefault('SPARCD_DB', os.path.join(tempfile.gettempdir(), 'sparcd-test.sqlite'))
+
+# pylint: disable=wrong-import-position
+import sparcd_collections
+from spd_types.s3info import S3Info
+
+# The endpoint and users used for testing
+TEST_S3_URI = 's3.test:9000'
+TEST_LOADER_USER = 'test-loader-user'
+TEST_WAITER_USER = 'test-waiter-user'
+# Number of seconds to wait for the test threads
+TEST_WAIT_SEC = 10
+
+
+class FakeDatabase:
+    """ Database without any saved collections """
+
+    def get_all_collections_elapsed(self, _: str) -> tuple:
+        """ Returns that there aren't any saved collections """
+        return None, None
+
+
+def test_concurrent_loads(monkeypatch) -> None:
+    """ Tests that a request waiting for another request's collection load gets its own
+        collections with its own permissions
+    """
+    collections = [{'id': f'test-coll-{idx}',
+                    'allPermissions': [{'usernameProperty': TEST_LOADER_USER, 'read': True},
+                                       {'usernameProperty': TEST_WAITER_USER, 'read': True}]}
+                   for idx in range(3)]
+    loading = threading.Event()
+    load_done = threading.Event()
+    waiter_copy = threading.Event()
+
+    def fetch_collections(*_) -> list:
+        """ Returns the collections once the waiting request is started """
+        loading.set()
+        assert load_done.wait(TEST_WAIT_SEC)
+        return collections
+
+    def deepcopy(value):
+        """ Holds the waiting request until the loading request has changed its collections """
+        if threading.current_thread().name == 'waiter':
+            assert waiter_copy.wait(TEST_WAIT_SEC)
+        return copy.deepcopy(value)
+
+    monkeypatch.setattr(sparcd_collections, '__fetch_collections', fetch_collections)
+    monkeypatch.setattr(sparcd_collections, 'copy', types.SimpleNamespace(deepcopy=deepcopy))
+
+    results = {}
+    def load(username: str) -> None:
+        """ Loads the collections for the user """
+        results[username] = sparcd_collections.load_collections(FakeDatabase(), False,
+                                                    S3Info(TEST_S3_URI, username, 'password'))
+
+    loader = threading.Thread(target=load, args=(TEST_LOADER_USER,), name='loader')
+    waiter = threading.Thread(target=load, args=(TEST_WAITER_USER,), name='waiter')
+    loader.start()
+    assert loading.wait(TEST_WAIT_SEC)
+    waiter.start()
+    load_done.set()
+
+    # Change the loading request's collections before the waiting request gets its copy
+    loader.join(TEST_WAIT_SEC)
+    for one_coll in results[TEST_LOADER_USER]:
+        one_coll['loader_change'] = True
+    waiter_copy.set()
+    waiter.join(TEST_WAIT_SEC)
+
+    assert len(results[TEST_LOADER_USER]) == len(collections)
+    assert len(results[TEST_WAITER_USER]) == len(collections)
+    for one_coll in results[TEST_LOADER_USER]:
+        assert one_coll['permissions']['usernameProperty'] == TEST_LOADER_USER
+    for one_coll in results[TEST_WAITER_USER]:
+        assert one_coll['permissions']['usernameProperty'] == TEST_WAITER_USER
+        assert 'loader_change' not in one_coll
+
+
+class WaitingDatabase:
+    """ Database where another server process is loading the collections """
+
+    def __init__(self, collections: list):
+        """ Initializer
+        Arguments:
+            collections: the collections the other server process saves
+        """
+        self._collections = collections
+        self.checks = 0
+
+    def get_collections_generation(self, _: str) -> int:
+        """ Returns a new generation once the lock has been checked a few times """
+        return 1 if self.checks >= 3 else 0
+
+    def is_lock_available(self, _: str) -> bool:
+        """ Returns that the lock is held by the other server process """
+        self.checks += 1
+        return False
+
+    def get_lock(self, _: str) -> None:
+        """ Fails the test since getting the lock writes to the database """
+        assert False, 'the lock was tried while it was held'
+
+    def get_all_collections(self, *_) -> list:
+        """ Returns the collections once the other server process has saved them """
+        return self._collections if self.checks >= 3 else None
+
+
+def test_wait_for_other_process():
+    """ Tests that waiting for another server process to load the collections doesn't try to
+        get the lock while it's held
+    """
+    collections = [{'id': 'test-coll'}]
+    db = WaitingDatabase(collections)
+
+    fetch_collections = getattr(sparcd_collections, '__fetch_collections')
+    assert fetch_collections(db, S3Info(TEST_S3_URI, TEST_LOADER_USER, 'password')) == collections
+    assert db.checks == 3
+
+
+def test_refresh_running_skips_password(monkeypatch):
+    """ Tests that the password isn't found when the collections are already being reloaded """
+    def get_password() -> str:
+        """ Fails the test since the password isn't needed """
+        assert False, 'the password was found for a reload that was already running'
+
+    monkeypatch.setattr(sparcd_collections, 'COLL_REFRESHES', {TEST_S3_URI})
+    start_refresh = getattr(sparcd_collections, '__start_collections_refresh')
+    start_refresh(FakeDatabase(), S3Info(TEST_S3_URI, TEST_LOADER_USER, get_password,
+                                         s3_id=TEST_S3_URI))
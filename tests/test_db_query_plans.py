@@ -0,0 +1,272 @@
+"""This script contains testing that the database queries use indexes instead of scanning tables
+"""
+
+import datetime
+import re
+
+import pytest
+
+from create_db import build_database, build_sandbox_database
+from spd_database.spdsqlite import SPDSQLite
+from spd_database.spdsqlite_sandbox import SPDSQLiteSandbox
+
+# Values used when making the database calls
+TEST_S3_ID = 'test-s3-id'
+TEST_BUCKET = 'sparcd-test-bucket'
+TEST_USER = 'test-user'
+TEST_TOKEN = 'test-token'
+TEST_COLL_ID = 'test-collection'
+TEST_UPLOAD = '2025.01.01.00.00.00_test-user'
+TEST_UPLOAD_PATH = 'Collections/test-collection/Uploads/' + TEST_UPLOAD
+TEST_FILE_PATH = TEST_UPLOAD_PATH + '/IMG_0001.JPG'
+TEST_LOCATION = 'LOC001'
+TEST_TIMESTAMP = datetime.datetime(2025, 1, 1)
+
+# Queries that are allowed to scan their tables, and why
+#   sandbox_get_incomplete(): only run when the server starts to find unfinished uploads
+ALLOWED_SCANS = ('SELECT name, s3_id, upload_id, completion_status, s3_base_path '
+                                                                    'FROM sandbox WHERE path != ""',
+                )
+
+# Matches a query plan step that reads every row of a table or index. Tables are named by their
+# alias in the plan when they have one
+SCAN_RE = re.compile(r'^SCAN (?!CONSTANT ROW)(\w+)')
+# Matches the names of the WITH clause results in a query
+CTE_NAME_RE = re.compile(r'(?:\bWITH|,)\s*(\w+)\s+AS\s*\(', re.IGNORECASE)
+
+
+def trace_queries(db, calls: tuple) -> list:
+    """ Returns the SQL statements run by the database calls
+    Arguments:
+        db: the connected database instance
+        calls: a tuple of functions taking the database instance
+    Return:
+        Returns the list of unique SQL statements that were run
+    """
+    queries = []
+    # pylint: disable=protected-access
+    db._conn.set_trace_callback(queries.append)
+    try:
+        for one_call in calls:
+            one_call(db)
+    finally:
+        db._conn.set_trace_callback(None)
+
+    # Keep the first of each statement, ignoring transaction handling
+    return list(dict.fromkeys(one_query for one_query in queries if not \
+                    one_query.split(' ', 1)[0].upper() in ('BEGIN', 'COMMIT', 'ROLLBACK',
+                                                           'SAVEPOINT', 'RELEASE', 'PRAGMA')))
+
+
+def get_table_scans(db, queries: list) -> list:
+    """ Returns the queries that scan a table
+    Arguments:
+        db: the connected database instance
+        queries: the list of SQL statements to check
+    Return:
+        Returns a list of tuples of the query and the query plan step that scans
+    """
+    # pylint: disable=protected-access
+    cursor = db._conn.cursor()
+
+    scans = []
+    for one_query in queries:
+        if any(one_query.startswith(one_allowed) for one_allowed in ALLOWED_SCANS):
+            continue
+        # Scanning the results of a WITH clause is fine, they're already filtered
+        cte_names = {one_name.lower() for one_name in CTE_NAME_RE.findall(one_query)}
+        cursor.execute('EXPLAIN QUERY PLAN ' + one_query)
+        for one_step in cursor.fetchall():
+            match = SCAN_RE.match(one_step[3])
+            if match and match.group(1).lower() not in cte_names:
+                scans.append((one_query, one_step[3]))
+    cursor.close()
+
+    return scans
+
+
+@pytest.fixture(name='main_db')
+def fixture_main_db(tmp_path):
+    """ Returns a connected main database instance """
+    db_path = str(tmp_path / 'sparcd.sqlite')
+    build_database(db_path)
+    db = SPDSQLite(db_path)
+    db.connect()
+    yield db
+    db.close()
+
+
+@pytest.fixture(name='sandbox_db')
+def fixture_sandbox_db(tmp_path):
+    """ Returns a connected sandbox database instance """
+    db_path = str(tmp_path / 'sparcd_sandbox.sqlite')
+    build_sandbox_database(db_path)
+    db = SPDSQLiteSandbox(db_path)
+    db.connect()
+    yield db
+    db.close()
+
+
+def test_main_query_plans(main_db):
+    """ Tests that the main database queries search their tables """
+    upload_ids = []
+    lock_values = []
+    calls = (
+        lambda db: db.auto_add_user(TEST_S3_ID, TEST_USER, '{}', 'test@example.com'),
+        lambda db: db.add_token(TEST_TOKEN, TEST_USER, 'password', '127.0.0.1', 'pytest',
+                                                                        's3.test', TEST_S3_ID),
+        lambda db: db.clean_expired_tokens(TEST_USER, 3600),
+        lambda db: db.update_token_timestamp(TEST_TOKEN),
+        lambda db: db.update_token_timestamps(((TEST_TOKEN, 2000000000),)),
+        lambda db: db.get_user_by_token(TEST_TOKEN),
+        lambda db: db.get_user_by_name(TEST_S3_ID, TEST_USER),
+        lambda db: db.get_password(TEST_TOKEN),
+        lambda db: db.update_user_settings(TEST_S3_ID, TEST_USER, '{}', 'test@example.com'),
+        lambda db: db.save_user_species(TEST_S3_ID, TEST_USER, '{}'),
+        lambda db: db.save_collections(TEST_S3_ID, ({'id': TEST_COLL_ID, 'name': 'Test',
+                                                     'json': '{}'},)),
+        lambda db: db.get_collections(TEST_S3_ID),
+        lambda db: db.collection_elapsed_sec(TEST_S3_ID, TEST_COLL_ID),
+        lambda db: db.collection_get(TEST_S3_ID, TEST_COLL_ID),
+        lambda db: db.collection_update(TEST_S3_ID, TEST_COLL_ID, '{}'),
+        lambda db: db.upload_save(TEST_S3_ID, TEST_BUCKET, TEST_COLL_ID, TEST_UPLOAD, '{}'),
+        lambda db: upload_ids.append(db.upload_save(TEST_S3_ID, TEST_BUCKET, TEST_COLL_ID,
+                                                                            TEST_UPLOAD, '{}')),
+        lambda db: db.upload_get(TEST_S3_ID, TEST_COLL_ID, TEST_UPLOAD),
+        lambda db: db.upload_images_save(upload_ids[0], ({'name': 'IMG_0001.JPG',
+                                                          's3_path': TEST_FILE_PATH,
+                                                          'key': TEST_FILE_PATH,
+                                                          'json': '{}'},)),
+        lambda db: db.upload_images_get(upload_ids[0]),
+        lambda db: db.upload_images_update(upload_ids[0], ({'s3_path': TEST_FILE_PATH,
+                                                            'json': '{}'},)),
+        lambda db: db.get_image_data(TEST_S3_ID, TEST_COLL_ID, TEST_UPLOAD, TEST_FILE_PATH),
+        lambda db: db.save_uploads(TEST_S3_ID, TEST_BUCKET,
+                                   ({'name': TEST_UPLOAD, 'json': '{}'},),
+                                   ((TEST_UPLOAD, 'IMG_0001.JPG', TEST_FILE_PATH,
+                                     '2025-01-01T00:00:00', 1735689600, 2025, 1, 1, 0, 0,
+                                     1, 2, TEST_LOCATION, 'Canis latrans', 'Coyote', 1),)),
+        lambda db: db.save_uploads(TEST_S3_ID, TEST_BUCKET,
+                                   ({'name': TEST_UPLOAD, 'json': '{}'},)),
+        lambda db: db.get_uploads(TEST_S3_ID, TEST_BUCKET, 3600),
+        lambda db: db.get_collection_images(TEST_S3_ID, TEST_BUCKET, (TEST_LOCATION,),
+                                            ('Canis latrans',), 0, 1735689600),
+        lambda db: db.get_collection_images(TEST_S3_ID, TEST_BUCKET, years=(2024, 2025),
+                                            months=(1, 2), hours=(0,), days_of_week=(2,)),
+        lambda db: db.get_collection_species_counts(TEST_S3_ID, TEST_BUCKET),
+        lambda db: db.save_query_path(TEST_TOKEN, '/tmp/query.zip'),
+        lambda db: db.get_query(TEST_TOKEN),
+        lambda db: db.get_clear_queries(TEST_TOKEN),
+        lambda db: db.add_collection_edit(TEST_S3_ID, TEST_BUCKET, TEST_UPLOAD_PATH, TEST_USER,
+                                          '2025-01-01T00:00:00', TEST_LOCATION, 'Test', 100.0),
+        lambda db: db.add_image_species_edit(TEST_S3_ID, TEST_BUCKET, TEST_FILE_PATH, TEST_USER,
+                                             '2025-01-01T00:00:00', 'Coyote', 'Canis latrans',
+                                             '1', 'request'),
+        lambda db: db.get_image_species_edits(TEST_S3_ID, TEST_BUCKET, TEST_UPLOAD_PATH),
+        lambda db: db.have_upload_changes(TEST_S3_ID, TEST_BUCKET, TEST_UPLOAD),
+        lambda db: db.get_next_upload_location(TEST_S3_ID, TEST_USER),
+        lambda db: db.complete_upload_location(TEST_S3_ID, TEST_USER, TEST_BUCKET,
+                                                                            TEST_UPLOAD_PATH),
+        lambda db: db.get_next_files_info(TEST_S3_ID, TEST_USER, 0, s3_path=TEST_FILE_PATH),
+        lambda db: db.get_next_files_info(TEST_S3_ID, TEST_USER, 1, upload_id=TEST_UPLOAD,
+                                          check_smaller_values=True),
+        lambda db: db.complete_collection_edits(TEST_USER, {'s3_url': TEST_S3_ID,
+                                                            'bucket': TEST_BUCKET,
+                                                            'base_path': TEST_UPLOAD_PATH}),
+        lambda db: db.complete_image_edits(TEST_USER, ({'s3_url': TEST_S3_ID,
+                                                        'bucket': TEST_BUCKET,
+                                                        's3_path': TEST_FILE_PATH},), 0, 1),
+        lambda db: db.get_admin_edit_users(TEST_S3_ID),
+        lambda db: db.update_user(TEST_S3_ID, TEST_USER, 'test@example.com', True),
+        lambda db: db.update_species(TEST_S3_ID, TEST_USER, 'Canis latrans', 'Canis lupus',
+                                     'Wolf', 'W', 'https://example.com/wolf.png'),
+        lambda db: db.update_location(TEST_S3_ID, TEST_USER, 'Test', TEST_LOCATION, True, 100.0,
+                                      32.0, -110.0, 32.1, -110.1, 'A test location'),
+        lambda db: db.get_admin_locations(TEST_S3_ID, TEST_USER),
+        lambda db: db.get_admin_species(TEST_S3_ID, TEST_USER),
+        lambda db: db.admin_location_counts(TEST_S3_ID, TEST_USER),
+        lambda db: db.admin_species_counts(TEST_S3_ID, TEST_USER),
+        lambda db: db.clear_admin_location_changes(TEST_S3_ID, TEST_USER),
+        lambda db: db.clear_admin_species_changes(TEST_S3_ID, TEST_USER),
+        lambda db: db.remove_edit_locations(TEST_S3_ID, TEST_LOCATION),
+        lambda db: db.lock_available('test-lock', 60),
+        lambda db: lock_values.append(db.lock_get('test-lock', 60)),
+        lambda db: db.lock_release('test-lock', lock_values[0]),
+        lambda db: db.generation_increment('test-generation'),
+        lambda db: db.generation_get('test-generation'),
+        lambda db: db.save_upload_move(TEST_S3_ID, TEST_BUCKET, TEST_UPLOAD_PATH, 'dest-bucket',
+                                       ('IMG_0001.JPG', 1, False)),
+        lambda db: db.get_upload_move(TEST_S3_ID, TEST_BUCKET, TEST_UPLOAD_PATH, 'dest-bucket',
+                                                                                        3600),
+        lambda db: db.remove_upload_move(TEST_S3_ID, TEST_BUCKET, TEST_UPLOAD_PATH,
+                                                                                'dest-bucket'),
+        lambda db: db.count_admin(TEST_S3_ID),
+        lambda db: db.is_sole_user(TEST_S3_ID, TEST_USER),
+        lambda db: db.user_names(TEST_S3_ID),
+        lambda db: db.message_add(TEST_S3_ID, 'admin', TEST_USER, 'Subject', 'Message', 0),
+        lambda db: db.messages_get(TEST_S3_ID, TEST_USER),
+        lambda db: db.messages_get(TEST_S3_ID, TEST_USER, True),
+        lambda db: db.messages_are_read(TEST_S3_ID, TEST_USER, (1,)),
+        lambda db: db.messages_are_deleted(TEST_S3_ID, TEST_USER, (1,)),
+        lambda db: db.message_count(TEST_S3_ID, TEST_USER),
+        lambda db: db.remove_token(TEST_TOKEN),
+    )
+
+    queries = trace_queries(main_db, calls)
+    assert queries
+    assert not get_table_scans(main_db, queries)
+
+
+def test_sandbox_query_plans(sandbox_db):
+    """ Tests that the sandbox database queries search their tables """
+    upload_ids = []
+    file_ids = []
+    calls = (
+        lambda db: upload_ids.append(db.sandbox_new_upload(TEST_S3_ID, TEST_USER, '/upload',
+                                                    ('IMG_0001.JPG', 'IMG_0002.JPG'),
+                                                    TEST_BUCKET, TEST_UPLOAD_PATH, TEST_LOCATION,
+                                                    'Test', 32.0, -110.0, 100.0)),
+        lambda db: db.get_sandbox(TEST_S3_ID),
+        lambda db: db.sandbox_exists(TEST_S3_ID, TEST_BUCKET, TEST_USER, TEST_UPLOAD_PATH),
+        lambda db: db.sandbox_get_upload(TEST_S3_ID, TEST_USER, '/upload'),
+        lambda db: db.sandbox_get_upload_files(1),
+        lambda db: db.sandbox_get_s3_info(TEST_USER, upload_ids[0]),
+        lambda db: db.sandbox_upload_counts(TEST_USER, upload_ids[0]),
+        lambda db: db.sandbox_files_not_uploaded(TEST_USER, upload_ids[0]),
+        lambda db: db.sandbox_reset_upload(TEST_USER, upload_ids[0],
+                                           ('IMG_0001.JPG', 'IMG_0002.JPG')),
+        lambda db: db.sandbox_set_completion_status(TEST_USER, upload_ids[0], 1),
+        lambda db: file_ids.append(db.sandbox_file_uploaded(TEST_USER, upload_ids[0],
+                                        'IMG_0001.JPG', 'image/jpeg', '2025-01-01T00:00:00')),
+        lambda db: db.sandbox_file_rename(TEST_USER, upload_ids[0], 'IMG_0002.JPG',
+                                                                            'IMG_0003.JPG'),
+        lambda db: db.sandbox_add_file_info(file_ids[0],
+                                            ({'common': 'Coyote', 'scientific': 'Canis latrans',
+                                              'count': '1'},),
+                                            {'name': 'Test', 'id': TEST_LOCATION,
+                                             'elevation': '100.0'},
+                                            '2025-01-01T00:00:00'),
+        lambda db: db.sandbox_file_processing_complete(file_ids[0]),
+        lambda db: db.sandbox_get_location(TEST_USER, upload_ids[0]),
+        lambda db: db.get_files_renamed(TEST_USER, upload_ids[0]),
+        lambda db: db.get_file_mimetypes(TEST_USER, upload_ids[0]),
+        lambda db: db.get_file_created_timestamp(TEST_USER, upload_ids[0]),
+        lambda db: db.get_file_species(TEST_USER, upload_ids[0]),
+        lambda db: db.sandbox_get_completion_status(TEST_USER, upload_ids[0]),
+        lambda db: db.sandbox_get_incomplete(),
+        lambda db: db.sandbox_upload_complete(TEST_USER, upload_ids[0]),
+        lambda db: db.sandbox_add_recovered(TEST_S3_ID, TEST_BUCKET, TEST_USER,
+                                            TEST_UPLOAD_PATH + '2', TEST_TIMESTAMP),
+        lambda db: db.sandbox_set_recovered(TEST_S3_ID, TEST_BUCKET, TEST_USER,
+                                            TEST_UPLOAD_PATH + '2', TEST_TIMESTAMP),
+        lambda db: db.sandbox_upload_recovery_update(TEST_S3_ID, TEST_USER, TEST_BUCKET,
+                                                     TEST_UPLOAD + '2', '/upload2', TEST_LOCATION,
+                                                     'Test', 32.0, -110.0, 100.0),
+        lambda db: db.sandbox_upload_complete_by_info(TEST_S3_ID, TEST_USER, TEST_BUCKET,
+                                                                            TEST_UPLOAD + '2'),
+        lambda db: db.sandbox_new_upload_id(upload_ids[0]),
+    )
+
+    queries = trace_queries(sandbox_db, calls)
+    assert queries
+    assert not get_table_scans(sandbox_db, queries)
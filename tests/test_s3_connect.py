@@ -0,0 +1,75 @@
+"""This script contains testing of the pooled S3 connections
+"""
+
+import concurrent.futures
+
+import pytest
+
+from s3.s3_connect import s3_connect, s3_http_client, S3_POOL_SIZE
+from spd_types.s3info import S3Info
+
+# The number of S3 calls to make when testing connection reuse
+NUM_TEST_CALLS = 20
+
+
+@pytest.fixture(scope='session')
+def s3_endpoint(pytestconfig):
+    """ S3 endpoint command line argument fixture"""
+    endpoint_value = pytestconfig.getoption("s3_endpoint")
+    return endpoint_value
+
+@pytest.fixture(scope='session')
+def s3_name(pytestconfig):
+    """ S3 user name command line argument fixture"""
+    name_value = pytestconfig.getoption("s3_name")
+    return name_value
+
+@pytest.fixture(scope='session')
+def s3_secret(pytestconfig):
+    """ S3 user secret command line argument fixture"""
+    secret_value = pytestconfig.getoption("s3_secret")
+    return secret_value
+
+def __get_endpoint_pool(s3_info: S3Info):
+    """ Returns the shared connection pool used for the S3 endpoint
+    Arguments:
+        s3_info: the S3 endpoint information
+    """
+    scheme = 'https' if s3_info.secure else 'http'
+    return s3_http_client().connection_from_url(f'{scheme}://{s3_info.uri}')
+
+# pylint: disable=redefined-outer-name
+def test_s3_connect_reuse(s3_endpoint, s3_name, s3_secret) -> None:
+    """ Tests that S3 connections are reused for the same endpoint and credentials
+    """
+    s3_info = S3Info(s3_endpoint, s3_name, lambda: s3_secret)
+
+    minio = s3_connect(s3_info)
+    assert minio is not None
+    assert s3_connect(S3Info(s3_endpoint, s3_name, s3_secret)) is minio
+
+    other_minio = s3_connect(S3Info(s3_endpoint, s3_name + '_other', s3_secret))
+    assert other_minio is not None
+    assert other_minio is not minio
+
+# pylint: disable=redefined-outer-name
+def test_s3_connect_pooled_connections(s3_endpoint, s3_name, s3_secret) -> None:
+    """ Tests that calls to the S3 endpoint reuse the open connections
+    """
+    s3_info = S3Info(s3_endpoint, s3_name, s3_secret)
+    pool = __get_endpoint_pool(s3_info)
+
+    # Calls made one after the other use only one connection
+    start_connections = pool.num_connections
+    for _ in range(0, NUM_TEST_CALLS):
+        assert s3_connect(s3_info).list_buckets() is not None
+    assert pool.num_connections - start_connections <= 1
+
+    # Concurrent calls don't open more connections than the pool holds
+    start_connections = pool.num_connections
+    with concurrent.futures.ThreadPoolExecutor(max_workers=S3_POOL_SIZE) as executor:
+        cur_futures = [executor.submit(lambda: s3_connect(s3_info).list_buckets()) \
+                                                            for _ in range(0, NUM_TEST_CALLS)]
+        for future in concurrent.futures.as_completed(cur_futures):
+            assert future.result() is not None
+    assert pool.num_connections - start_connections <= S3_POOL_SIZE
@@ -0,0 +1,95 @@
+"""This script contains testing of the validated token cache
+"""
+
+import pytest
+
+import token_cache
+from spd_types.userinfo import UserInfo
+
+# The tokens and users used for testing
+TEST_TOKEN = 'test-token'
+TEST_OTHER_TOKEN = 'test-other-token'
+TEST_USER = 'test-user'
+TEST_OTHER_USER = 'test-other-user'
+
+
+@pytest.fixture(autouse=True)
+def clear_cache(monkeypatch):
+    """ Starts each test with an empty cache and caching enabled """
+    monkeypatch.setattr(token_cache, 'TOKEN_CACHE_SEC', 30)
+    token_cache.CACHED_TOKENS.clear()
+    yield
+    token_cache.CACHED_TOKENS.clear()
+
+
+def __make_user_info(username: str) -> UserInfo:
+    """ Returns user information for testing
+    Arguments:
+        username: the name of the user
+    """
+    user_info = UserInfo(username)
+    user_info.settings = {'autonext': True}
+    return user_info
+
+
+def test_cached_user_info() -> None:
+    """ Tests that cached user information is returned as a copy
+    """
+    assert token_cache.cached_user_info(TEST_TOKEN) is None
+
+    token_cache.cache_user_info(TEST_TOKEN, __make_user_info(TEST_USER))
+    user_info = token_cache.cached_user_info(TEST_TOKEN)
+    assert user_info.name == TEST_USER
+
+    user_info.settings['autonext'] = False
+    assert token_cache.cached_user_info(TEST_TOKEN).settings['autonext'] is True
+
+
+def test_cached_s3_info() -> None:
+    """ Tests that the S3 information is only kept for cached tokens
+    """
+    token_cache.cache_password(TEST_TOKEN, 'password')
+    assert token_cache.cached_s3_info(TEST_TOKEN) == (None, None)
+
+    token_cache.cache_user_info(TEST_TOKEN, __make_user_info(TEST_USER))
+    token_cache.cache_s3_endpoint(TEST_TOKEN, ('s3.test:443', True))
+    token_cache.cache_password(TEST_TOKEN, 'password')
+    assert token_cache.cached_s3_info(TEST_TOKEN) == (('s3.test:443', True), 'password')
+
+
+def test_expired(monkeypatch) -> None:
+    """ Tests that tokens are no longer returned after they expire
+    """
+    token_cache.cache_user_info(TEST_TOKEN, __make_user_info(TEST_USER))
+    monkeypatch.setattr(token_cache, 'TOKEN_CACHE_SEC', 0)
+    assert token_cache.cached_s3_info(TEST_TOKEN) == (None, None)
+    assert TEST_TOKEN not in token_cache.CACHED_TOKENS
+
+
+def test_max_cached(monkeypatch) -> None:
+    """ Tests that the least recently used tokens are removed when the cache is full
+    """
+    monkeypatch.setattr(token_cache, 'MAX_CACHED_TOKENS', 2)
+    token_cache.cache_user_info(TEST_TOKEN, __make_user_info(TEST_USER))
+    token_cache.cache_user_info(TEST_OTHER_TOKEN, __make_user_info(TEST_USER))
+    assert token_cache.cached_user_info(TEST_TOKEN) is not None
+
+    token_cache.cache_user_info('test-third-token', __make_user_info(TEST_USER))
+    assert token_cache.cached_user_info(TEST_TOKEN) is not None
+    assert token_cache.cached_user_info(TEST_OTHER_TOKEN) is None
+
+
+def test_invalidate() -> None:
+    """ Tests removing tokens from the cache
+    """
+    token_cache.cache_user_info(TEST_TOKEN, __make_user_info(TEST_USER))
+    token_cache.cache_user_info(TEST_OTHER_TOKEN, __make_user_info(TEST_OTHER_USER))
+    token_cache.cache_user_info('test-third-token', __make_user_info(TEST_USER))
+
+    token_cache.invalidate_token(TEST_TOKEN)
+    assert token_cache.cached_user_info(TEST_TOKEN) is None
+    assert token_cache.cached_user_info('test-third-token') is not None
+
+    token_cache.invalidate_user(TEST_USER)
+    assert token_cache.cached_user_info('test-third-token') is None
+    assert token_cache.cached_user_info(TEST_OTHER_TOKEN) is not None
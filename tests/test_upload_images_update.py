@@ -0,0 +1,105 @@
+"""This script contains testing of applying species edits to the saved images of an upload
+"""
+
+import os
+import tempfile
+
+import pytest
+
+# The server configuration is read when the server modules are imported
+os.environ.setdefault('SPARCD_DB', os.path.join(tempfile.gettempdir(), 'sparcd-test.sqlite'))
+
+# pylint: disable=wrong-import-position
+from create_db import build_database, build_sandbox_database
+from sparcd_db import SPARCdDatabase
+
+# Values used when saving the upload
+TEST_S3_ID = 'test-s3-id'
+TEST_BUCKET = 'sparcd-test-bucket'
+TEST_COLL_ID = 'test-collection'
+TEST_UPLOAD = '2025.01.01.00.00.00_test-user'
+TEST_UPLOAD_PATH = 'Collections/test-collection/Uploads/' + TEST_UPLOAD
+# Number of seconds the saved upload is valid
+TEST_TIMEOUT_SEC = 3600
+
+
+def make_image(name: str, species: list) -> dict:
+    """ Returns an upload image
+    Arguments:
+        name: the name of the image
+        species: the species of the image
+    Return:
+        Returns the image
+    """
+    s3_path = TEST_UPLOAD_PATH + '/' + name
+    return {'name': name, 'bucket': TEST_BUCKET, 's3_path': s3_path, 'key': s3_path,
+            'species': species}
+
+
+def count_images_with_species(images: tuple) -> int:
+    """ Returns the number of images with species, the same as saved in the upload metadata
+    Arguments:
+        images: the images of the upload
+    Return:
+        Returns the number of images with at least one species
+    """
+    return sum(1 for one_image in images
+               if 'species' in one_image and len(one_image['species']) > 0)
+
+
+@pytest.fixture(name='db')
+def fixture_db(tmp_path):
+    """ Returns a database instance with a saved upload """
+    db_path = str(tmp_path / 'sparcd.sqlite')
+    sandbox_path = str(tmp_path / 'sparcd_sandbox.sqlite')
+    build_database(db_path)
+    build_sandbox_database(sandbox_path)
+
+    db = SPARCdDatabase(db_path, sandbox_path)
+    assert db.upload_images_save(TEST_S3_ID, TEST_BUCKET, TEST_COLL_ID, TEST_UPLOAD,
+            (make_image('IMG_0001.JPG', [{'name': 'Coyote', 'scientificName': 'Canis latrans',
+                                          'count': '2'}]),
+             make_image('IMG_0002.JPG', [{'name': 'Coyote', 'scientificName': 'Canis latrans',
+                                          'count': '1'},
+                                         {'name': 'Bobcat', 'scientificName': 'Lynx rufus',
+                                          'count': '1'}]),
+             make_image('IMG_0003.JPG', [{'name': '', 'scientificName': '', 'count': '1'}]),
+            ))
+    return db
+
+
+def test_zero_count_removes_species(db):
+    """ Tests that editing a species to a zero count removes it from the image """
+    images = db.upload_images_species_update(TEST_S3_ID, TEST_COLL_ID, TEST_UPLOAD,
+                    {TEST_UPLOAD_PATH + '/IMG_0001.JPG': [{'common': 'Coyote',
+                                                           'scientific': 'Canis latrans',
+                                                           'count': 0}],
+                     TEST_UPLOAD_PATH + '/IMG_0002.JPG': [{'common': 'Bobcat',
+                                                           'scientific': 'Lynx rufus',
+                                                           'count': 0}],
+                    }, TEST_TIMEOUT_SEC)
+
+    images = {one_image['name']: one_image for one_image in images}
+    assert not images['IMG_0001.JPG']['species']
+    assert [one_species['scientificName'] for one_species in \
+                                    images['IMG_0002.JPG']['species']] == ['Canis latrans']
+    assert count_images_with_species(images.values()) == 2
+
+    # The saved images have the changes
+    saved = db.upload_images_species_update(TEST_S3_ID, TEST_COLL_ID, TEST_UPLOAD, {},
+                                                                            TEST_TIMEOUT_SEC)
+    assert count_images_with_species(saved) == 2
+
+
+def test_open_species_replaced(db):
+    """ Tests that a species without a scientific name is replaced by an edit """
+    images = db.upload_images_species_update(TEST_S3_ID, TEST_COLL_ID, TEST_UPLOAD,
+                    {TEST_UPLOAD_PATH + '/IMG_0003.JPG': [{'common': 'Bobcat',
+                                                           'scientific': 'Lynx rufus',
+                                                           'count': 3}],
+                    }, TEST_TIMEOUT_SEC)
+
+    images = {one_image['name']: one_image for one_image in images}
+    assert images['IMG_0003.JPG']['species'] == [{'name': 'Bobcat',
+                                                  'scientificName': 'Lynx rufus',
+                                                  'count': '3'}]